@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Micro-benchmark of matching releases against version specifiers.
+
+Compares checking each release against the specifier with matching using a prepared release matcher, as done by
+the solver when many packages depend on a package with a large number of releases:
+
+  python3 benchmarks/matching_benchmark.py --releases 5000 --queries 500
+"""
+
+import argparse
+import random
+import time
+
+from thoth.solver.python.matching import ReleaseMatcher
+from thoth.solver.python.python_solver import PythonDependencyParser
+
+_INDEX_URL = "https://pypi.org/simple"
+
+
+def _make_releases(count):  # type: (int) -> list
+    """Generate versions of releases as listed by an index, in no particular order."""
+    versions = set()
+    while len(versions) < count:
+        version = f"{random.randint(0, 30)}.{random.randint(0, 30)}.{random.randint(0, 30)}"
+        suffix = random.choice(("", "", "", "rc1", ".post1", ".dev0"))
+        versions.add(version + suffix)
+    return [(version, _INDEX_URL) for version in versions]
+
+
+def _make_queries(count):  # type: (int) -> list
+    """Generate requirements as stated by dependents."""
+    result = []
+    for _ in range(count):
+        major = random.randint(0, 30)
+        result.append(
+            random.choice(
+                (
+                    f"foo>={major}.0",
+                    f"foo>={major}.0,<{major + 1}",
+                    f"foo~={major}.1",
+                    f"foo=={major}.1.1",
+                    f"foo<{major}",
+                    "foo",
+                ),
+            ),
+        )
+    return result
+
+
+def _naive(releases, specifiers):  # type: (list, list) -> list
+    return [[release for release in releases if release[0] in specifier] for specifier in specifiers]
+
+
+def _matcher(releases, specifiers):  # type: (list, list) -> list
+    matcher = ReleaseMatcher(releases)
+    return [matcher.match(specifier) for specifier in specifiers]
+
+
+def _measure(function, releases, specifiers, repeat):  # type: (object, list, list, int) -> tuple
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(releases, specifiers)  # type: ignore
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def main():  # type: () -> None
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--releases", type=int, default=5000, help="Number of releases of the package.")
+    parser.add_argument("--queries", type=int, default=500, help="Number of requirements matched.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of repetitions, the best one is reported.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed used to generate releases and requirements.")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    releases = _make_releases(args.releases)
+    specifiers = [PythonDependencyParser.parse_python(query).specifier for query in _make_queries(args.queries)]
+
+    naive_time, naive_result = _measure(_naive, releases, specifiers, args.repeat)
+    matcher_time, matcher_result = _measure(_matcher, releases, specifiers, args.repeat)
+    assert naive_result == matcher_result, "Results of matching differ"
+
+    print(f"releases: {args.releases}, queries: {args.queries}")
+    print(f"checking each release: {naive_time:.3f}s")
+    print(f"release matcher:       {matcher_time:.3f}s ({naive_time / matcher_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
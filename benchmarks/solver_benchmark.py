@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""End-to-end benchmark of the solver, run offline against locally built wheels.
+
+Wheels forming small, medium and deep dependency graphs are built in a temporary directory and served by a local
+stand-in of the simple repository API. Each graph is resolved by the solver in its own process, in a virtual
+environment created next to the wheels (sharing site packages of the interpreter running the benchmark, so that
+no network access is needed). Packages analyzed per second, latencies of discovery stages, subprocesses run per
+package and peak RSS are reported as JSON, results of another commit can be compared:
+
+  python3 -m benchmarks.solver_benchmark -o before.json
+  git checkout ...
+  python3 -m benchmarks.solver_benchmark -o after.json --compare before.json
+
+Run it from the root of the repository, the local index is shared with the test suite.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.base_test import IndexServer
+from tests.base_test import SolverTestCase
+from thoth.solver.python import resolve
+from thoth.solver.python.profiling import tracing
+
+# Number of packages (including the root) and number of additional dependencies of a package in each graph.
+_SCENARIOS = {
+    "small": (5, 4),
+    "medium": (30, 3),
+    "deep": (15, 1),
+}
+
+
+def _make_graph(size, fan_out, chain, rng):  # type: (int, int, bool, random.Random) -> dict
+    """Generate dependencies of packages, all the packages are reachable from the root package "pkg0"."""
+    graph = {index: set() for index in range(size)}  # type: dict
+    for index in range(1, size):
+        # Each package is a dependency of a package with a lower number, which keeps the graph acyclic.
+        graph[index - 1 if chain else rng.randrange(index)].add(index)
+
+    if not chain:
+        for index in range(size):
+            candidates = range(index + 1, size)
+            graph[index].update(rng.sample(candidates, min(rng.randint(0, fan_out - 1), len(candidates))))
+
+    return {f"pkg{index}": [f"pkg{dependency}" for dependency in sorted(graph[index])] for index in graph}
+
+
+def _build_wheels(directory, graph, versions, payload_size):  # type: (str, dict, int, int) -> None
+    """Build wheels of all the packages in the given number of versions, dependencies accept any version."""
+    for name, dependencies in graph.items():
+        for version in range(1, versions + 1):
+            SolverTestCase.make_wheel(
+                directory,
+                name,
+                f"{version}.0.0",
+                requires=[f"{dependency}>=1.0.0" for dependency in dependencies],
+                payload_size=payload_size,
+            )
+
+
+def _run_scenario(name, directory, virtualenv, options):  # type: (str, str, str, dict) -> dict
+    """Resolve the graph of the given scenario served from the given directory, run in a fresh process."""
+    with IndexServer(directory) as index, tracing() as events:
+        start = time.perf_counter()
+        result = resolve(
+            ["pkg0"],
+            index_urls=[index.url],
+            dependency_index_urls=None,
+            python_version=3,
+            exclude_packages=None,
+            transitive=True,
+            virtualenv=virtualenv,
+            metadata_source=options["metadata_source"],
+            workers=options["workers"],
+            install_strategy=options["install_strategy"],
+        )
+        duration = time.perf_counter() - start
+
+    analyzed = len(result["tree"]) + len(result["errors"])
+    spans = [event for event in events if event["ph"] == "X"]
+    # Calls to persistent interpreters do not start a new process.
+    persistent_calls = sum(1 for event in spans if event["args"].get("persistent"))
+    return {
+        "packages": analyzed,
+        "errors": len(result["errors"]),
+        "duration": duration,
+        "packages_per_second": analyzed / duration if duration else 0.0,
+        "subprocesses_per_package": (len(spans) - persistent_calls) / analyzed if analyzed else 0.0,
+        "persistent_calls_per_package": persistent_calls / analyzed if analyzed else 0.0,
+        # Kilobytes on Linux.
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_children_rss": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        "stages": result["timings"],
+    }
+
+
+def _create_virtualenv(path):  # type: (str) -> str
+    """Create virtual environment analyzed packages are installed into, return path to it."""
+    subprocess.run([sys.executable, "-m", "venv", "--system-site-packages", path], check=True)
+    return path
+
+
+def _get_commit():  # type: () -> str
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], check=True, capture_output=True, universal_newlines=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _compare(results, baseline):  # type: (dict, dict) -> None
+    """Print changes of the results relative to the baseline results."""
+    print(f"compared to {baseline.get('commit') or 'baseline'}:", file=sys.stderr)
+    for name, scenario in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+
+        print(
+            f"  {name:<8} packages/s {scenario['packages_per_second'] / previous['packages_per_second']:.2f}x, "
+            f"subprocesses/package {previous['subprocesses_per_package']:.1f} -> "
+            f"{scenario['subprocesses_per_package']:.1f}, "
+            f"peak RSS {previous['peak_rss']} -> {scenario['peak_rss']} kB",
+            file=sys.stderr,
+        )
+
+
+def main():  # type: () -> None
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(_SCENARIOS), help="Scenarios to run (all).")
+    parser.add_argument("--versions", type=int, default=1, help="Number of versions of each package.")
+    parser.add_argument("--payload-size", type=int, default=0, help="Size of data shipped in each wheel in bytes.")
+    parser.add_argument("--metadata-source", choices=("install", "wheel", "core-metadata"), default="install")
+    parser.add_argument("--install-strategy", choices=("environment", "target"), default="environment")
+    parser.add_argument("--workers", type=int, default=1, help="Number of packages discovered concurrently.")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of repetitions, the fastest one is reported.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed used to generate dependency graphs.")
+    parser.add_argument("--output", "-o", default="-", help="File to write results to as JSON (standard output).")
+    parser.add_argument("--compare", metavar="FILE", help="Results of a previous run to compare with.")
+    args = parser.parse_args()
+
+    # No pip self-update checks, everything is installed from the local index.
+    os.environ["PIP_DISABLE_PIP_VERSION_CHECK"] = "1"
+    options = {
+        "metadata_source": args.metadata_source,
+        "install_strategy": args.install_strategy,
+        "workers": args.workers,
+        "versions": args.versions,
+        "payload_size": args.payload_size,
+        "seed": args.seed,
+    }
+    results = {
+        "commit": _get_commit(),
+        "python": platform.python_version(),
+        "options": options,
+        "scenarios": {},
+    }  # type: dict
+
+    with tempfile.TemporaryDirectory(prefix="thoth-solver-benchmark-") as directory:
+        virtualenv = _create_virtualenv(os.path.join(directory, "venv"))
+        for name in args.scenario or list(_SCENARIOS):
+            size, fan_out = _SCENARIOS[name]
+            wheels = os.path.join(directory, name)
+            os.makedirs(wheels)
+            # Each scenario has its own generator so that graphs do not depend on scenarios run.
+            graph = _make_graph(size, fan_out, name == "deep", random.Random(f"{args.seed}-{name}"))
+            _build_wheels(wheels, graph, args.versions, args.payload_size)
+
+            best = None
+            for _ in range(args.repeat):
+                # A fresh process for each run so that peak RSS is not carried over.
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    scenario = executor.submit(_run_scenario, name, wheels, virtualenv, options).result()
+                if best is None or scenario["duration"] < best["duration"]:
+                    best = scenario
+
+            results["scenarios"][name] = best
+            print(
+                f"{name:<8} {best['packages']} packages in {best['duration']:.2f}s "
+                f"({best['packages_per_second']:.2f} packages/s, "
+                f"{best['subprocesses_per_package']:.1f} subprocesses/package, peak RSS {best['peak_rss']} kB)",
+                file=sys.stderr,
+            )
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            _compare(results, json.load(baseline_file))
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    else:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,10 +18,203 @@
 
 """Core logic for solver test suite."""
 
+import base64
+import hashlib
+import json
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
 import os
+import re
+import threading
+import zipfile
+
+from packaging.utils import canonicalize_name
+from packaging.utils import parse_wheel_filename
+
+
+class IndexServer:
+    """A local simple repository API serving wheels present in a directory, usable as a context manager.
+
+    Project pages are available under /simple/<project>/, artifacts under /packages/<filename>. Range requests and
+    core metadata files (PEP-658) can be turned off to simulate indexes that do not support them. Project pages
+    carry an ETag and are revalidated on conditional requests. If turned on, project pages are served in the JSON
+    form (PEP-691, with PEP-700 additions) when requested.
+    """
+
+    def __init__(self, directory, *, range_requests=True, core_metadata=True, json_api=False):
+        """Initialize index server serving the given directory."""
+        self.directory = directory
+        self.range_requests = range_requests
+        self.core_metadata = core_metadata
+        self.json_api = json_api
+        self.requests = []
+        self.statuses = []
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Get URL of the simple repository API."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}/simple"
+
+    def packages(self):
+        """Get wheels served grouped by normalized project name."""
+        result = {}
+        for file_name in sorted(os.listdir(self.directory)):
+            if file_name.endswith(".whl"):
+                result.setdefault(str(parse_wheel_filename(file_name)[0]), []).append(file_name)
+        return result
+
+    def __enter__(self):
+        """Start serving in a background thread."""
+        index = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status, body, headers=None):
+                index.statuses.append((self.path, status))
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                index.requests.append((self.path, self.headers.get("Range")))
+                parts = self.path.strip("/").split("/")
+                if len(parts) == 2 and parts[0] == "simple":
+                    return self._project_page(parts[1])
+                if len(parts) == 2 and parts[0] == "packages":
+                    return self._artifact(parts[1])
+                return self._respond(404, b"Not Found")
+
+            def _project_page(self, project):
+                files = index.packages().get(canonicalize_name(project))
+                if not files:
+                    return self._respond(404, b"Not Found")
+
+                if index.json_api and "application/vnd.pypi.simple.v1+json" in (self.headers.get("Accept") or ""):
+                    return self._project_json(project, files)
+
+                anchors = []
+                for file_name in files:
+                    with open(os.path.join(index.directory, file_name), "rb") as artifact:
+                        digest = hashlib.sha256(artifact.read()).hexdigest()
+                    core_metadata = ' data-core-metadata="true"' if index.core_metadata else ""
+                    anchors.append(f'<a href="/packages/{file_name}#sha256={digest}"{core_metadata}>{file_name}</a>')
+
+                body = ("<html><body>\n" + "\n".join(anchors) + "\n</body></html>\n").encode()
+                etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self._respond(304, b"", {"ETag": etag})
+                return self._respond(200, body, {"Content-Type": "text/html", "ETag": etag})
+
+            def _project_json(self, project, files):
+                file_infos = []
+                for file_name in files:
+                    with open(os.path.join(index.directory, file_name), "rb") as artifact:
+                        content = artifact.read()
+                    file_infos.append(
+                        {
+                            "filename": file_name,
+                            "url": f"/packages/{file_name}",
+                            "hashes": {"sha256": hashlib.sha256(content).hexdigest()},
+                            "size": len(content),
+                            "core-metadata": index.core_metadata,
+                        },
+                    )
+
+                versions = sorted({str(parse_wheel_filename(file_name)[1]) for file_name in files})
+                body = json.dumps(
+                    {"meta": {"api-version": "1.1"}, "name": project, "files": file_infos, "versions": versions},
+                ).encode()
+                return self._respond(200, body, {"Content-Type": "application/vnd.pypi.simple.v1+json"})
+
+            def _artifact(self, file_name):
+                if file_name.endswith(".metadata") and index.core_metadata:
+                    path = os.path.join(index.directory, file_name[: -len(".metadata")])
+                    if not os.path.isfile(path):
+                        return self._respond(404, b"Not Found")
+                    with zipfile.ZipFile(path) as wheel:
+                        name = next(n for n in wheel.namelist() if n.endswith(".dist-info/METADATA"))
+                        return self._respond(200, wheel.read(name))
+
+                path = os.path.join(index.directory, file_name)
+                if not file_name.endswith(".whl") or not os.path.isfile(path):
+                    return self._respond(404, b"Not Found")
+
+                with open(path, "rb") as artifact:
+                    content = artifact.read()
+
+                match = re.match(r"^bytes=(\d*)-(\d*)$", self.headers.get("Range") or "")
+                if not index.range_requests or not match:
+                    return self._respond(200, content)
+
+                if not match.group(1):
+                    start, end = max(len(content) - int(match.group(2)), 0), len(content) - 1
+                else:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), len(content) - 1) if match.group(2) else len(content) - 1
+
+                headers = {"Content-Range": f"bytes {start}-{end}/{len(content)}", "Accept-Ranges": "bytes"}
+                return self._respond(206, content[start : end + 1], headers)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
 
 
 class SolverTestCase:
     """A base class for solver test cases."""
 
     data_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+    @staticmethod
+    def make_wheel(directory, name, version, *, requires=None, entry_points=None, tag="py3-none-any", payload_size=0):
+        """Build a minimal pure Python wheel in the given directory, return path to it.
+
+        Payload size states size of an incompressible data file shipped in the package to make the wheel large.
+        """
+        distribution = name.replace("-", "_")
+        dist_info = f"{distribution}-{version}.dist-info"
+        metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\nSummary: A test package.\n"
+        for requirement in requires or []:
+            metadata += f"Requires-Dist: {requirement}\n"
+        metadata += "\nLong description of the test package.\n"
+
+        members = {
+            f"{distribution}/__init__.py": f"__version__ = {version!r}\n",
+            f"{dist_info}/METADATA": metadata,
+            f"{dist_info}/WHEEL": (
+                f"Wheel-Version: 1.0\nGenerator: thoth-solver-tests\nRoot-Is-Purelib: true\nTag: {tag}\n"
+            ),
+        }
+        if entry_points:
+            members[f"{dist_info}/entry_points.txt"] = entry_points
+        if payload_size:
+            members = {f"{distribution}/payload.bin": os.urandom(payload_size), **members}
+
+        record = ""
+        for member_name, content in members.items():
+            content = content if isinstance(content, bytes) else content.encode()
+            digest = base64.urlsafe_b64encode(hashlib.sha256(content).digest()).rstrip(b"=").decode()
+            record += f"{member_name},sha256={digest},{len(content)}\n"
+        record += f"{dist_info}/RECORD,,\n"
+        members[f"{dist_info}/RECORD"] = record
+
+        path = os.path.join(directory, f"{distribution}-{version}-{tag}.whl")
+        with zipfile.ZipFile(path, "w") as wheel:
+            for member_name, content in members.items():
+                wheel.writestr(member_name, content)
+
+        return path
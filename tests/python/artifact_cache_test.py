@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test content-addressed artifact cache."""
+
+import os
+
+import pytest
+from thoth.python import Source
+from tests.base_test import IndexServer
+from tests.base_test import SolverTestCase
+
+from thoth.solver.python.artifact_cache import ArtifactCache
+from thoth.solver.python.artifact_cache import select_artifact
+from thoth.solver.python.artifacts import ArtifactLink
+from thoth.solver.python.artifacts import list_artifacts
+from thoth.solver.python.instrument import get_distribution_metadata
+from thoth.solver.python.python import _install_requirement_target
+
+
+class TestArtifactCache(SolverTestCase):
+    """Test content-addressed artifact cache."""
+
+    @staticmethod
+    def _artifact_requests(index):
+        """Get number of artifact downloads issued to the given index server."""
+        return len([path for path, _ in index.requests if path.startswith("/packages/")])
+
+    @pytest.mark.parametrize(
+        "filenames,expected",
+        [
+            (["foo-1.0.tar.gz", "foo-1.0-py3-none-any.whl"], "foo-1.0-py3-none-any.whl"),
+            (["foo-1.0.tar.gz", "foo-1.0-cp27-cp27mu-linux_x86_64.whl"], "foo-1.0.tar.gz"),
+            (["foo-0.9.tar.gz", "foo-1.0.zip"], "foo-1.0.zip"),
+            (["foo-0.9.tar.gz"], None),
+        ],
+    )
+    def test_select_artifact(self, filenames, expected):
+        """Test selecting artifact pip would install, falling back to sdists."""
+        artifacts = [ArtifactLink(filename=filename, url=f"https://example.com/{filename}") for filename in filenames]
+        artifact = select_artifact(artifacts, "1.0", ["py3-none-any"], "3.8.0")
+        assert (artifact.filename if artifact else None) == expected
+
+    def test_get(self, tmp_path):
+        """Test artifacts are downloaded once and verified when taken from the cache."""
+        index_dir = tmp_path / "index"
+        index_dir.mkdir()
+        self.make_wheel(str(index_dir), "foo", "1.0.0")
+        cache = ArtifactCache(str(tmp_path / "cache"), max_size=1024 * 1024)
+
+        with IndexServer(str(index_dir)) as index:
+            artifact = list_artifacts(Source(index.url), "foo")[0]
+            path = cache.get(artifact)
+            assert cache.get(artifact) == path
+            assert self._artifact_requests(index) == 1
+
+            with open(path, "ab") as artifact_file:
+                artifact_file.write(b"corrupted")
+            assert cache.get(artifact) == path
+            assert self._artifact_requests(index) == 2
+
+        assert os.path.basename(path) == artifact.filename
+        assert artifact.sha256 in path
+        assert [entry[2] for entry in cache._list_entries()] == [path]
+
+    def test_evict(self, tmp_path):
+        """Test least recently used artifacts are evicted once the cache exceeds its size."""
+        index_dir = tmp_path / "index"
+        index_dir.mkdir()
+        for name in ("foo", "bar", "baz"):
+            self.make_wheel(str(index_dir), name, "1.0.0", payload_size=10 * 1024)
+
+        cache = ArtifactCache(str(tmp_path / "cache"), max_size=25 * 1024)
+        with IndexServer(str(index_dir)) as index:
+            source = Source(index.url)
+            foo, bar = (cache.get(list_artifacts(source, name)[0]) for name in ("foo", "bar"))
+            # Simulate foo being used recently and bar being used long time ago.
+            os.utime(foo, (0, 1000))
+            os.utime(bar, (0, 0))
+            cache.get(list_artifacts(source, "foo")[0])
+            baz = cache.get(list_artifacts(source, "baz")[0])
+
+        assert os.path.isfile(foo)
+        assert os.path.isfile(baz)
+        assert not os.path.exists(os.path.dirname(bar))
+
+    def test_size(self, tmp_path, monkeypatch):
+        """Test size of the cache is obtained when opened, the cache is not scanned again while it fits its limit."""
+        index_dir = tmp_path / "index"
+        index_dir.mkdir()
+        for name in ("foo", "bar"):
+            self.make_wheel(str(index_dir), name, "1.0.0", payload_size=10 * 1024)
+
+        with IndexServer(str(index_dir)) as index:
+            source = Source(index.url)
+            foo = ArtifactCache(str(tmp_path / "cache"), max_size=1024 * 1024).get(list_artifacts(source, "foo")[0])
+
+            cache = ArtifactCache(str(tmp_path / "cache"), max_size=1024 * 1024)
+            assert cache._size == os.path.getsize(foo)
+
+            monkeypatch.setattr(cache, "_list_entries", lambda: pytest.fail("Cache directory scanned"))
+            bar = cache.get(list_artifacts(source, "bar")[0])
+
+        assert cache._size == os.path.getsize(foo) + os.path.getsize(bar)
+
+    def test_install_cached_artifact(self, tmp_path, venv):
+        """Test installing a package from a cached artifact."""
+        index_dir = tmp_path / "index"
+        index_dir.mkdir()
+        self.make_wheel(str(index_dir), "foo", "1.0.0", requires=["six"])
+        cache = ArtifactCache(str(tmp_path / "cache"), max_size=1024 * 1024)
+
+        with IndexServer(str(index_dir)) as index:
+            path = cache.get(list_artifacts(Source(index.url), "foo")[0])
+
+        with _install_requirement_target(venv.python, "foo", "1.0.0", index.url, artifact_path=path) as target:
+            assert get_distribution_metadata(venv.python, "foo", target)[1]["requires"] == ["six"]
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test budgets bounding solver runs."""
+
+import time
+
+from tests.base_test import SolverTestCase
+
+from thoth.solver.python.budget import Budget
+
+
+class TestBudget(SolverTestCase):
+    """Test budgets bounding solver runs."""
+
+    def test_max_packages(self):
+        """Test the budget runs out once the given number of packages is picked."""
+        budget = Budget(max_packages=2)
+        assert [budget.take() for _ in range(4)] == [True, True, False, False]
+        assert budget.exhausted
+        assert budget.picked == 2
+
+    def test_deadline(self, monkeypatch):
+        """Test the budget runs out once the deadline is reached."""
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now)
+        budget = Budget(deadline=10)
+        assert budget.take()
+
+        monkeypatch.setattr(time, "monotonic", lambda: now + 10)
+        assert not budget.take()
+        assert budget.reason == "deadline reached"
+
+    def test_unlimited(self):
+        """Test a budget without limits does not run out."""
+        budget = Budget()
+        assert all(budget.take() for _ in range(100))
+        assert not budget.exhausted
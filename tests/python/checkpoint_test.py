@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test checkpoints of resolution progress."""
+
+import pytest
+from tests.base_test import SolverTestCase
+
+from thoth.solver.exceptions import CheckpointMismatch
+from thoth.solver.python.checkpoint import Checkpoint
+
+_INDEX_URL = "https://pypi.org/simple"
+
+
+class TestCheckpoint(SolverTestCase):
+    """Test checkpoints of resolution progress."""
+
+    def _record(self, path):
+        """Record progress of a resolution interrupted while writing a line."""
+        checkpoint = Checkpoint(path, "fingerprint")
+        checkpoint.record_roots(_INDEX_URL, [("unparsed", {"requirement": "foo=="})], [("a", "1"), ("b", "1")])
+        checkpoint.record_done(_INDEX_URL, ("b", "1"), "tree", {"package_name": "b"}, [("c", "1")], 0)
+        checkpoint.record_done(_INDEX_URL, ("c", "1"), "errors", {"package_name": "c"}, [], 1)
+        checkpoint.close()
+
+        with open(path, "a") as checkpoint_file:
+            checkpoint_file.write('{"index": "https://pypi.org/simple", "event": "done", "pack')
+
+    def test_resume(self, tmp_path):
+        """Test progress recorded is restored, a partially written line is dropped."""
+        path = str(tmp_path / "checkpoint.jsonl")
+        self._record(path)
+
+        checkpoint = Checkpoint(path, "fingerprint", resume=True)
+        state = checkpoint.get_state(_INDEX_URL)
+        checkpoint.record_done(_INDEX_URL, ("a", "1"), "tree", {"package_name": "a"}, [])
+        checkpoint.close()
+
+        assert state.records == [
+            ("unparsed", {"requirement": "foo=="}),
+            ("tree", {"package_name": "b"}),
+            ("errors", {"package_name": "c"}),
+        ]
+        assert state.seen == {("a", "1"), ("b", "1"), ("c", "1")}
+        assert state.queue == [("a", "1")]
+        assert state.depths == {("c", "1"): 1}
+        assert checkpoint.get_state("https://example.com/simple") is None
+
+        # The line appended after resuming is complete.
+        checkpoint = Checkpoint(path, "fingerprint", resume=True)
+        state = checkpoint.get_state(_INDEX_URL)
+        checkpoint.close()
+        assert state.records[-1] == ("tree", {"package_name": "a"})
+        assert state.queue == []
+
+    def test_resume_mismatch(self, tmp_path):
+        """Test a checkpoint created by a run with different inputs is not resumed."""
+        path = str(tmp_path / "checkpoint.jsonl")
+        self._record(path)
+
+        with pytest.raises(CheckpointMismatch):
+            Checkpoint(path, "other", resume=True)
+
+    def test_resume_missing(self, tmp_path):
+        """Test resuming from a checkpoint that does not exist starts from scratch."""
+        checkpoint = Checkpoint(str(tmp_path / "checkpoint.jsonl"), "fingerprint", resume=True)
+        assert checkpoint.get_state(_INDEX_URL) is None
+        checkpoint.close()
+
+    def test_no_resume(self, tmp_path):
+        """Test progress recorded is discarded if not resuming."""
+        path = str(tmp_path / "checkpoint.jsonl")
+        self._record(path)
+
+        checkpoint = Checkpoint(path, "fingerprint")
+        assert checkpoint.get_state(_INDEX_URL) is None
+        checkpoint.close()
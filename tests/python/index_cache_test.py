@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test persistent cache of index pages."""
+
+import pytest
+from thoth.python import Source
+from thoth.python.exceptions import NotFoundError
+from tests.base_test import IndexServer
+from tests.base_test import SolverTestCase
+
+from thoth.solver.exceptions import IndexCacheMiss
+from thoth.solver.python.index_cache import IndexPageCache
+from thoth.solver.python.python import _resolve_requirements
+from thoth.solver.python.python_solver import PythonDependencyParser
+from thoth.solver.python.python_solver import PythonReleasesFetcher
+from thoth.solver.python.python_solver import PythonSolver
+
+
+class TestIndexPageCache(SolverTestCase):
+    """Test persistent cache of index pages."""
+
+    @pytest.fixture
+    def index_dir(self, tmp_path):
+        """Create a directory with wheels served by an index."""
+        index_dir = tmp_path / "index"
+        index_dir.mkdir()
+        self.make_wheel(str(index_dir), "foo", "1.0.0")
+        self.make_wheel(str(index_dir), "foo", "2.0.0")
+        return str(index_dir)
+
+    def test_revalidate(self, tmp_path, index_dir):
+        """Test stale pages are revalidated with conditional requests."""
+        with IndexServer(index_dir) as index:
+            fetcher = PythonReleasesFetcher(source=Source(index.url), page_cache=IndexPageCache(str(tmp_path / "c")))
+            first = fetcher.fetch_releases("Foo")
+            second = fetcher.fetch_releases("foo")
+
+        assert first == second
+        assert first[0] == "foo"
+        assert sorted(version for version, _ in first[1]) == ["1.0.0", "2.0.0"]
+        assert index.statuses == [("/simple/foo/", 200), ("/simple/foo/", 304)]
+
+    def test_ttl(self, tmp_path, index_dir):
+        """Test fresh pages are served without contacting the index."""
+        with IndexServer(index_dir) as index:
+            page_cache = IndexPageCache(str(tmp_path / "cache"), ttl=3600)
+            fetcher = PythonReleasesFetcher(source=Source(index.url), page_cache=page_cache)
+            fetcher.fetch_releases("foo")
+            assert len(fetcher.fetch_artifacts("foo")) == 2
+
+        assert len(index.requests) == 1
+
+    def test_offline(self, tmp_path, index_dir):
+        """Test serving pages only from the cache in offline mode."""
+        with IndexServer(index_dir) as index:
+            source = Source(index.url)
+            PythonReleasesFetcher(source=source, page_cache=IndexPageCache(str(tmp_path / "cache"))).fetch_releases(
+                "foo"
+            )
+
+        fetcher = PythonReleasesFetcher(source=source, page_cache=IndexPageCache(str(tmp_path / "cache"), offline=True))
+        assert sorted(version for version, _ in fetcher.fetch_releases("foo")[1]) == ["1.0.0", "2.0.0"]
+        with pytest.raises(IndexCacheMiss):
+            fetcher.fetch_releases("bar")
+
+    def test_not_found(self, tmp_path, index_dir):
+        """Test packages not present on the index are cached as well."""
+        with IndexServer(index_dir) as index:
+            page_cache = IndexPageCache(str(tmp_path / "cache"), ttl=3600)
+            fetcher = PythonReleasesFetcher(source=Source(index.url), page_cache=page_cache)
+            for _ in range(2):
+                with pytest.raises(NotFoundError):
+                    fetcher.fetch_releases("bar")
+
+        assert len(index.requests) == 1
+
+    def test_offline_unresolved(self, tmp_path, index_dir):
+        """Test packages not cached are reported as unresolved in offline mode without reaching the index."""
+        with IndexServer(index_dir) as index:
+            source = Source(index.url)
+            fetcher = PythonReleasesFetcher(source=source, page_cache=IndexPageCache(str(tmp_path / "cache")))
+            fetcher.fetch_releases("foo")
+            with pytest.raises(NotFoundError):
+                fetcher.fetch_releases("missing")
+
+        # The index is no longer running, any request to it would fail.
+        fetcher = PythonReleasesFetcher(source=source, page_cache=IndexPageCache(str(tmp_path / "cache"), offline=True))
+        solver = PythonSolver(dependency_parser=PythonDependencyParser(), releases_fetcher=fetcher)
+        records, queued = _resolve_requirements(solver, ["foo==3.0.0", "missing", "bar"], None)
+
+        assert queued == []
+        assert [(section, record["package_name"]) for section, record in records] == [
+            ("unresolved", "foo"),
+            ("unresolved", "missing"),
+            ("unresolved", "bar"),
+        ]
+        assert [(record["is_provided_package"], record["is_provided_package_version"]) for _, record in records] == [
+            (True, False),
+            (False, None),
+            (None, None),
+        ]
@@ -25,7 +25,11 @@ from tests.base_test import SolverTestCase
 
 from thoth.solver.python.instrument import find_distribution_name
 from thoth.solver.python.instrument import get_package_metadata
+from thoth.solver.python.instrument import get_distribution_metadata
 from thoth.solver.python.instrument import execute_env_function
+from thoth.solver.python.instrument import get_interpreter_info
+from thoth.solver.python.instrument import shutdown_env_workers
+from thoth.solver.python.instrument import _get_env_import_path
 
 
 def _func_err():
@@ -48,6 +52,12 @@ def _func_env():
     print(os.environ["FOO"], end="")
 
 
+def _func_pid():
+    import os
+
+    print(os.getpid(), end="")
+
+
 class TestInstrument(SolverTestCase):
     """Test instrumentation of running custom functions inside a virtual environment."""
 
@@ -78,6 +88,21 @@ class TestInstrument(SolverTestCase):
         discovered_metadata.pop("files")
         assert discovered_metadata == metadata
 
+    @pytest.mark.parametrize(
+        "package_name,package_version,distribution_name,metadata_file",
+        [("delegator-py", "0.1.1", "delegator.py", "delegator-py.json"), ("Click", "7.0", "Click", "click.json")],
+    )
+    def test_get_distribution_metadata(self, venv, package_name, package_version, distribution_name, metadata_file):
+        """Test getting distribution name together with package metadata."""
+        with open(os.path.join(self.data_dir, "metadata", metadata_file)) as f:
+            metadata = json.load(f)
+
+        venv.install(f"{package_name}==={package_version}")
+        discovered_name, discovered_metadata = get_distribution_metadata(venv.python, package_name)
+        assert discovered_name == distribution_name
+        assert discovered_metadata.pop("files")
+        assert discovered_metadata == metadata
+
     def test_package_clash(self, venv):
         """Test packages which are dependencies of this solver do not affect results of data gathering."""
         import click
@@ -100,3 +125,36 @@ class TestInstrument(SolverTestCase):
     def test_execute_env_function_env(self, venv):
         """Check propagation of environment variables to the underlying virtual environment."""
         assert execute_env_function(venv.python, _func_env, is_json=False, env={"FOO": "BAR"}) == "BAR"
+
+    def test_execute_env_function_persistent(self, venv):
+        """Check functions are run in the same interpreter if requested."""
+        first_pid = execute_env_function(venv.python, _func_pid, persistent=True)
+        assert execute_env_function(venv.python, _func_pid, persistent=True) == first_pid
+        assert execute_env_function(venv.python, _func_pid) != first_pid
+
+    def test_execute_env_function_persistent_json(self, venv):
+        """Check parsing a JSON output produced when running a function in a persistent interpreter."""
+        result = execute_env_function(venv.python, _func_json, is_json=True, persistent=True, param="bar")
+        assert result == {"foo": "bar"}
+
+    def test_execute_env_function_persistent_env(self, venv):
+        """Check propagation of environment variables to a persistent interpreter."""
+        assert execute_env_function(venv.python, _func_env, env={"FOO": "BAR"}, persistent=True) == "BAR"
+
+    def test_execute_env_function_persistent_raise_on_error(self, venv):
+        """Check errors are propagated from a persistent interpreter, the interpreter survives them."""
+        with pytest.raises(ValueError, match="this is error message"):
+            execute_env_function(venv.python, _func_err, persistent=True)
+
+        assert execute_env_function(venv.python, _func_err, persistent=True, raise_on_error=False) is None
+        assert execute_env_function(venv.python, _func_pid, persistent=True).isdigit()
+
+    def test_shutdown_env_workers(self, venv):
+        """Check information obtained from interpreters are forgotten once persistent interpreters are terminated."""
+        assert get_interpreter_info(venv.python)["tags"]
+        assert get_interpreter_info.cache_info().currsize > 0
+        assert _get_env_import_path.cache_info().currsize > 0
+
+        shutdown_env_workers()
+        assert get_interpreter_info.cache_info().currsize == 0
+        assert _get_env_import_path.cache_info().currsize == 0
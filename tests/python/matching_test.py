@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test matching of package releases against version specifiers."""
+
+import pytest
+from tests.base_test import SolverTestCase
+
+from thoth.solver.python.matching import ReleaseMatcher
+from thoth.solver.python.python_solver import PythonDependencyParser
+
+
+class TestReleaseMatcher(SolverTestCase):
+    """Test matching of package releases against version specifiers."""
+
+    _RELEASES = [
+        (version, "https://pypi.org/simple")
+        for version in (
+            "2.0.0",
+            "1.0",
+            "1.0.0",
+            "1.0+local",
+            "1.0.post1",
+            "1.0rc1",
+            "1.0.dev0",
+            "0.9",
+            "1!0.1",
+            "1.1",
+            "1.4.5",
+            "1.4.9",
+            "1.5",
+            "not-a-version",
+            "2.0.0b1",
+            "1.10",
+        )
+    ]
+
+    @pytest.mark.parametrize(
+        "specification",
+        [
+            "foo",
+            "foo>=1.0",
+            "foo>1.0",
+            "foo<1.0",
+            "foo<=1.0",
+            "foo==1.0",
+            "foo==1.0+local",
+            "foo==1.*",
+            "foo!=1.0",
+            "foo~=1.4.5",
+            "foo===not-a-version",
+            "foo>=1.0,<2.0,!=1.1",
+            "foo>0.9,<=1.4.9",
+            "foo>=3",
+            "foo<=0.1",
+            "foo>=1!0",
+        ],
+    )
+    def test_match(self, specification):
+        """Test releases matched are the same as checking each release against the specifier, in the same order."""
+        specifier = PythonDependencyParser.parse_python(specification).specifier
+        expected = [release for release in self._RELEASES if release[0] in specifier]
+        assert ReleaseMatcher(self._RELEASES).match(specifier) == expected
+
+    def test_match_no_prereleases(self):
+        """Test pre-releases are excluded if not allowed by the specifier."""
+        specifier = PythonDependencyParser.parse_python("foo>=1.0").specifier
+        specifier = type(specifier)(str(specifier))
+        expected = [release for release in self._RELEASES if release[0] in specifier]
+        assert ReleaseMatcher(self._RELEASES).match(specifier) == expected
+        assert ("2.0.0b1", "https://pypi.org/simple") not in expected
+
+    def test_parse_python_cached(self):
+        """Test parsed requirements are shared."""
+        assert PythonDependencyParser.parse_python("foo>=1.0") is PythonDependencyParser.parse_python("foo>=1.0")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test profiling of solver runs."""
+
+import json
+import pstats
+import threading
+
+from tests.base_test import SolverTestCase
+
+from thoth.solver.python.profiling import Profiler
+from thoth.solver.python.profiling import for_package
+from thoth.solver.python.profiling import span
+from thoth.solver.python.profiling import tracing
+
+
+class TestProfiling(SolverTestCase):
+    """Test profiling of solver runs."""
+
+    @staticmethod
+    def _analyze():
+        """Simulate analysis of a package running subprocesses."""
+        with for_package("selinon", "1.1.0"):
+            with span("pip-install", command="pip install selinon==1.1.0"):
+                pass
+            with span("env-function", function="_get_importlib_metadata_distribution"):
+                pass
+
+    def test_profile(self, tmp_path):
+        """Test a profile including threads and a trace of subprocesses are written."""
+        profiler = Profiler(str(tmp_path / "profile"))
+        profiler.start()
+        thread = threading.Thread(target=self._analyze)
+        thread.start()
+        thread.join()
+        profiler.stop()
+
+        with open(tmp_path / "profile" / "trace.json") as trace_file:
+            events = json.load(trace_file)["traceEvents"]
+
+        spans = [event for event in events if event["ph"] == "X"]
+        assert [event["name"] for event in spans] == ["pip-install", "env-function"]
+        assert all(event["args"]["package"] == "selinon==1.1.0" for event in spans)
+        assert all(event["tid"] == thread.ident and event["dur"] >= 0 for event in spans)
+        assert {"name": "thread_name", "ph": "M", "args": {"name": thread.name}}.items() <= [
+            event for event in events if event["ph"] == "M"
+        ][0].items()
+
+        stats = pstats.Stats(str(tmp_path / "profile" / "profile.pstats"))
+        assert any(function == "_analyze" for _, _, function in stats.stats)
+
+    def test_no_profile(self):
+        """Test spans are not recorded if no profiler is running."""
+        with span("pip-install"):
+            pass
+
+    def test_tracing(self):
+        """Test spans are recorded while tracing without profiling."""
+        with tracing() as events:
+            self._analyze()
+
+        assert [event["name"] for event in events if event["ph"] == "X"] == ["pip-install", "env-function"]
+        with span("pip-install"):
+            pass
+        assert len([event for event in events if event["ph"] == "X"]) == 2
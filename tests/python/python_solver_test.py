@@ -18,10 +18,21 @@
 
 """Test resolving versions given the version range in Python ecosystem."""
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+
 import pytest
+from thoth.python import Source
+from thoth.python.exceptions import NotFoundError
+from tests.base_test import IndexServer
 from tests.base_test import SolverTestCase
 
 from thoth.solver import get_ecosystem_solver
+from thoth.solver.python.python_solver import PythonDependencyParser
+from thoth.solver.python.python_solver import PythonReleasesFetcher
+from thoth.solver.python.python_solver import PythonSolver
+from thoth.solver.python.python_solver import ReleasesMemo
 
 
 class TestPythonSolver(SolverTestCase):
@@ -93,3 +104,83 @@ class TestPythonSolver(SolverTestCase):
         test_resolved_versions = solver.solve([package_specification])
         test_resolved_versions = {k: set(v) for k, v in test_resolved_versions.items()}
         assert test_resolved_versions == resolved_versions
+
+    def test_releases_memo(self, tmp_path):
+        """Test releases are fetched once per index in a run, concurrent requests are coalesced."""
+        for version in ("1.0.0", "1.1.0", "2.0.0"):
+            self.make_wheel(str(tmp_path), "foo", version)
+
+        releases_memo = ReleasesMemo()
+        with IndexServer(str(tmp_path)) as index:
+            solvers = [
+                PythonSolver(
+                    dependency_parser=PythonDependencyParser(),
+                    releases_fetcher=PythonReleasesFetcher(source=Source(index.url), releases_memo=releases_memo),
+                )
+                for _ in range(2)
+            ]
+            specifications = ["foo", "Foo>=1.1", "FOO<2", "foo==1.0.0"] * 8
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(
+                    executor.map(lambda i: solvers[i % 2].solve([specifications[i]]), range(len(specifications)))
+                )
+
+            for _ in range(2):
+                with pytest.raises(NotFoundError):
+                    solvers[0].solve(["bar"])
+
+        assert [path.rstrip("/") for path, _ in index.requests] == ["/simple/foo", "/simple/bar"]
+        assert [sorted(version for version, _ in result["foo"]) for result in results[:4]] == [
+            ["1.0.0", "1.1.0", "2.0.0"],
+            ["1.1.0", "2.0.0"],
+            ["1.0.0", "1.1.0"],
+            ["1.0.0"],
+        ]
+
+    def test_get_fetched_project_index(self, tmp_path):
+        """Test project index fetched previously is returned without querying the index."""
+        self.make_wheel(str(tmp_path), "foo", "1.0.0")
+
+        with IndexServer(str(tmp_path), json_api=True) as index:
+            fetcher = PythonReleasesFetcher(source=Source(index.url), releases_memo=ReleasesMemo())
+            assert fetcher.get_fetched_project_index("foo") is None
+            assert PythonReleasesFetcher(source=Source(index.url)).get_fetched_project_index("foo") is None
+            assert index.requests == []
+
+            project_index = fetcher.fetch_project_index("foo")
+            with pytest.raises(NotFoundError):
+                fetcher.fetch_project_index("bar")
+
+            assert fetcher.get_fetched_project_index("Foo") is project_index
+            assert fetcher.get_fetched_project_index("bar") is None
+
+        assert len(index.requests) == 2
+        assert project_index.get_artifacts("1.0.0")[0].size is not None
+
+    @pytest.mark.parametrize("json_api", [False, True])
+    def test_project_index(self, tmp_path, json_api):
+        """Test releases, artifacts and hashes are served from one project page."""
+        for version in ("1.0.0", "2.0.0"):
+            self.make_wheel(str(tmp_path), "foo", version)
+            self.make_wheel(str(tmp_path), "foo", version, tag="cp38-cp38-manylinux1_x86_64")
+
+        with IndexServer(str(tmp_path), json_api=json_api) as index:
+            fetcher = PythonReleasesFetcher(source=Source(index.url), releases_memo=ReleasesMemo())
+            name, releases = fetcher.fetch_releases("Foo")
+            artifacts = fetcher.fetch_artifacts("foo")
+            hashes = fetcher.fetch_package_hashes("foo", "1.0")
+            with pytest.raises(NotFoundError):
+                fetcher.fetch_package_hashes("foo", "3.0.0")
+
+        assert len(index.requests) == 1
+        assert name == "foo"
+        assert sorted(version for version, _ in releases) == ["1.0.0", "2.0.0"]
+        assert len(artifacts) == 4
+        assert all((artifact.size is not None) is json_api for artifact in artifacts)
+
+        expected = []
+        for file_name in sorted(os.listdir(tmp_path)):
+            if file_name.startswith("foo-1.0.0-"):
+                with open(os.path.join(tmp_path, file_name), "rb") as artifact:
+                    expected.append({"name": file_name, "sha256": hashlib.sha256(artifact.read()).hexdigest()})
+        assert sorted(hashes, key=lambda item: item["name"]) == expected
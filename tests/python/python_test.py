@@ -18,15 +18,40 @@
 
 """Test solver for Python ecosystem."""
 
+from concurrent.futures import ThreadPoolExecutor
+import io
+import click
 import pytest
 import json
 from pathlib import Path
+import random
+import subprocess
+import threading
+import time
+from types import SimpleNamespace
+from tests.base_test import IndexServer
 from tests.base_test import SolverTestCase
 
+from thoth.analyzer import print_command_result
+from thoth.solver import __title__ as analyzer_name
+from thoth.solver import __version__ as analyzer_version
+from thoth.solver.cli import _get_metadata
+from thoth.solver.output import NDJSONWriter
+from thoth.solver.python import python as python_module
+from thoth.solver.python.budget import Budget
+from thoth.solver.python.checkpoint import Checkpoint
+from thoth.solver.python.sharding import get_seed_states
+from thoth.solver.python.sharding import get_shard
+from thoth.solver.python.sharding import merge_documents
+from thoth.solver.python.instrument import get_distribution_metadata
+from thoth.solver.python.python import _do_resolve_index
+from thoth.solver.python.python import _install_requirement_target
+from thoth.solver.python.python import _resolve_dependencies
 from thoth.solver.python.python import extract_metadata
 from thoth.solver.python.python import parse_requirement_str
 from thoth.solver.python.python import _pipdeptree as pipdeptree
 from thoth.solver.python.python import get_environment_packages
+from thoth.solver.python.virtualenv_pool import VirtualenvPool
 
 
 class TestPython(SolverTestCase):
@@ -132,3 +157,320 @@ class TestPython(SolverTestCase):
         """Test get environment packages."""
         venv.install("selinon==1.1.0")
         assert {"package_name": "selinon", "package_version": "1.1.0"} in get_environment_packages(venv.python)
+
+    _DEPENDENCY_GRAPH = {
+        ("a", "1"): [("b", ["1", "2"]), ("c", ["1"])],
+        ("b", "1"): [("c", ["1"]), ("d", ["1"])],
+        ("b", "2"): [("e", ["1"])],
+        ("c", "1"): [("d", ["1"]), ("e", ["1"])],
+        ("d", "1"): [("f", ["1"])],
+        ("e", "1"): [("a", ["1"])],
+        ("f", "1"): [],
+    }
+
+    def _resolve_index(self, monkeypatch, workers, discovered=None, **kwargs):
+        """Resolve the dependency graph using the given number of workers, return names of discovered packages."""
+        index_url = "https://example.com/simple"
+        releases_fetcher = SimpleNamespace(index_url=index_url, source=SimpleNamespace(url=index_url))
+        solver = SimpleNamespace(releases_fetcher=releases_fetcher)
+        in_use = set()
+        max_in_use = []
+        lock = threading.Lock()
+
+        def _discover_package(virtualenv_pool, solver, all_dependency_solvers, package_name, package_version, *args):
+            with virtualenv_pool.acquire() as python_bin:
+                with lock:
+                    assert python_bin not in in_use, "One virtual environment used concurrently"
+                    in_use.add(python_bin)
+                    max_in_use.append(len(in_use))
+
+                # Simulate packages taking different time to be discovered.
+                time.sleep(random.uniform(0, 0.02))
+                dependencies = [
+                    {"normalized_package_name": name, "resolved_versions": [{"versions": versions, "index": index_url}]}
+                    for name, versions in self._DEPENDENCY_GRAPH[(package_name, package_version)]
+                ]
+
+                with lock:
+                    in_use.remove(python_bin)
+
+            metadata = {
+                "package_name": package_name,
+                "package_version": package_version,
+                "index_url": index_url,
+                "dependencies": dependencies,
+            }
+            if discovered is not None:
+                discovered(package_name, package_version)
+            return metadata, None
+
+        monkeypatch.setattr(python_module, "_discover_package", _discover_package)
+        monkeypatch.setattr(python_module, "_resolve_versions", lambda *_: ["1"])
+
+        virtualenv_pool = VirtualenvPool([f"venv-{i}/bin/python3" for i in range(workers)])
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            result = _do_resolve_index(
+                virtualenv_pool=virtualenv_pool,
+                executor=executor,
+                solver=solver,
+                all_dependency_solvers=[solver],
+                requirements=["a"],
+                exclude_packages=None,
+                transitive=True,
+                **kwargs,
+            )
+
+        return [(item["package_name"], item["package_version"]) for item in result["tree"]], max(max_in_use, default=0)
+
+    def test_do_resolve_index_serial(self, monkeypatch):
+        """Test packages are discovered in depth-first order when using one worker."""
+        packages, max_in_use = self._resolve_index(monkeypatch, workers=1)
+        assert max_in_use == 1
+        assert packages == [
+            ("a", "1"),
+            ("c", "1"),
+            ("e", "1"),
+            ("d", "1"),
+            ("f", "1"),
+            ("b", "2"),
+            ("b", "1"),
+        ]
+
+    @pytest.mark.parametrize("workers", [2, 4])
+    def test_do_resolve_index_parallel(self, monkeypatch, workers):
+        """Test packages are discovered concurrently, each exactly once and in a deterministic order."""
+        packages, max_in_use = self._resolve_index(monkeypatch, workers=workers)
+        assert max_in_use > 1
+        assert sorted(packages) == sorted(self._DEPENDENCY_GRAPH)
+        for _ in range(3):
+            assert self._resolve_index(monkeypatch, workers=workers)[0] == packages
+
+    def test_do_resolve_index_sink(self, monkeypatch):
+        """Test records are streamed to the sink as produced instead of being kept in the result."""
+        stream = io.StringIO()
+        writer = NDJSONWriter(stream)
+        packages, _ = self._resolve_index(monkeypatch, workers=2, sink=writer.write)
+        writer.write_trailer({"platform": "linux-x86_64"}, {"analyzer": "thoth-solver"})
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert packages == []
+        assert [line["type"] for line in lines] == ["tree"] * len(self._DEPENDENCY_GRAPH) + ["trailer"]
+        assert [(line["record"]["package_name"], line["record"]["package_version"]) for line in lines[:-1]] == (
+            self._resolve_index(monkeypatch, workers=2)[0]
+        )
+        assert lines[-1]["record"] == {
+            "result": {"platform": "linux-x86_64"},
+            "metadata": {"analyzer": "thoth-solver"},
+            "counts": {"tree": len(self._DEPENDENCY_GRAPH)},
+        }
+
+    def test_trailer_metadata(self, tmp_path):
+        """Test metadata in the trailer of streamed output are the same as in documents printed at once."""
+        parent = click.Context(click.Command("solver"), info_name="thoth-solver")
+        parent.params = {"verbose": False}
+        ctx = click.Context(click.Command("python"), parent=parent, info_name="python")
+        ctx.params = {"requirements": "foo", "exclude_packages": None, "workers": 2, "shard": '["1", "2"]'}
+
+        print_command_result(
+            ctx, {}, analyzer_name, analyzer_version, output=str(tmp_path / "result.json"), duration=1.0
+        )
+        with open(tmp_path / "result.json") as result_file:
+            expected = json.load(result_file)["metadata"]
+
+        metadata = _get_metadata(ctx, 1.5)
+        for key in ("datetime", "timestamp", "duration"):
+            assert type(metadata.pop(key)) is type(expected.pop(key))
+        assert metadata == expected
+
+    def test_do_resolve_index_resume(self, monkeypatch, tmp_path):
+        """Test an interrupted resolution is resumed from its checkpoint without discovering packages again."""
+        path = str(tmp_path / "checkpoint.jsonl")
+        discovered = []
+
+        def _discovered(package_name, package_version):
+            if len(discovered) == 3:
+                raise KeyboardInterrupt
+            discovered.append((package_name, package_version))
+
+        checkpoint = Checkpoint(path, "fingerprint")
+        with pytest.raises(KeyboardInterrupt):
+            self._resolve_index(monkeypatch, workers=1, checkpoint=checkpoint, discovered=_discovered)
+        checkpoint.close()
+
+        resumed = []
+        checkpoint = Checkpoint(path, "fingerprint", resume=True)
+        packages, _ = self._resolve_index(
+            monkeypatch, workers=1, checkpoint=checkpoint, discovered=lambda *package: resumed.append(package)
+        )
+        checkpoint.close()
+
+        assert packages == self._resolve_index(monkeypatch, workers=1)[0]
+        assert sorted(discovered + resumed) == sorted(self._DEPENDENCY_GRAPH)
+
+    def test_do_resolve_index_shards(self, monkeypatch):
+        """Test rounds of sharded resolutions merged cover the same packages as a resolution that is not sharded."""
+        merged = None
+        for _ in range(len(self._DEPENDENCY_GRAPH)):
+            documents = [] if merged is None else [{"result": merged}]
+            for shard in range(3):
+                result = {"tree": [], "errors": [], "unparsed": [], "unresolved": [], "deferred": []}
+                seed = get_seed_states({"result": merged})["https://example.com/simple"] if merged else None
+                self._resolve_index(
+                    monkeypatch,
+                    workers=1,
+                    sink=lambda section, record: result[section].append(record),
+                    shard=(shard, 3),
+                    seed=seed,
+                )
+                documents.append({"result": result})
+                # Each package is discovered by its shard only.
+                assert all(
+                    get_shard(record["package_name"], record["package_version"], 3) == shard
+                    for record in result["tree"]
+                )
+
+            merged = merge_documents(documents)
+            if not merged["deferred"]:
+                break
+
+        assert merged["deferred"] == []
+        assert sorted((item["package_name"], item["package_version"]) for item in merged["tree"]) == sorted(
+            self._DEPENDENCY_GRAPH
+        )
+
+    def test_do_resolve_index_budget(self, monkeypatch, tmp_path):
+        """Test packages still queued once the budget runs out are pending, a resumed run continues with them."""
+        path = str(tmp_path / "checkpoint.jsonl")
+        index_url = "https://example.com/simple"
+        result = {"tree": [], "pending": []}
+        checkpoint = Checkpoint(path, "fingerprint")
+        self._resolve_index(
+            monkeypatch,
+            workers=1,
+            sink=lambda section, record: result[section].append(record),
+            checkpoint=checkpoint,
+            budget=Budget(max_packages=3),
+        )
+        checkpoint.close()
+
+        assert [(item["package_name"], item["package_version"]) for item in result["tree"]] == [
+            ("a", "1"),
+            ("c", "1"),
+            ("e", "1"),
+        ]
+        assert result["pending"] == [
+            {"package_name": "d", "package_version": "1", "index_url": index_url},
+            {"package_name": "b", "package_version": "2", "index_url": index_url},
+            {"package_name": "b", "package_version": "1", "index_url": index_url},
+        ]
+
+        resumed = []
+        checkpoint = Checkpoint(path, "fingerprint", resume=True)
+        packages, _ = self._resolve_index(
+            monkeypatch, workers=1, checkpoint=checkpoint, discovered=lambda *package: resumed.append(package)
+        )
+        checkpoint.close()
+        assert sorted(packages) == sorted(self._DEPENDENCY_GRAPH)
+        assert sorted(resumed) == [("b", "1"), ("b", "2"), ("d", "1"), ("f", "1")]
+
+    @pytest.mark.parametrize(
+        "scheduling_policy,max_depth,expected",
+        [
+            ("breadth-first", None, ["a", "b", "b", "c", "d", "e", "f"]),
+            ("depth-limited", 1, ["a", "c", "b", "b", "d", "e", "f"]),
+        ],
+    )
+    def test_do_resolve_index_scheduling(self, monkeypatch, scheduling_policy, max_depth, expected):
+        """Test packages are discovered in the order given by the scheduling policy."""
+        packages, _ = self._resolve_index(
+            monkeypatch, workers=1, scheduling_policy=scheduling_policy, max_depth=max_depth
+        )
+        assert [package_name for package_name, _ in packages] == expected
+        assert sorted(packages) == sorted(self._DEPENDENCY_GRAPH)
+
+    @pytest.mark.parametrize("pipeline_depth,overlapped", [(0, False), (1, True)])
+    def test_do_resolve_index_pipeline(self, monkeypatch, pipeline_depth, overlapped):
+        """Test packages are installed while packages installed earlier finish work done over network."""
+        index_url = "https://example.com/simple"
+        releases_fetcher = SimpleNamespace(index_url=index_url, source=SimpleNamespace(url=index_url))
+        solver = SimpleNamespace(releases_fetcher=releases_fetcher)
+        installed = {"a": threading.Event(), "b": threading.Event()}
+        overlaps = []
+
+        def _extract_package_metadata(python_bin, solver, package_name, package_version, *args):
+            installed[package_name].set()
+            metadata = {"package_version": package_version, "importlib_metadata": {"metadata": {}}, "dependencies": []}
+            return package_name, metadata, None
+
+        def _fill_hashes(source, package_name, package_version, extracted_metadata):
+            # Wait for the other package to be installed while this one has its virtual environment returned.
+            other = "a" if package_name == "b" else "b"
+            overlaps.append(installed[other].wait(timeout=0 if not overlapped else 10))
+
+        monkeypatch.setattr(python_module, "_extract_package_metadata", _extract_package_metadata)
+        monkeypatch.setattr(python_module, "_fill_hashes", _fill_hashes)
+        monkeypatch.setattr(python_module, "detect_license", lambda *args, **kwargs: None)
+        monkeypatch.setattr(python_module, "_resolve_versions", lambda *_: ["1"])
+
+        with ThreadPoolExecutor(max_workers=1 + pipeline_depth) as executor:
+            result = _do_resolve_index(
+                virtualenv_pool=VirtualenvPool(["venv/bin/python3"]),
+                executor=executor,
+                solver=solver,
+                all_dependency_solvers=[solver],
+                requirements=["a", "b"],
+                exclude_packages=None,
+                transitive=True,
+                pipeline_depth=pipeline_depth,
+            )
+
+        assert [item["package_version_requested"] for item in result["tree"]] == ["1", "1"]
+        assert overlaps[0] is overlapped
+
+    def test_resolve_dependencies_concurrently(self, monkeypatch):
+        """Test versions are looked up on all indexes concurrently, results are kept in order of indexes."""
+        solvers = [
+            SimpleNamespace(releases_fetcher=SimpleNamespace(index_url=f"https://index-{i}.example.com/simple"))
+            for i in range(3)
+        ]
+        dependencies = [
+            {"normalized_package_name": name, "specifier": ">=1.0", "resolved_versions": []}
+            for name in ("six", "attrs")
+        ]
+        # All the lookups have to be in flight at once to pass the barrier.
+        barrier = threading.Barrier(len(solvers) * len(dependencies), timeout=10)
+
+        def _resolve_versions(solver, package_name, version_spec):
+            barrier.wait()
+            return [f"{package_name}-{solver.releases_fetcher.index_url}"]
+
+        monkeypatch.setattr(python_module, "_resolve_versions", _resolve_versions)
+        with ThreadPoolExecutor(max_workers=len(solvers) * len(dependencies)) as lookup_executor:
+            _resolve_dependencies(solvers, dependencies, lookup_executor)
+
+        for dependency in dependencies:
+            assert dependency["resolved_versions"] == [
+                {
+                    "versions": [f"{dependency['normalized_package_name']}-{solver.releases_fetcher.index_url}"],
+                    "index": solver.releases_fetcher.index_url,
+                }
+                for solver in solvers
+            ]
+
+    def test_install_requirement_target(self, venv, tmp_path):
+        """Test installing into a target directory takes precedence over the environment, which is left untouched."""
+        index_dir = tmp_path / "index"
+        index_dir.mkdir()
+        installed_wheel = self.make_wheel(str(tmp_path), "foo-bar", "1.0.0")
+        self.make_wheel(str(index_dir), "foo-bar", "2.0.0", requires=["six"])
+        subprocess.check_call([venv.python, "-m", "pip", "install", "--no-deps", installed_wheel])
+
+        with IndexServer(str(index_dir)) as index:
+            with _install_requirement_target(venv.python, "foo-bar", "2.0.0", index.url) as target:
+                name, metadata = get_distribution_metadata(venv.python, "foo-bar", target)
+                assert name == "foo-bar"
+                assert metadata["version"] == "2.0.0"
+                assert metadata["requires"] == ["six"]
+
+        assert not Path(target).exists()
+        assert get_distribution_metadata(venv.python, "foo-bar")[1]["version"] == "1.0.0"
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test persistent cache of package analysis results."""
+
+from types import SimpleNamespace
+
+from tests.base_test import SolverTestCase
+
+from thoth.solver.python import python as python_module
+from thoth.solver.python.python import _discover_package
+from thoth.solver.python.result_cache import compute_fingerprint
+from thoth.solver.python.result_cache import ResultCache
+from thoth.solver.python.virtualenv_pool import VirtualenvPool
+
+
+class TestResultCache(SolverTestCase):
+    """Test persistent cache of package analysis results."""
+
+    _INDEX_URL = "https://example.com/simple"
+
+    def test_put_get(self, tmp_path):
+        """Test results are stored per environment fingerprint and persist across runs."""
+        path = str(tmp_path / "results.sqlite")
+        fingerprint = compute_fingerprint(platform="linux-x86_64", environment_packages=[])
+        assert fingerprint == compute_fingerprint(environment_packages=[], platform="linux-x86_64")
+        assert fingerprint != compute_fingerprint(platform="linux-aarch64", environment_packages=[])
+
+        cache = ResultCache(path, fingerprint)
+        assert cache.get(self._INDEX_URL, "foo", "1.0.0") is None
+        cache.put(self._INDEX_URL, "Foo_Bar", "1.0.0", {"package_name": "Foo_Bar"})
+        cache.close()
+
+        cache = ResultCache(path, fingerprint)
+        assert cache.get(self._INDEX_URL, "foo-bar", "1.0.0") == {"package_name": "Foo_Bar"}
+        assert cache.get(self._INDEX_URL, "foo-bar", "2.0.0") is None
+        assert cache.get("https://pypi.org/simple", "foo-bar", "1.0.0") is None
+        assert ResultCache(path, "other-fingerprint").get(self._INDEX_URL, "foo-bar", "1.0.0") is None
+
+        cache.invalidate(self._INDEX_URL, "foo-bar", "1.0.0")
+        assert cache.get(self._INDEX_URL, "foo-bar", "1.0.0") is None
+
+    def test_discover_package(self, tmp_path, monkeypatch):
+        """Test cached results are used, dependencies are resolved again and changed artifacts are re-analyzed."""
+        hashes = ["a" * 64]
+        analyzed = []
+        resolved = []
+
+        def _analyze_package(virtualenv_pool, solver, package_name, package_version, *args):
+            analyzed.append((package_name, package_version))
+            dependency = {"normalized_package_name": "six", "specifier": ">=1.0", "resolved_versions": []}
+            return {"package_name": package_name, "dependencies": [dependency], "sha256": list(hashes)}, None
+
+        def _resolve_versions(solver, package_name, version_spec):
+            resolved.append(package_name)
+            return ["1.16.0"]
+
+        monkeypatch.setattr(python_module, "_analyze_package", _analyze_package)
+        monkeypatch.setattr(python_module, "_resolve_versions", _resolve_versions)
+        releases_fetcher = SimpleNamespace(
+            index_url=self._INDEX_URL,
+            fetch_package_hashes=lambda name, version: [{"sha256": h} for h in hashes],
+        )
+        solver = SimpleNamespace(releases_fetcher=releases_fetcher)
+        cache = ResultCache(str(tmp_path / "results.sqlite"), "fingerprint")
+        pool = VirtualenvPool(["python3"])
+
+        results = [_discover_package(pool, solver, [solver], "foo", "1.0.0", result_cache=cache)[0] for _ in range(2)]
+        assert analyzed == [("foo", "1.0.0")]
+        assert resolved == ["six", "six"]
+        # Timings differ across runs, the cached result was not analyzed again.
+        timings = [result.pop("timings") for result in results]
+        assert "cache" in timings[1] and "dependencies" in timings[1]
+        assert results[0] == results[1]
+        assert results[1]["dependencies"][0]["resolved_versions"] == [
+            {"versions": ["1.16.0"], "index": self._INDEX_URL},
+        ]
+
+        hashes.append("b" * 64)
+        result, error = _discover_package(pool, solver, [solver], "foo", "1.0.0", result_cache=cache)
+        assert error is None
+        assert analyzed == [("foo", "1.0.0"), ("foo", "1.0.0")]
+        assert cache.get(self._INDEX_URL, "foo", "1.0.0")["sha256"] == hashes
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test scheduling policies of the discovery loop."""
+
+import pytest
+from tests.base_test import SolverTestCase
+
+from thoth.solver.python.scheduler import SCHEDULING_POLICIES
+from thoth.solver.python.scheduler import create_scheduler
+
+_SIZES = {("a", "1"): 300, ("a", "2"): 100, ("b", "1"): None, ("c", "1"): 200}
+
+
+class TestScheduler(SolverTestCase):
+    """Test scheduling policies of the discovery loop."""
+
+    @staticmethod
+    def _drain(scheduler, items):
+        """Queue the given packages with their depths and pick all of them."""
+        for entry, depth in items:
+            scheduler.push(entry, depth)
+
+        result = []
+        while scheduler:
+            result.append(scheduler.pop())
+
+        return result
+
+    @pytest.mark.parametrize(
+        "policy,expected",
+        [
+            ("depth-first", [("c", "1"), ("b", "1"), ("a", "2"), ("a", "1")]),
+            ("breadth-first", [("a", "1"), ("a", "2"), ("b", "1"), ("c", "1")]),
+            ("newest-version-first", [("a", "2"), ("b", "1"), ("c", "1"), ("a", "1")]),
+            ("smallest-artifact-first", [("a", "2"), ("c", "1"), ("a", "1"), ("b", "1")]),
+        ],
+    )
+    def test_order(self, policy, expected):
+        """Test packages are picked in the order given by the policy."""
+        scheduler = create_scheduler(policy, artifact_size=lambda *entry: _SIZES[entry])
+        items = [(entry, 0) for entry in _SIZES]
+        assert [entry for entry, _ in self._drain(scheduler, items)] == expected
+
+    def test_newest_version_first_invalid_version(self):
+        """Test versions not compliant with PEP-440 are picked as the oldest ones."""
+        scheduler = create_scheduler("newest-version-first")
+        items = [(("a", "1.0"), 0), (("a", "foo-bar"), 0), (("a", "2.0"), 0), (("a", "1.0.dev1"), 0)]
+        assert [entry for entry, _ in self._drain(scheduler, items)] == [
+            ("a", "2.0"),
+            ("a", "1.0"),
+            ("a", "1.0.dev1"),
+            ("a", "foo-bar"),
+        ]
+
+    def test_depth_limited(self):
+        """Test packages deeper than the limit are picked once no other packages are queued."""
+        scheduler = create_scheduler("depth-limited", max_depth=1)
+        items = [(("a", "1"), 0), (("b", "1"), 2), (("c", "1"), 1), (("d", "1"), 3)]
+        assert self._drain(scheduler, items) == [(("c", "1"), 1), (("a", "1"), 0), (("b", "1"), 2), (("d", "1"), 3)]
+
+    def test_stats(self):
+        """Test statistics of packages picked and queued."""
+        scheduler = create_scheduler("breadth-first")
+        scheduler.push(("a", "1"), 0)
+        scheduler.push(("b", "1"), 1)
+        scheduler.pop()
+
+        stats = scheduler.stats()
+        assert stats["policy"] == "breadth-first"
+        assert stats["picked"] == 1
+        assert stats["queued"] == 1
+        assert stats["elapsed"] >= 0
+        scheduler.report("https://pypi.org/simple", force=True)
+
+    @pytest.mark.parametrize("policy", ["depth-limited", "smallest-artifact-first", "unknown"])
+    def test_create_scheduler_invalid(self, policy):
+        """Test schedulers are not created without arguments they require or for unknown policies."""
+        with pytest.raises(ValueError):
+            create_scheduler(policy)
+
+    def test_policies(self):
+        """Test a scheduler can be created for each policy listed."""
+        for policy in SCHEDULING_POLICIES:
+            scheduler = create_scheduler(policy, max_depth=0, artifact_size=lambda *_: None)
+            assert scheduler.policy == policy
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test HTTP sessions shared per host."""
+
+import pytest
+from tests.base_test import SolverTestCase
+
+from thoth.solver.python import sessions
+from thoth.solver.python.sessions import SessionRegistry
+
+
+class TestSessionRegistry(SolverTestCase):
+    """Test HTTP sessions shared per host."""
+
+    def test_get(self):
+        """Test one session is used per host, regardless of paths and case of the host."""
+        registry = SessionRegistry(pool_size=4)
+        session = registry.get("https://pypi.org/simple/foo/")
+
+        assert registry.get("https://PyPI.org/simple/bar/") is session
+        assert registry.get("https://files.pythonhosted.org/packages/foo.whl") is not session
+        assert registry.get("http://pypi.org/simple/foo/") is not session
+        assert session.get_adapter("https://pypi.org/simple/")._pool_maxsize == 4
+
+    def test_close(self):
+        """Test sessions are created again once closed."""
+        registry = SessionRegistry()
+        session = registry.get("https://pypi.org/simple/")
+        registry.close()
+
+        assert registry.get("https://pypi.org/simple/") is not session
+
+    def test_invalid_pool_size(self):
+        """Test pool size has to be a positive number."""
+        with pytest.raises(ValueError):
+            SessionRegistry(pool_size=0)
+
+    def test_configure_sessions(self, monkeypatch):
+        """Test sessions shared in the process are replaced once configured."""
+        monkeypatch.setattr(sessions, "_REGISTRY", SessionRegistry())
+        session = sessions.get_session("https://pypi.org/simple/")
+        assert sessions.get_session("https://pypi.org/simple/foo/") is session
+
+        sessions.configure_sessions(32)
+
+        configured = sessions.get_session("https://pypi.org/simple/")
+        assert configured is not session
+        assert configured.get_adapter("https://pypi.org/simple/")._pool_maxsize == 32
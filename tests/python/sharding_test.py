@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test splitting a resolution across multiple solver runs."""
+
+import io
+import json
+
+import pytest
+from tests.base_test import SolverTestCase
+
+from thoth.solver.exceptions import MergeError
+from thoth.solver.output import NDJSONWriter
+from thoth.solver.output import read_document
+from thoth.solver.python.sharding import get_seed_states
+from thoth.solver.python.sharding import get_shard
+from thoth.solver.python.sharding import merge_documents
+from thoth.solver.python.sharding import parse_shard
+
+_INDEX_URL = "https://pypi.org/simple"
+
+
+class TestSharding(SolverTestCase):
+    """Test splitting a resolution across multiple solver runs."""
+
+    @staticmethod
+    def _document(tree=(), errors=(), deferred=(), unresolved=(), platform="linux-x86_64"):
+        """Create a solver document with the given records."""
+        return {
+            "result": {
+                "environment": {"python_version": "3.11"},
+                "environment_packages": [],
+                "platform": platform,
+                "tree": [
+                    {
+                        "package_name": name,
+                        "package_version": version,
+                        "package_version_requested": version,
+                        "index_url": _INDEX_URL,
+                    }
+                    for name, version in tree
+                ],
+                "errors": [
+                    {"package_name": name, "package_version": version, "index_url": _INDEX_URL}
+                    for name, version in errors
+                ],
+                "unparsed": [],
+                "unresolved": list(unresolved),
+                "deferred": [
+                    {"package_name": name, "package_version": version, "index_url": _INDEX_URL}
+                    for name, version in deferred
+                ],
+            },
+        }
+
+    @pytest.mark.parametrize("value,expected", [("0/1", (0, 1)), ("2/3", (2, 3))])
+    def test_parse_shard(self, value, expected):
+        """Test parsing shard specification."""
+        assert parse_shard(value) == expected
+
+    @pytest.mark.parametrize("value", ["3/3", "-1/3", "0/0", "1", "a/b", "1/2/3"])
+    def test_parse_shard_invalid(self, value):
+        """Test invalid shard specifications are rejected."""
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+    def test_get_shard(self):
+        """Test packages are assigned to shards based on their normalized name and version."""
+        assert get_shard("Flask_Cors", "1.0", 4) == get_shard("flask-cors", "1.0", 4)
+        shards = {get_shard(f"package-{i}", "1.0", 4) for i in range(100)}
+        assert shards == {0, 1, 2, 3}
+
+    def test_merge_documents(self):
+        """Test records are merged, packages discovered by any shard are no longer deferred."""
+        unresolved = {"package_name": "foo", "version_spec": ">=1", "index_url": _INDEX_URL}
+        merged = merge_documents(
+            [
+                self._document(tree=[("a", "1")], deferred=[("b", "1"), ("c", "1")], unresolved=[unresolved]),
+                self._document(tree=[("B", "1")], errors=[("d", "1")], deferred=[("a", "1"), ("e", "1")]),
+                self._document(deferred=[("e", "1"), ("c", "1")], unresolved=[unresolved]),
+            ]
+        )
+
+        assert [(item["package_name"], item["package_version"]) for item in merged["tree"]] == [("a", "1"), ("B", "1")]
+        assert [(item["package_name"], item["package_version"]) for item in merged["errors"]] == [("d", "1")]
+        assert [(item["package_name"], item["package_version"]) for item in merged["deferred"]] == [
+            ("c", "1"),
+            ("e", "1"),
+        ]
+        assert merged["unresolved"] == [unresolved]
+        assert merged["platform"] == "linux-x86_64"
+
+    def test_merge_documents_environment_mismatch(self):
+        """Test documents produced in different solver environments are not merged."""
+        with pytest.raises(MergeError):
+            merge_documents([self._document(), self._document(platform="linux-aarch64")])
+
+    def test_get_seed_states(self):
+        """Test deferred packages are queued, packages discovered are seen."""
+        states = get_seed_states(self._document(tree=[("A", "1")], errors=[("b", "1")], deferred=[("c", "1")]))
+
+        assert list(states) == [_INDEX_URL]
+        assert states[_INDEX_URL].queue == [("c", "1")]
+        assert states[_INDEX_URL].seen == {("a", "1"), ("b", "1"), ("c", "1")}
+        assert states[_INDEX_URL].records == []
+
+    def test_merge_documents_pending(self):
+        """Test packages pending in a shard that ran out of its budget are deferred to the next round."""
+        document = self._document(tree=[("a", "1")])
+        document["result"]["pending"] = [{"package_name": "b", "package_version": "1", "index_url": _INDEX_URL}]
+        merged = merge_documents([document, self._document(tree=[("c", "1")], deferred=[("a", "1")])])
+        assert merged["deferred"] == [{"package_name": "b", "package_version": "1", "index_url": _INDEX_URL}]
+
+    def test_merge_ndjson_documents(self):
+        """Test documents written as newline delimited JSON are read back and merged, truncated ones are rejected."""
+        stream = io.StringIO()
+        writer = NDJSONWriter(stream)
+        document = self._document(tree=[("a", "1")], deferred=[("b", "1"), ("c", "1")])
+        for section in ("tree", "deferred"):
+            for record in document["result"].pop(section):
+                writer.write(section, record)
+        writer.write_trailer(document["result"], {"analyzer": "thoth-solver"})
+
+        read = read_document(io.StringIO(stream.getvalue()))
+        assert read["metadata"] == {"analyzer": "thoth-solver"}
+        assert [item["package_name"] for item in read["result"]["deferred"]] == ["b", "c"]
+        assert read["result"]["errors"] == []
+
+        merged = merge_documents([read, self._document(tree=[("b", "1")])])
+        assert [item["package_name"] for item in merged["tree"]] == ["a", "b"]
+        assert [item["package_name"] for item in merged["deferred"]] == ["c"]
+
+        with pytest.raises(ValueError):
+            read_document(io.StringIO("".join(stream.getvalue().splitlines(keepends=True)[:-1])))
+        with pytest.raises(ValueError):
+            read_document(io.StringIO("".join(stream.getvalue().splitlines(keepends=True)[1:])))
+
+    def test_read_json_document(self):
+        """Test documents written as JSON are read as they are."""
+        document = self._document(tree=[("a", "1")])
+        assert read_document(io.StringIO(json.dumps(document, indent=2))) == document
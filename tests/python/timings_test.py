@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test timings of stages of package discovery."""
+
+import time
+
+from tests.base_test import SolverTestCase
+
+from thoth.solver.python.timings import StageStats
+from thoth.solver.python.timings import collect
+from thoth.solver.python.timings import stage
+from thoth.solver.python.timings import write_textfile
+
+
+class TestTimings(SolverTestCase):
+    """Test timings of stages of package discovery."""
+
+    def test_collect(self, monkeypatch):
+        """Test time spent in stages is collected, repeated stages are summed."""
+        clock = iter([0.0, 1.0, 1.0, 3.0, 5.0, 5.5])
+        monkeypatch.setattr(time, "monotonic", lambda: next(clock))
+
+        with collect() as timings:
+            with stage("install"):
+                pass
+            with stage("metadata"):
+                pass
+            with stage("install"):
+                pass
+
+        assert timings == {"install": 1.5, "metadata": 2.0}
+        # Stages are not measured outside of collection.
+        with stage("install"):
+            pass
+
+    def test_summary(self):
+        """Test aggregates of stage timings, stages are listed in the order they are run."""
+        stats = StageStats()
+        for seconds in range(1, 101):
+            stats.add({"install": float(seconds), "cache": 0.5})
+        stats.add(None)
+
+        summary = stats.summary()
+        assert list(summary) == ["cache", "install"]
+        assert summary["install"] == {"count": 100, "sum": 5050.0, "max": 100.0, "p50": 50.0, "p95": 95.0}
+        assert summary["cache"]["count"] == 100
+
+    def test_write_textfile(self, tmp_path):
+        """Test stage timings are written in Prometheus text format."""
+        path = tmp_path / "solver.prom"
+        write_textfile(str(path), {"install": {"count": 2, "sum": 3.0, "max": 2.0, "p50": 1.0, "p95": 2.0}})
+
+        lines = path.read_text().splitlines()
+        assert 'thoth_solver_stage_duration_seconds{stage="install",quantile="0.5"} 1.0' in lines
+        assert 'thoth_solver_stage_duration_seconds_count{stage="install"} 2' in lines
+        assert 'thoth_solver_stage_duration_seconds_max{stage="install"} 2.0' in lines
+        assert [item.name for item in tmp_path.iterdir()] == ["solver.prom"]
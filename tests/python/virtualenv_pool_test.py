@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test virtual environment pool and template cloning."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+from tests.base_test import SolverTestCase
+
+from thoth.solver.python.virtualenv_pool import VirtualenvPool
+from thoth.solver.python.virtualenv_pool import VirtualenvTemplate
+
+
+class TestVirtualenvPool(SolverTestCase):
+    """Test virtual environment pool and template cloning."""
+
+    @staticmethod
+    def _make_template(directory):
+        """Create a template with a fake virtual environment so that no virtual environment is built."""
+        template = VirtualenvTemplate(str(directory), sys.executable)
+        os.makedirs(os.path.join(template.template_path, "bin"))
+        with open(os.path.join(template.template_path, "bin", os.path.basename(sys.executable)), "w") as python_bin:
+            python_bin.write("#!/bin/sh\n")
+        with open(os.path.join(template.template_path, "pyvenv.cfg"), "w") as config:
+            config.write("home = /usr/bin\n")
+        return template
+
+    def test_acquire_release(self, tmp_path):
+        """Test clones are handed out exclusively and removed on release."""
+        template = self._make_template(tmp_path)
+        template.replenish(2)
+        assert len(os.listdir(os.path.join(template.directory, f"clones-{template.fingerprint}", "ready"))) == 2
+
+        first, second, third = template.acquire(), template.acquire(), template.acquire()
+        assert len({first, second, third}) == 3
+        for python_bin in (first, second, third):
+            clone_path = os.path.dirname(os.path.dirname(python_bin))
+            assert os.path.dirname(clone_path).endswith("used")
+            with open(os.path.join(clone_path, "pyvenv.cfg")) as config:
+                assert config.read() == "home = /usr/bin\n"
+
+        template.release(first)
+        assert not os.path.exists(os.path.dirname(os.path.dirname(first)))
+        assert os.path.isfile(os.path.join(template.template_path, "pyvenv.cfg"))
+
+    def test_clone_fallback(self, tmp_path, monkeypatch):
+        """Test falling back to hardlinks if reflinks are not supported."""
+        run = subprocess.run
+
+        def _run(cmd, *args, **kwargs):
+            if cmd[0] == "cp":
+                raise subprocess.CalledProcessError(1, cmd)
+            return run(cmd, *args, **kwargs)
+
+        monkeypatch.setattr(subprocess, "run", _run)
+        template = self._make_template(tmp_path)
+        python_bin = template.acquire()
+
+        assert template._clone_method == "hardlink"
+        template_config = os.path.join(template.template_path, "pyvenv.cfg")
+        clone_config = os.path.join(os.path.dirname(os.path.dirname(python_bin)), "pyvenv.cfg")
+        assert os.stat(template_config).st_ino == os.stat(clone_config).st_ino
+
+    def test_from_template(self, tmp_path):
+        """Test creating a pool out of template clones, clones for the next run are prepared."""
+        template = self._make_template(tmp_path)
+        pool = VirtualenvPool.from_template(template, 2)
+        assert pool.size == 2
+
+        with pool.acquire() as python_bin:
+            assert python_bin in pool.python_bins
+
+        pool.close()
+        assert not any(os.path.exists(python_bin) for python_bin in pool.python_bins)
+        assert len(os.listdir(os.path.join(template.directory, f"clones-{template.fingerprint}", "ready"))) == 2
+
+    def test_create(self, tmp_path):
+        """Test additional virtual environments of a pool are usable clones of the given one."""
+        subprocess.check_call([sys.executable, "-m", "venv", "--without-pip", str(tmp_path / "venv")])
+        with open(tmp_path / "venv" / "marker.txt", "w") as marker:
+            marker.write("foo")
+
+        pool = VirtualenvPool.create(str(tmp_path / "venv" / "bin" / "python3"), 3)
+        assert pool.size == 3
+        for python_bin in pool.python_bins:
+            prefix = subprocess.check_output(
+                [python_bin, "-c", "import sys; print(sys.prefix)"], universal_newlines=True
+            )
+            assert prefix.strip() == os.path.dirname(os.path.dirname(os.path.abspath(python_bin)))
+            assert os.path.isfile(os.path.join(prefix.strip(), "marker.txt"))
+
+        pool.close()
+        assert [os.path.exists(python_bin) for python_bin in pool.python_bins] == [True, False, False]
+
+        with pytest.raises(ValueError):
+            # Not a virtual environment, there is no pyvenv.cfg.
+            VirtualenvPool.create(str(tmp_path / "venv-1" / "bin" / "python3"), 2)
+
+    def test_template_clone_usable(self, tmp_path):
+        """Test a clone of a real template virtual environment is usable on its own."""
+        template = VirtualenvTemplate(str(tmp_path), "python3")
+        python_bin = template.acquire()
+
+        prefix = subprocess.check_output([python_bin, "-c", "import sys; print(sys.prefix)"], universal_newlines=True)
+        assert prefix.strip() == os.path.dirname(os.path.dirname(python_bin))
+        subprocess.check_call([python_bin, "-m", "pipdeptree", "--json"], stdout=subprocess.DEVNULL)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# type: ignore
+
+"""Test gathering metadata from wheels without installing them."""
+
+import os
+import subprocess
+import zipfile
+
+import pytest
+from thoth.python import Source
+from tests.base_test import IndexServer
+from tests.base_test import SolverTestCase
+
+from thoth.solver.exceptions import RangeRequestsNotSupported
+from thoth.solver.python.artifacts import ArtifactLink
+from thoth.solver.python import artifacts as artifacts_module
+from thoth.solver.python.artifacts import fetch_core_metadata
+from thoth.solver.python.artifacts import fetch_project_index
+from thoth.solver.python.artifacts import list_artifacts
+from thoth.solver.python.artifacts import parse_project_page
+from thoth.solver.python.index_cache import IndexPage
+from thoth.solver.python.instrument import get_distribution_metadata
+from thoth.solver.python.lazy_wheel import LazyRemoteFile
+from thoth.solver.python.wheel import get_wheel_metadata
+from thoth.solver.python.wheel import read_core_metadata
+from thoth.solver.python.wheel import read_remote_wheel_metadata
+from thoth.solver.python.wheel import read_wheel_metadata
+from thoth.solver.python.wheel import select_wheel
+
+_ENTRY_POINTS = """\
+[console_scripts]
+foo-cli = foo.cli:main
+
+[foo.plugins]
+bar = foo.plugins:Bar
+"""
+
+
+class TestWheel(SolverTestCase):
+    """Test reading metadata from wheels."""
+
+    def test_read_wheel_metadata(self, tmp_path):
+        """Test reading metadata of a wheel."""
+        wheel = self.make_wheel(
+            str(tmp_path),
+            "foo-bar",
+            "1.0.0",
+            requires=["six (>=1.0)", "click ; extra == 'cli'"],
+            entry_points=_ENTRY_POINTS,
+        )
+        distribution_name, metadata = read_wheel_metadata(wheel)
+
+        assert distribution_name == "foo-bar"
+        assert metadata["version"] == "1.0.0"
+        assert metadata["requires"] == ["six (>=1.0)", "click ; extra == 'cli'"]
+        assert metadata["metadata"]["Requires-Dist"] == ["six (>=1.0)", "click ; extra == 'cli'"]
+        assert metadata["entry_points"] == [
+            {"name": "foo-cli", "value": "foo.cli:main", "group": "console_scripts"},
+            {"name": "bar", "value": "foo.plugins:Bar", "group": "foo.plugins"},
+        ]
+        assert {"hash": None, "size": None, "path": "foo_bar-1.0.0.dist-info/RECORD"} in metadata["files"]
+
+    def test_read_wheel_metadata_installed(self, tmp_path, venv):
+        """Test metadata read from a wheel match metadata of the installed wheel."""
+        wheel = self.make_wheel(str(tmp_path), "foo-bar", "1.0.0", requires=["six (>=1.0)"], entry_points=_ENTRY_POINTS)
+        subprocess.check_call([venv.python, "-m", "pip", "install", "--no-deps", wheel])
+
+        installed_name, installed_metadata = get_distribution_metadata(venv.python, "foo-bar")
+        wheel_name, wheel_metadata = read_wheel_metadata(wheel)
+        # Installers record additional files (e.g. INSTALLER, bytecode or scripts).
+        installed_files = {item["path"]: item for item in installed_metadata.pop("files")}
+        for item in wheel_metadata.pop("files"):
+            if item["hash"]:
+                assert installed_files[item["path"]] == item
+
+        assert installed_name == wheel_name
+        assert installed_metadata == wheel_metadata
+
+    @pytest.mark.parametrize(
+        "filenames,expected",
+        [
+            (["foo-1.0-py3-none-any.whl", "foo-1.0.tar.gz"], "foo-1.0-py3-none-any.whl"),
+            (
+                ["foo-1.0-py2.py3-none-any.whl", "foo-1.0-cp39-cp39-manylinux1_x86_64.whl"],
+                "foo-1.0-cp39-cp39-manylinux1_x86_64.whl",
+            ),
+            (["foo-1.0-cp27-cp27mu-manylinux1_x86_64.whl", "foo-1.0.tar.gz"], None),
+            (["foo-1.1-py3-none-any.whl"], None),
+        ],
+    )
+    def test_select_wheel(self, filenames, expected):
+        """Test selecting the most specific compatible wheel."""
+        artifacts = [ArtifactLink(filename=filename, url="https://example.com/" + filename) for filename in filenames]
+        tags = ["cp39-cp39-manylinux1_x86_64", "cp39-none-any", "py3-none-any", "py2.py3-none-any"]
+        selected = select_wheel(artifacts, "1.0", tags, "3.9.1")
+        assert (selected.filename if selected else None) == expected
+
+    def test_select_wheel_requires_python(self):
+        """Test wheels not supporting the interpreter version are not selected."""
+        artifacts = [
+            ArtifactLink(filename="foo-1.0-py3-none-any.whl", url="https://example.com/", requires_python=">=3.10")
+        ]
+        assert select_wheel(artifacts, "1.0", ["py3-none-any"], "3.9.1") is None
+        assert select_wheel(artifacts, "1.0", ["py3-none-any"], "3.10.0") is artifacts[0]
+
+    def test_parse_project_page(self):
+        """Test parsing a project page of a simple repository API."""
+        page = """<html><body>
+            <a href="../../packages/foo-1.0-py3-none-any.whl#sha256=abcd" data-requires-python="&gt;=3.6">foo</a>
+            <a href="https://files.example.com/foo-1.0.tar.gz" data-yanked="">foo-1.0.tar.gz</a>
+            <a href="../">parent</a>
+        </body></html>"""
+        assert parse_project_page(page, "https://example.com/simple/foo/") == [
+            ArtifactLink(
+                filename="foo-1.0-py3-none-any.whl",
+                url="https://example.com/packages/foo-1.0-py3-none-any.whl",
+                sha256="abcd",
+                requires_python=">=3.6",
+            ),
+            ArtifactLink(filename="foo-1.0.tar.gz", url="https://files.example.com/foo-1.0.tar.gz", yanked=True),
+        ]
+
+    def test_fetch_project_index_versions(self, monkeypatch):
+        """Test versions are parsed out of wheel and source distribution names listed on a project page."""
+        filenames = [
+            "foo-2.0-py3-none-any.whl",
+            "foo-2.0.tar.gz",
+            "Foo-1.0.post1.tar.gz",
+            "foo-1.0-custom.tar.gz",
+            "foo-0.9.zip",
+            "foo-0.8-py2.7.egg",
+        ]
+        page = "\n".join(f'<a href="/packages/{filename}">{filename}</a>' for filename in filenames)
+        monkeypatch.setattr(
+            artifacts_module,
+            "get_page",
+            lambda url, **_: IndexPage(url=url, status_code=200, text=page),
+        )
+
+        project_index = fetch_project_index(Source("https://example.com/simple"), "Foo")
+        assert project_index.versions == ["2.0", "1.0.post1", "1.0-custom"]
+        assert [artifact.filename for artifact in project_index.get_artifacts("1.0-custom")] == [
+            "foo-1.0-custom.tar.gz"
+        ]
+
+    @pytest.mark.parametrize(
+        "attribute,core_metadata,core_metadata_sha256",
+        [
+            ("", False, None),
+            ('data-dist-info-metadata="true"', True, None),
+            ('data-core-metadata="sha256=beef"', True, "beef"),
+            ('data-core-metadata="sha256=beef" data-dist-info-metadata="sha256=beef"', True, "beef"),
+        ],
+    )
+    def test_parse_project_page_core_metadata(self, attribute, core_metadata, core_metadata_sha256):
+        """Test parsing availability of core metadata files (PEP-658 and PEP-714)."""
+        page = f'<a href="foo-1.0-py3-none-any.whl#sha256=abcd" {attribute}>foo-1.0-py3-none-any.whl</a>'
+        (artifact,) = parse_project_page(page, "https://example.com/simple/foo/")
+        assert artifact.core_metadata is core_metadata
+        assert artifact.core_metadata_sha256 == core_metadata_sha256
+        assert artifact.core_metadata_url == "https://example.com/simple/foo/foo-1.0-py3-none-any.whl.metadata"
+
+    def test_read_core_metadata(self, tmp_path):
+        """Test core metadata provide the same metadata as the wheel, except for entry points and files."""
+        wheel = self.make_wheel(str(tmp_path), "foo-bar", "1.0.0", requires=["six (>=1.0)"], entry_points=_ENTRY_POINTS)
+        with zipfile.ZipFile(wheel) as archive:
+            content = archive.read("foo_bar-1.0.0.dist-info/METADATA").decode()
+
+        wheel_name, wheel_metadata = read_wheel_metadata(wheel)
+        core_name, core_metadata = read_core_metadata(content)
+        assert core_name == wheel_name
+        assert core_metadata.pop("entry_points") == []
+        assert core_metadata.pop("files") == []
+        assert core_metadata.pop("metadata_source") == "core-metadata"
+        wheel_metadata.pop("entry_points")
+        wheel_metadata.pop("files")
+        assert core_metadata == wheel_metadata
+
+    def test_lazy_remote_file(self, tmp_path):
+        """Test reading a remote file lazily provides the same content as the file."""
+        wheel = self.make_wheel(str(tmp_path), "foo", "1.0.0", payload_size=300 * 1024)
+        with open(wheel, "rb") as wheel_file:
+            content = wheel_file.read()
+
+        with IndexServer(str(tmp_path)) as index:
+            url = index.url.replace("/simple", "/packages/") + os.path.basename(wheel)
+            remote_file = LazyRemoteFile(url, block_size=1024, tail_size=4096)
+            assert remote_file.seek(0, os.SEEK_END) == len(content)
+            for offset, size in ((0, 10), (1000, 70000), (len(content) - 5, 10), (150000, 1)):
+                remote_file.seek(offset)
+                assert remote_file.read(size) == content[offset : offset + size]
+
+            assert remote_file.bytes_fetched < 100 * 1024
+
+    def test_read_remote_wheel_metadata(self, tmp_path):
+        """Test reading metadata of a remote wheel fetches only parts of it."""
+        wheel = self.make_wheel(
+            str(tmp_path),
+            "foo",
+            "1.0.0",
+            requires=["six"],
+            entry_points=_ENTRY_POINTS,
+            payload_size=2 * 1024 * 1024,
+        )
+
+        with IndexServer(str(tmp_path)) as index:
+            artifacts = list_artifacts(Source(index.url), "foo")
+            assert [artifact.filename for artifact in artifacts] == [os.path.basename(wheel)]
+            assert read_remote_wheel_metadata(artifacts[0]) == read_wheel_metadata(wheel)
+
+        fetched = [range_ for path, range_ in index.requests if path.startswith("/packages/")]
+        assert fetched == ["bytes=-262144"]
+
+    def test_read_remote_wheel_metadata_no_range_requests(self, tmp_path):
+        """Test whole wheel is downloaded if range requests are not supported."""
+        wheel = self.make_wheel(str(tmp_path), "foo", "1.0.0", entry_points=_ENTRY_POINTS)
+
+        with IndexServer(str(tmp_path), range_requests=False) as index:
+            artifact = list_artifacts(Source(index.url), "foo")[0]
+            with pytest.raises(RangeRequestsNotSupported):
+                read_remote_wheel_metadata(artifact)
+
+            assert get_wheel_metadata(artifact) == read_wheel_metadata(wheel)
+
+    def test_fetch_core_metadata(self, tmp_path):
+        """Test fetching core metadata served by an index."""
+        wheel = self.make_wheel(str(tmp_path), "foo", "1.0.0", requires=["six"])
+
+        with IndexServer(str(tmp_path)) as index:
+            source = Source(index.url)
+            artifact = list_artifacts(source, "foo")[0]
+            assert artifact.core_metadata is True
+            assert read_core_metadata(fetch_core_metadata(source, artifact))[1]["requires"] == ["six"]
+
+        assert read_wheel_metadata(wheel)[1]["requires"] == ["six"]
@@ -21,21 +21,50 @@
 import sys
 
 import click
+import datetime
+import distro
+import json
 import logging
 import os
+import platform
 import resource
 import time
+from typing import Optional
 
 from thoth.analyzer import print_command_result
+from thoth.common import datetime2datetime_str
 from thoth.common import init_logging
 
 from thoth.solver import __title__ as analyzer_name
 from thoth.solver import __version__ as analyzer_version
+from thoth.solver.output import NDJSONWriter
+from thoth.solver.output import STREAMED_SECTIONS
+from thoth.solver.output import read_document
+from thoth.solver.exceptions import MergeError
 from thoth.solver.python import resolve as resolve_python
+from thoth.solver.python.profiling import Profiler
+from thoth.solver.python.scheduler import SCHEDULING_POLICIES
+from thoth.solver.python.sharding import merge_documents
+from thoth.solver.python.sharding import parse_shard
+from thoth.solver.python.timings import write_textfile
 
 init_logging()
 
 _LOG = logging.getLogger("thoth.solver")
+_OS_RELEASE_KEYS = frozenset(
+    (
+        "id",
+        "name",
+        "platform_id",
+        "redhat_bugzilla_product",
+        "redhat_bugzilla_product_version",
+        "redhat_support_product",
+        "redhat_support_product_version",
+        "variant_id",
+        "version",
+        "version_id",
+    )
+)
 
 
 def _print_version(ctx, _, value):
@@ -69,6 +98,82 @@ def cli(ctx=None, verbose=0):
     _LOG.debug("Debug mode is on")
 
 
+def _get_arguments(click_ctx: click.Context) -> dict:
+    """Get arguments supplied to the command and its parent commands, keyed by command name."""
+    arguments = {}
+    ctx = click_ctx
+    while ctx:
+        report = {}
+        for key, value in ctx.params.items():
+            # Arguments provided as JSON are reported structured, as print_command_result does.
+            try:
+                parsed_value = json.loads(value)
+                if isinstance(parsed_value, (dict, list)) or parsed_value is None:
+                    value = parsed_value
+            except Exception:
+                pass
+            report[key] = value
+
+        arguments[ctx.info_name] = report
+        ctx = ctx.parent
+
+    return arguments
+
+
+def _get_os_release() -> Optional[dict]:
+    """Get the most important information about the operating system from /etc/os-release, if present."""
+    try:
+        with open("/etc/os-release") as os_release_file:
+            content = os_release_file.read()
+    except OSError:
+        return None
+
+    result = {}
+    for line in content.splitlines():
+        key, sep, value = line.partition("=")
+        if sep and key.lower() in _OS_RELEASE_KEYS:
+            result[key.lower()] = value.strip('"')
+
+    return result
+
+
+def _get_metadata(click_ctx: click.Context, duration: float) -> dict:
+    """Get metadata about the run, the same ones as print_command_result reports for documents printed at once."""
+    return {
+        "analyzer": analyzer_name,
+        "datetime": datetime2datetime_str(datetime.datetime.utcnow()),
+        "document_id": os.getenv("THOTH_DOCUMENT_ID"),
+        "timestamp": int(time.time()),
+        "hostname": platform.node(),
+        "analyzer_version": analyzer_version,
+        "distribution": distro.info(),
+        "arguments": _get_arguments(click_ctx),
+        "duration": int(duration),
+        "python": {
+            "major": sys.version_info.major,
+            "minor": sys.version_info.minor,
+            "micro": sys.version_info.micro,
+            "releaselevel": sys.version_info.releaselevel,
+            "serial": sys.version_info.serial,
+            "api_version": sys.api_version,
+            "implementation_name": sys.implementation.name,
+        },
+        "os_release": _get_os_release(),
+        "thoth_deployment_name": os.getenv("THOTH_DEPLOYMENT_NAME"),
+    }
+
+
+def _parse_shard(ctx, _, value):
+    """Parse shard specification in the form of "i/N"."""
+    if value is None:
+        return None
+
+    try:
+        return parse_shard(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+
+
 def _limit_memory() -> None:
     """Limit memory to cgroup limit if we're inside a container.
 
@@ -131,6 +236,15 @@ def _limit_memory() -> None:
     help="Output file or remote API to print results to, in case of URL a POST request is issued.",
 )
 @click.option("--no-pretty", "-P", is_flag=True, help="Do not print results nicely.")
+@click.option(
+    "--output-format",
+    type=click.Choice(["json", "ndjson"]),
+    envvar="THOTH_SOLVER_OUTPUT_FORMAT",
+    show_default=True,
+    default="json",
+    help="Format of results - a single JSON document written at the end of the run, or newline delimited JSON with "
+    "records written as soon as they are produced, followed by a trailer with the environment and metadata.",
+)
 @click.option(
     "--exclude-packages",
     "-e",
@@ -153,6 +267,15 @@ def _limit_memory() -> None:
     metavar="VENV",
     help="Virtual environment to be used - if not provided a new one is created in the current directory.",
 )
+@click.option(
+    "--virtualenv-pool",
+    type=str,
+    required=False,
+    envvar="THOTH_SOLVER_VIRTUALENV_POOL",
+    metavar="DIR",
+    help="Directory with a template virtual environment and its pre-warmed clones shared across runs - used "
+    "instead of creating a new virtual environment if --virtualenv is not provided.",
+)
 @click.option(
     "--limited-output",
     "-l",
@@ -160,6 +283,183 @@ def _limit_memory() -> None:
     envvar="THOTH_SOLVER_LIMITED_OUTPUT",
     help="Produce limited output that states only dependencies.",
 )
+@click.option(
+    "--metadata-source",
+    type=click.Choice(["install", "wheel", "core-metadata"]),
+    envvar="THOTH_SOLVER_METADATA_SOURCE",
+    show_default=True,
+    default="install",
+    help="Source of package metadata - install packages into the virtual environment, read metadata "
+    "from a compatible wheel published on the index or use only core metadata of a compatible wheel served "
+    "by the index (PEP-658), packages for which the given source is not available are installed.",
+)
+@click.option(
+    "--install-strategy",
+    type=click.Choice(["environment", "target"]),
+    envvar="THOTH_SOLVER_INSTALL_STRATEGY",
+    show_default=True,
+    default="environment",
+    help="How packages are installed to obtain their metadata - install into the virtual environment and "
+    "uninstall afterwards, or install each package into its own throwaway target directory layered over the "
+    "virtual environment which is left untouched.",
+)
+@click.option(
+    "--artifact-cache",
+    type=str,
+    required=False,
+    envvar="THOTH_SOLVER_ARTIFACT_CACHE",
+    metavar="DIR",
+    help="Directory with a cache of installed artifacts keyed by their sha256 digests, shared across runs.",
+)
+@click.option(
+    "--artifact-cache-size",
+    type=click.IntRange(min=0),
+    envvar="THOTH_SOLVER_ARTIFACT_CACHE_SIZE",
+    show_default=True,
+    default=10240,
+    metavar="MiB",
+    help="Maximum size of the artifact cache in MiB, least recently used artifacts are evicted first.",
+)
+@click.option(
+    "--result-cache",
+    type=str,
+    required=False,
+    envvar="THOTH_SOLVER_RESULT_CACHE",
+    metavar="FILE",
+    help="SQLite database with results of package analyses reused across runs in the same solver environment.",
+)
+@click.option(
+    "--index-cache",
+    type=str,
+    required=False,
+    envvar="THOTH_SOLVER_INDEX_CACHE",
+    metavar="DIR",
+    help="Directory with a cache of index pages listing package releases and artifacts, shared across runs.",
+)
+@click.option(
+    "--index-cache-ttl",
+    type=click.IntRange(min=0),
+    envvar="THOTH_SOLVER_INDEX_CACHE_TTL",
+    show_default=True,
+    default=0,
+    metavar="SECONDS",
+    help="Time for which cached index pages are used without asking the index, "
+    "older pages are revalidated using conditional requests.",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    envvar="THOTH_SOLVER_OFFLINE",
+    help="Serve index pages only from the index cache, do not contact indexes to list package releases.",
+)
+@click.option(
+    "--index-concurrency",
+    type=click.IntRange(min=1),
+    envvar="THOTH_SOLVER_INDEX_CONCURRENCY",
+    show_default=True,
+    default=8,
+    help="Maximum number of concurrent lookups of package versions on indexes.",
+)
+@click.option(
+    "--pipeline-depth",
+    type=click.IntRange(min=0),
+    envvar="THOTH_SOLVER_PIPELINE_DEPTH",
+    show_default=True,
+    default=0,
+    help="Number of packages discovered on top of the number of workers - they are installed while other packages "
+    "finish work done over network. Discovery order then differs from a run without pipelining.",
+)
+@click.option(
+    "--http-pool-size",
+    type=click.IntRange(min=1),
+    envvar="THOTH_SOLVER_HTTP_POOL_SIZE",
+    help="Number of connections kept alive to each index host, by default enough for all concurrent lookups and "
+    "discoveries.",
+)
+@click.option(
+    "--checkpoint",
+    type=str,
+    envvar="THOTH_SOLVER_CHECKPOINT",
+    metavar="FILE",
+    help="Record progress of the resolution to the given file so that the run can be resumed if interrupted.",
+)
+@click.option(
+    "--resume",
+    type=str,
+    envvar="THOTH_SOLVER_RESUME",
+    metavar="CHECKPOINT",
+    help="Continue from progress recorded in the given checkpoint by a run with the same inputs and keep recording "
+    "progress there, start from scratch if the checkpoint does not exist.",
+)
+@click.option(
+    "--shard",
+    type=str,
+    envvar="THOTH_SOLVER_SHARD",
+    metavar="i/N",
+    callback=_parse_shard,
+    help="Discover only packages belonging to the given shard (numbered from zero) out of N shards, packages of "
+    "other shards found are reported as deferred. Documents of all shards are combined using the merge command.",
+)
+@click.option(
+    "--shard-seed",
+    type=str,
+    envvar="THOTH_SOLVER_SHARD_SEED",
+    metavar="FILE",
+    help="A merged document of the previous round of sharded runs, continue with packages deferred there instead "
+    "of resolving requirements.",
+)
+@click.option(
+    "--scheduling-policy",
+    type=click.Choice(SCHEDULING_POLICIES),
+    envvar="THOTH_SOLVER_SCHEDULING_POLICY",
+    show_default=True,
+    default="depth-first",
+    help="Order in which packages queued are picked for discovery.",
+)
+@click.option(
+    "--max-depth",
+    type=click.IntRange(min=0),
+    envvar="THOTH_SOLVER_MAX_DEPTH",
+    help="Maximum depth in the dependency graph discovered before deeper packages, used by depth-limited scheduling.",
+)
+@click.option(
+    "--deadline",
+    type=click.IntRange(min=1),
+    envvar="THOTH_SOLVER_DEADLINE",
+    metavar="SECONDS",
+    help="Stop picking packages for discovery after the given number of seconds, packages still queued are listed "
+    "as pending in the output.",
+)
+@click.option(
+    "--max-packages",
+    type=click.IntRange(min=1),
+    envvar="THOTH_SOLVER_MAX_PACKAGES",
+    help="Stop picking packages for discovery after the given number of packages, packages still queued are listed "
+    "as pending in the output.",
+)
+@click.option(
+    "--metrics-file",
+    type=str,
+    envvar="THOTH_SOLVER_METRICS_FILE",
+    metavar="FILE",
+    help="Write timings of discovery stages aggregated over the run to the given file in Prometheus text format, "
+    "suitable for the node exporter textfile collector.",
+)
+@click.option(
+    "--profile",
+    type=str,
+    envvar="THOTH_SOLVER_PROFILE",
+    metavar="DIR",
+    help="Write a cProfile of the solver process and a Chrome trace of subprocesses it runs to the given directory.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    envvar="THOTH_SOLVER_WORKERS",
+    show_default=True,
+    default=1,
+    help="Number of packages discovered concurrently, each in its own virtual environment.",
+)
 def python(
     click_ctx,
     requirements,
@@ -172,6 +472,30 @@ def python(
     no_pretty=False,
     virtualenv=None,
     limited_output=False,
+    metadata_source="install",
+    workers=1,
+    virtualenv_pool=None,
+    install_strategy="environment",
+    artifact_cache=None,
+    artifact_cache_size=10240,
+    result_cache=None,
+    index_cache=None,
+    index_cache_ttl=0,
+    offline=False,
+    index_concurrency=8,
+    pipeline_depth=0,
+    http_pool_size=None,
+    output_format="json",
+    checkpoint=None,
+    resume=None,
+    shard=None,
+    shard_seed=None,
+    scheduling_policy="depth-first",
+    max_depth=None,
+    deadline=None,
+    max_packages=None,
+    metrics_file=None,
+    profile=None,
 ):
     """Manipulate with dependency requirements using PyPI."""
     start_time = time.monotonic()
@@ -181,21 +505,150 @@ def python(
         _LOG.error("No requirements specified, exiting")
         sys.exit(1)
 
+    if offline and not index_cache:
+        _LOG.error("Offline mode requires an index cache, exiting")
+        sys.exit(1)
+
+    if shard_seed and not shard:
+        _LOG.error("Option --shard-seed requires --shard, exiting")
+        sys.exit(1)
+
+    if scheduling_policy == "depth-limited" and max_depth is None:
+        _LOG.error("Depth-limited scheduling requires --max-depth, exiting")
+        sys.exit(1)
+
+    if checkpoint and resume:
+        _LOG.error("Options --checkpoint and --resume are mutually exclusive, exiting")
+        sys.exit(1)
+
+    if output_format == "ndjson" and output and output.startswith(("http://", "https://")):
+        _LOG.error("Newline delimited JSON output cannot be submitted to a remote API, exiting")
+        sys.exit(1)
+
     _limit_memory()
 
     index_urls = index.split(",") if index else ("https://pypi.org/simple",)
     dependency_index_urls = dependency_index.split(",") if dependency_index else index_urls
 
-    result = resolve_python(
-        requirements,
-        index_urls=index_urls,
-        dependency_index_urls=dependency_index_urls,
-        python_version=int(python_version),
-        transitive=not no_transitive,
-        exclude_packages=set(map(str.strip, (exclude_packages or "").split(","))),
-        virtualenv=virtualenv,
-        limited_output=limited_output,
-    )
+    seed = None
+    if shard_seed:
+        with open(shard_seed) as seed_file:
+            seed = json.load(seed_file)
+
+    writer = None
+    output_file = None
+    if output_format == "ndjson":
+        output_file = open(output, "w") if output and output != "-" else None
+        writer = NDJSONWriter(output_file or sys.stdout)
+
+    profiler = Profiler(profile) if profile else None
+    if profiler is not None:
+        profiler.start()
+
+    try:
+        result = resolve_python(
+            requirements,
+            index_urls=index_urls,
+            dependency_index_urls=dependency_index_urls,
+            python_version=int(python_version),
+            transitive=not no_transitive,
+            exclude_packages=set(map(str.strip, (exclude_packages or "").split(","))),
+            virtualenv=virtualenv,
+            limited_output=limited_output,
+            metadata_source=metadata_source,
+            workers=workers,
+            virtualenv_pool=virtualenv_pool,
+            install_strategy=install_strategy,
+            artifact_cache=artifact_cache,
+            artifact_cache_size=artifact_cache_size * 1024 * 1024,
+            result_cache=result_cache,
+            index_cache=index_cache,
+            index_cache_ttl=index_cache_ttl,
+            offline=offline,
+            index_concurrency=index_concurrency,
+            pipeline_depth=pipeline_depth,
+            http_pool_size=http_pool_size,
+            sink=writer.write if writer is not None else None,
+            checkpoint=resume or checkpoint,
+            resume=bool(resume),
+            shard=shard,
+            shard_seed=seed,
+            scheduling_policy=scheduling_policy,
+            max_depth=max_depth,
+            deadline=deadline,
+            max_packages=max_packages,
+        )
+
+        if metrics_file:
+            write_textfile(metrics_file, result["timings"])
+
+        if writer is None:
+            print_command_result(
+                click_ctx,
+                result,
+                analyzer=analyzer_name,
+                analyzer_version=analyzer_version,
+                output=output or "-",
+                duration=time.monotonic() - start_time,
+                pretty=not no_pretty,
+            )
+            return
+
+        writer.write_trailer(
+            {key: value for key, value in result.items() if key not in STREAMED_SECTIONS},
+            _get_metadata(click_ctx, time.monotonic() - start_time),
+        )
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        if output_file is not None:
+            output_file.close()
+
+
+@cli.command()
+@click.pass_context
+@click.option(
+    "--document",
+    "-d",
+    type=str,
+    multiple=True,
+    required=True,
+    help="A document (JSON or newline delimited JSON) produced by a sharded run or an earlier merge, can be "
+    "supplied multiple times.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=str,
+    envvar="THOTH_SOLVER_OUTPUT",
+    default="-",
+    help="Output file or remote API to print results to, in case of URL a POST request is issued.",
+)
+@click.option("--no-pretty", "-P", is_flag=True, help="Do not print results nicely.")
+def merge(click_ctx, document, output=None, no_pretty=False):
+    """Merge documents produced by sharded runs into one."""
+    start_time = time.monotonic()
+    documents = []
+    for path in document:
+        try:
+            with open(path) as document_file:
+                documents.append(read_document(document_file))
+        except ValueError as exc:
+            _LOG.error("Failed to read document %r: %s, exiting", path, str(exc))
+            sys.exit(1)
+
+    try:
+        result = merge_documents(documents)
+    except MergeError as exc:
+        _LOG.error("%s, exiting", str(exc))
+        sys.exit(1)
+
+    if result["deferred"]:
+        _LOG.warning(
+            "%d packages were deferred but not discovered by any shard, run another round of sharded runs "
+            "seeded with the merged document using --shard-seed",
+            len(result["deferred"]),
+        )
 
     print_command_result(
         click_ctx,
@@ -24,3 +24,19 @@ class SolverException(Exception):
 
 class NoReleasesFound(SolverException):
     """Exception raised if no releases were found for the given package."""
+
+
+class RangeRequestsNotSupported(SolverException):
+    """Exception raised if the remote server does not support HTTP range requests."""
+
+
+class IndexCacheMiss(SolverException):
+    """Exception raised if an index page is not cached and it cannot be fetched in offline mode."""
+
+
+class CheckpointMismatch(SolverException):
+    """Exception raised if a checkpoint to resume from was created by a run with different inputs."""
+
+
+class MergeError(SolverException):
+    """Exception raised if solver documents cannot be merged."""
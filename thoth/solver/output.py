@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Streaming output of solver results as newline delimited JSON.
+
+Each line is a JSON object with the name of the result section the record belongs to ("tree", "errors", "unparsed",
+"unresolved", "deferred" in sharded runs and "pending" in runs with a budget) under "type" and the record itself under
+"record". The last line is a trailer of type "trailer" carrying the rest of the result (environment, platform, ...),
+metadata about the run and the number of records written per section, so that consumers can tell a complete output
+from a truncated one.
+"""
+
+import json
+import threading
+
+from thoth.common import SafeJSONEncoder
+
+from ._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, Dict, List, TextIO
+
+STREAMED_SECTIONS = ("tree", "errors", "unparsed", "unresolved", "deferred", "pending")
+# Sections present in each solver document, the others are present only in sharded runs or runs with a budget.
+_DOCUMENT_SECTIONS = ("tree", "errors", "unparsed", "unresolved")
+TRAILER_TYPE = "trailer"
+
+
+class NDJSONWriter:
+    """Write records of solver results as lines of JSON as soon as they are produced."""
+
+    def __init__(self, stream):  # type: (TextIO) -> None
+        """Initialize writer writing to the given text stream."""
+        self.stream = stream
+        self.counts = {}  # type: Dict[str, int]
+        self._lock = threading.Lock()
+
+    def _write_line(self, content):  # type: (Dict[str, Any]) -> None
+        line = json.dumps(content, sort_keys=True, cls=SafeJSONEncoder)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def write(self, section, record):  # type: (str, Dict[str, Any]) -> None
+        """Write the given record of the given result section, can be called from multiple threads."""
+        self._write_line({"type": section, "record": record})
+        with self._lock:
+            self.counts[section] = self.counts.get(section, 0) + 1
+
+    def write_trailer(self, result, metadata):  # type: (Dict[str, Any], Dict[str, Any]) -> None
+        """Write trailer with the rest of the result and metadata, once all the records were written."""
+        with self._lock:
+            counts = dict(self.counts)
+
+        self._write_line({"type": TRAILER_TYPE, "record": {"result": result, "metadata": metadata, "counts": counts}})
+
+
+def read_document(stream):  # type: (TextIO) -> Dict[str, Any]
+    """Read a solver document from the given text stream, written either as JSON or as newline delimited JSON.
+
+    Newline delimited JSON is assembled back into a document with the same structure as the JSON one. Raise
+    ValueError if the output is truncated - the trailer is missing or the number of records does not match.
+    """
+    content = stream.read()
+    try:
+        first = json.loads(content.split("\n", 1)[0])
+    except ValueError:
+        first = None
+
+    if not isinstance(first, dict) or set(first) != {"type", "record"}:
+        document = json.loads(content)  # type: Dict[str, Any]
+        return document
+
+    sections = {}  # type: Dict[str, List[Dict[str, Any]]]
+    trailer = None
+    for number, line in enumerate(content.splitlines()):
+        if not line.strip():
+            continue
+
+        if trailer is not None:
+            raise ValueError(f"Record on line {number + 1} follows the trailer")
+
+        entry = json.loads(line)
+        if entry["type"] == TRAILER_TYPE:
+            trailer = entry["record"]
+        else:
+            sections.setdefault(entry["type"], []).append(entry["record"])
+
+    if trailer is None:
+        raise ValueError("No trailer found, the output is truncated")
+
+    counts = {section: len(records) for section, records in sections.items()}
+    if counts != trailer["counts"]:
+        raise ValueError(f"Number of records {counts} differs from the trailer {trailer['counts']}")
+
+    result = dict(trailer["result"])
+    for section in _DOCUMENT_SECTIONS:
+        result[section] = sections.pop(section, [])
+    result.update(sections)
+    return {"metadata": trailer["metadata"], "result": result}
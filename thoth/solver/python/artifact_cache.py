@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""A content-addressed on-disk cache of artifacts installed during analysis.
+
+Artifacts are stored under their sha256 digest as stated on the index, so the same artifact served by different
+indexes is stored once. Artifacts are verified each time they are taken from the cache. The cache is limited in size,
+the least recently used artifacts are evicted first.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from packaging.utils import canonicalize_version
+from packaging.utils import parse_sdist_filename
+from packaging.utils import InvalidSdistFilename
+
+from .artifacts import ArtifactLink
+from .wheel import download_artifact
+from .wheel import matches_python_version
+from .wheel import select_wheel
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+_HASH_CHUNK_SIZE = 64 * 1024
+# Artifacts used recently are not evicted as they can be just being installed by another solver run.
+_EVICTION_GRACE_PERIOD = 60
+
+
+def select_artifact(artifacts, package_version, supported_tags, python_version):
+    # type: (List[ArtifactLink], str, List[str], str) -> Optional[ArtifactLink]
+    """Select the artifact pip would install for the given package version - a compatible wheel or a sdist."""
+    artifact = select_wheel(artifacts, package_version, supported_tags, python_version)
+    if artifact is not None:
+        return artifact
+
+    for artifact in artifacts:
+        if not artifact.filename.endswith((".tar.gz", ".zip")):
+            continue
+
+        try:
+            _, version = parse_sdist_filename(artifact.filename)
+        except InvalidSdistFilename:
+            continue
+
+        if canonicalize_version(version) != canonicalize_version(package_version):
+            continue
+
+        if matches_python_version(artifact.requires_python, python_version):
+            return artifact
+
+    return None
+
+
+def _sha256(path):  # type: (str) -> str
+    """Compute sha256 digest of the given file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as artifact_file:
+        for chunk in iter(lambda: artifact_file.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """A content-addressed cache of artifacts limited in size, the directory can be shared by solver runs.
+
+    Size of the cache is obtained once when the cache is opened and it is kept up to date with artifacts stored,
+    the cache directory is scanned again only when the size exceeds the limit.
+    """
+
+    def __init__(self, directory, max_size):  # type: (str, int) -> None
+        """Initialize cache stored in the given directory, the maximum size is in bytes."""
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._size = sum(size for _, size, _ in self._list_entries())
+
+    def _get_path(self, artifact):  # type: (ArtifactLink) -> str
+        sha256 = artifact.sha256 or ""
+        return os.path.join(self.directory, sha256[:2], sha256, os.path.basename(artifact.filename))
+
+    def get(self, artifact, verify_ssl=True):  # type: (ArtifactLink, bool) -> str
+        """Get path to a verified local copy of the given artifact, download it if not cached yet."""
+        if not artifact.sha256:
+            raise ValueError(f"Artifact {artifact.filename!r} cannot be cached as the index states no digest for it")
+
+        path = self._get_path(artifact)
+        if os.path.isfile(path):
+            if _sha256(path) == artifact.sha256:
+                _LOGGER.debug("Using cached artifact %r", path)
+                # Modification time tracks the last use of the artifact.
+                os.utime(path)
+                return path
+
+            _LOGGER.warning("Removing cached artifact %r as its digest does not match", path)
+            self._add_size(-os.path.getsize(path))
+            os.remove(path)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        directory = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        try:
+            # Artifacts are placed into the cache atomically, other runs never see a partially downloaded one.
+            downloaded = download_artifact(artifact, directory, verify_ssl=verify_ssl)
+            size = os.path.getsize(downloaded)
+            os.replace(downloaded, path)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if self._add_size(size) > self.max_size:
+            self.evict()
+        return path
+
+    def _add_size(self, size):  # type: (int) -> int
+        """Account the given size change of the cache, return the current size."""
+        with self._lock:
+            self._size += size
+            return self._size
+
+    def _list_entries(self):  # type: () -> List[Tuple[float, int, str]]
+        """List cached artifacts with their last use time and size."""
+        result = []
+        for root, _, files in os.walk(self.directory):
+            if os.path.basename(root).startswith(".tmp-"):
+                continue
+
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                result.append((stat.st_mtime, stat.st_size, path))
+
+        return result
+
+    def evict(self):  # type: () -> None
+        """Remove least recently used artifacts so that the cache fits into its maximum size.
+
+        The whole cache directory is scanned, artifacts stored by other solver runs sharing the directory are
+        accounted for.
+        """
+        entries = sorted(self._list_entries())
+        total_size = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, path in entries:
+            if total_size <= self.max_size:
+                break
+
+            if now - mtime < _EVICTION_GRACE_PERIOD:
+                continue
+
+            _LOGGER.debug("Evicting cached artifact %r", path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+        with self._lock:
+            self._size = total_size
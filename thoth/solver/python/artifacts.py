@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Listing of artifacts (distribution files) available on a PEP-503 simple repository API.
+
+Project pages are requested in the JSON form (PEP-691) if the index serves it, so sizes of artifacts and all the
+versions of the project (PEP-700) are known. Core metadata files served next to artifacts as described in PEP-658
+(and PEP-714) are exposed as well.
+"""
+
+import hashlib
+from html.parser import HTMLParser
+import json
+import logging
+from urllib.parse import unquote
+from urllib.parse import urldefrag
+from urllib.parse import urljoin
+
+import attr
+from packaging.utils import canonicalize_version
+from packaging.utils import parse_sdist_filename
+from packaging.utils import parse_wheel_filename
+from packaging.utils import InvalidSdistFilename
+from packaging.utils import InvalidWheelFilename
+from packaging.version import InvalidVersion
+from thoth.python import Source
+from thoth.python.exceptions import NotFoundError
+from thoth.python.exceptions import HTTPError
+
+from .index_cache import get_page
+from .index_cache import IndexPageCache
+from .sessions import get_session
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, Dict, List, Optional, Tuple
+
+
+_LOGGER = logging.getLogger(__name__)
+_ARTIFACT_SUFFIXES = (".tar.gz", ".whl", ".zip", ".tar.bz2", ".egg", ".exe")
+_SIMPLE_JSON_CONTENT_TYPE = "application/vnd.pypi.simple.v1+json"
+# Prefer JSON form of project pages, see PEP-691.
+_SIMPLE_ACCEPT = _SIMPLE_JSON_CONTENT_TYPE + ", application/vnd.pypi.simple.v1+html;q=0.2, text/html;q=0.01"
+
+
+@attr.s(slots=True, frozen=True)
+class ArtifactLink:
+    """An artifact listed on a project page of a simple repository API."""
+
+    filename = attr.ib(type=str)
+    url = attr.ib(type=str)
+    sha256 = attr.ib(default=None)  # type: Optional[str]
+    requires_python = attr.ib(default=None)  # type: Optional[str]
+    yanked = attr.ib(type=bool, default=False)
+    core_metadata = attr.ib(type=bool, default=False)
+    core_metadata_sha256 = attr.ib(default=None)  # type: Optional[str]
+    size = attr.ib(default=None)  # type: Optional[int]
+
+    @property
+    def core_metadata_url(self):  # type: () -> str
+        """Get URL to core metadata file of the given artifact as described in PEP-658."""
+        return self.url + ".metadata"
+
+    @property
+    def is_wheel(self):  # type: () -> bool
+        """Check if the given artifact is a wheel."""
+        return self.filename.endswith(".whl")
+
+    def get_wheel_info(self):  # type: () -> Optional[Tuple[str, str, Tuple[Any, ...], List[str]]]
+        """Parse wheel file name into name, version, build tag and tags stated, return None if not a valid wheel."""
+        if not self.is_wheel:
+            return None
+
+        try:
+            name, version, build, tags = parse_wheel_filename(self.filename)
+        except InvalidWheelFilename:
+            _LOGGER.debug("Skipping artifact with invalid wheel file name %r", self.filename)
+            return None
+
+        return str(name), str(version), build or (), [str(tag) for tag in tags]
+
+    def is_version(self, package_version):  # type: (str) -> bool
+        """Check if the given artifact is a wheel of the given package version."""
+        wheel_info = self.get_wheel_info()
+        if wheel_info is None:
+            return False
+
+        return bool(canonicalize_version(wheel_info[1]) == canonicalize_version(package_version))
+
+
+class _ProjectPageParser(HTMLParser):
+    """Parse anchors present on a project page as described in PEP-503."""
+
+    def __init__(self):  # type: () -> None
+        """Initialize parser."""
+        super().__init__(convert_charrefs=True)
+        self.anchors = []  # type: List[Dict[str, Optional[str]]]
+
+    def handle_starttag(self, tag, attrs):  # type: (str, List[Tuple[str, Optional[str]]]) -> None
+        """Record anchors with their attributes."""
+        if tag == "a":
+            self.anchors.append(dict(attrs))
+
+
+def _parse_sha256(value):  # type: (str) -> Optional[str]
+    """Parse sha256 digest out of a hash specification in form of <hash-name>=<hash-value>."""
+    hash_name, _, hash_value = value.partition("=")
+    if hash_name == "sha256" and hash_value:
+        return hash_value
+
+    return None
+
+
+def parse_project_page(content, url):  # type: (str, str) -> List[ArtifactLink]
+    """Parse project page of a simple repository API, url states location of the page for relative links."""
+    parser = _ProjectPageParser()
+    parser.feed(content)
+    parser.close()
+
+    result = []
+    for anchor in parser.anchors:
+        href = anchor.get("href")
+        if not href:
+            continue
+
+        artifact_url, fragment = urldefrag(urljoin(url, href))
+        filename = unquote(artifact_url.rsplit("/", maxsplit=1)[-1])
+        if not filename.endswith(_ARTIFACT_SUFFIXES):
+            _LOGGER.debug("Link does not look like a package artifact: %r", href)
+            continue
+
+        # PEP-714 renamed the attribute, indexes can serve both.
+        core_metadata = anchor.get("data-core-metadata", anchor.get("data-dist-info-metadata", "false"))
+        result.append(
+            ArtifactLink(
+                filename=filename,
+                url=artifact_url,
+                sha256=_parse_sha256(fragment),
+                requires_python=anchor.get("data-requires-python") or None,
+                yanked="data-yanked" in anchor,
+                core_metadata=core_metadata != "false",
+                core_metadata_sha256=_parse_sha256(core_metadata or ""),
+            ),
+        )
+
+    return result
+
+
+def parse_project_json(content, url):  # type: (str, str) -> Tuple[List[ArtifactLink], Optional[List[str]]]
+    """Parse JSON form of a project page (PEP-691), return artifacts and versions of the project if stated (PEP-700)."""
+    project = json.loads(content)
+
+    result = []
+    for file_info in project.get("files") or []:
+        artifact_url = urljoin(url, file_info["url"])
+        filename = file_info.get("filename") or unquote(urldefrag(artifact_url)[0].rsplit("/", maxsplit=1)[-1])
+        if not filename.endswith(_ARTIFACT_SUFFIXES):
+            _LOGGER.debug("File does not look like a package artifact: %r", filename)
+            continue
+
+        core_metadata = file_info.get("core-metadata", file_info.get("dist-info-metadata", False))
+        result.append(
+            ArtifactLink(
+                filename=filename,
+                url=artifact_url,
+                sha256=(file_info.get("hashes") or {}).get("sha256"),
+                requires_python=file_info.get("requires-python") or None,
+                yanked=bool(file_info.get("yanked", False)),
+                core_metadata=bool(core_metadata),
+                core_metadata_sha256=core_metadata.get("sha256") if isinstance(core_metadata, dict) else None,
+                size=file_info.get("size"),
+            ),
+        )
+
+    versions = project.get("versions")
+    return result, (list(versions) if versions is not None else None)
+
+
+def _get_artifact_version(filename):  # type: (str) -> Optional[str]
+    """Parse version out of the given artifact file name, return None if the file name cannot be parsed."""
+    try:
+        if filename.endswith(".whl"):
+            return str(parse_wheel_filename(filename)[1])
+        if filename.endswith((".tar.gz", ".zip")):
+            return str(parse_sdist_filename(filename)[1])
+    except (InvalidWheelFilename, InvalidSdistFilename, InvalidVersion):
+        pass
+
+    return None
+
+
+def _get_release_version(package_name, filename):  # type: (str, str) -> Optional[str]
+    """Get version of a release the given wheel or source distribution belongs to, None if it cannot be parsed."""
+    version = _get_artifact_version(filename)
+    if version is not None:
+        return version
+
+    # Source distributions of versions not compliant with PEP-440 are listed with the version as stated.
+    prefix = package_name + "-"
+    if filename.endswith(".tar.gz") and filename.lower().replace("_", "-").startswith(prefix):
+        return filename[len(prefix) : -len(".tar.gz")]
+
+    _LOGGER.debug("Skipping artifact %r of %r as its version cannot be parsed", filename, package_name)
+    return None
+
+
+@attr.s(slots=True)
+class ProjectIndex:
+    """Artifacts and versions of a project available on an index, obtained from a single project page."""
+
+    package_name = attr.ib(type=str)
+    index_url = attr.ib(type=str)
+    artifacts = attr.ib(type=list)  # type: List[ArtifactLink]
+    versions = attr.ib(type=list)  # type: List[str]
+    releases = attr.ib(init=False)  # type: List[Tuple[str, str]]
+
+    def __attrs_post_init__(self):  # type: () -> None
+        """Pair versions with the index, the same listing is handed out for all the lookups of releases."""
+        self.releases = [(version, self.index_url) for version in self.versions]
+
+    def get_artifacts(self, package_version):  # type: (str) -> List[ArtifactLink]
+        """Get artifacts of the given package version."""
+        result = []
+        for artifact in self.artifacts:
+            artifact_version = _get_artifact_version(artifact.filename)
+            if artifact_version is not None:
+                if canonicalize_version(artifact_version) == canonicalize_version(package_version):
+                    result.append(artifact)
+                continue
+
+            # Other artifacts (eggs, installers, sdists not following the naming convention) are matched on prefix.
+            filename = artifact.filename.lower()
+            if filename.startswith(
+                (f"{self.package_name}-{package_version}", f"{self.package_name.replace('-', '_')}-{package_version}"),
+            ):
+                result.append(artifact)
+
+        return result
+
+
+def fetch_project_index(source, package_name, page_cache=None):
+    # type: (Source, str, Optional[IndexPageCache]) -> ProjectIndex
+    """Obtain artifacts and versions of the given package from its project page on the given index."""
+    package_name = source.normalize_package_name(package_name)
+    url = source.url + "/" + package_name + "/"
+    _LOGGER.debug("Listing artifacts of package %r from %r", package_name, url)
+    page = get_page(url, verify_ssl=source.verify_ssl, page_cache=page_cache, accept=_SIMPLE_ACCEPT)
+    if page.status_code == 404:
+        raise NotFoundError(f"Package {package_name} is not present on index {source.url} (index {source.name})")
+    if page.status_code == 403:
+        raise HTTPError(f"Package {package_name} is not present on index {source.url} (index {source.name})")
+    if page.status_code != 200:
+        raise HTTPError(f"Failed to list package {package_name} on index {source.url}: HTTP {page.status_code}")
+
+    versions = None  # type: Optional[List[str]]
+    if page.content_type == _SIMPLE_JSON_CONTENT_TYPE:
+        artifacts, versions = parse_project_json(page.text, page.url)
+    else:
+        artifacts = parse_project_page(page.text, page.url)
+
+    if versions is None:
+        # Versions of wheels and source distributions, kept in order of artifacts.
+        versions = list(
+            dict.fromkeys(
+                version
+                for version in (
+                    _get_release_version(package_name, artifact.filename)
+                    for artifact in artifacts
+                    if artifact.filename.endswith((".tar.gz", ".whl"))
+                )
+                if version is not None
+            ),
+        )
+
+    return ProjectIndex(package_name=package_name, index_url=source.url, artifacts=artifacts, versions=versions)
+
+
+def list_artifacts(source, package_name, page_cache=None):
+    # type: (Source, str, Optional[IndexPageCache]) -> List[ArtifactLink]
+    """List artifacts of the given package available on the given simple repository API."""
+    return fetch_project_index(source, package_name, page_cache=page_cache).artifacts
+
+
+def fetch_core_metadata(source, artifact):  # type: (Source, ArtifactLink) -> str
+    """Fetch core metadata file of the given artifact as served by the index, verify its digest if stated."""
+    if not artifact.core_metadata:
+        raise ValueError(f"Index {source.url} does not serve core metadata for artifact {artifact.filename!r}")
+
+    _LOGGER.debug("Fetching core metadata of %r from %r", artifact.filename, artifact.core_metadata_url)
+    response = get_session(artifact.core_metadata_url).get(artifact.core_metadata_url, verify=source.verify_ssl)
+    response.raise_for_status()
+
+    digest = hashlib.sha256(response.content).hexdigest()
+    if artifact.core_metadata_sha256 and digest != artifact.core_metadata_sha256:
+        raise ValueError(
+            f"Digest mismatch for core metadata of {artifact.filename!r} served by {source.url}: "
+            f"expected {artifact.core_metadata_sha256}, got {digest}",
+        )
+
+    return response.content.decode("utf-8")
@@ -27,6 +27,7 @@ from thoth.python import Source
 
 from ..exceptions import NoReleasesFound
 from ..exceptions import SolverException
+from .matching import ReleaseMatcher
 from .._typing import MYPY_CHECK_RUNNING
 
 if MYPY_CHECK_RUNNING:  # pragma: no cover
@@ -65,6 +66,15 @@ class Solver:
 
     dependency_parser = attr.ib(type=DependencyParser, kw_only=True)
     releases_fetcher = attr.ib(type=ReleasesFetcher, kw_only=True)
+    _matchers = attr.ib(factory=dict, init=False, repr=False)  # type: Dict[str, ReleaseMatcher]
+
+    def _get_matcher(self, name, releases):  # type: (str, List[Tuple[str, str]]) -> ReleaseMatcher
+        """Get releases of the given package prepared for matching, reuse them if the same releases are matched."""
+        matcher = self._matchers.get(name)
+        if matcher is None or matcher.releases is not releases:
+            matcher = ReleaseMatcher(releases)
+            self._matchers[name] = matcher
+        return matcher
 
     def solve(self, dependencies, graceful=True):  # type: (List[str], bool) -> Dict[str, List[Tuple[str, str]]]
         """Solve `dependencies` against a repository."""
@@ -84,10 +94,7 @@ class Solver:
                 else:
                     raise NoReleasesFound("No releases found for package {!r}".format(dep.name))
 
-            solved[name] = []
-            for release in releases:
-                if release[0] in dep.specifier:
-                    solved[name].append(release)
+            solved[name] = self._get_matcher(name, releases).match(dep.specifier)
 
             _LOGGER.debug("  matching: %s", solved[name])
 
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Budgets bounding time and work done in a solver run."""
+
+import logging
+import threading
+import time
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Budget:
+    """A budget of a run shared by all the indexes resolved, safe to use from multiple threads."""
+
+    def __init__(self, deadline=None, max_packages=None):  # type: (Optional[float], Optional[int]) -> None
+        """Start a budget running out after the given number of seconds or packages picked for discovery."""
+        self.deadline = time.monotonic() + deadline if deadline is not None else None
+        self.max_packages = max_packages
+        self.picked = 0
+        self.reason = None  # type: Optional[str]
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self):  # type: () -> bool
+        """Check whether the budget ran out, no more packages can be picked for discovery."""
+        return self.reason is not None
+
+    def take(self):  # type: () -> bool
+        """Pick one package for discovery, return False if the budget ran out."""
+        with self._lock:
+            if self.reason is None:
+                if self.deadline is not None and time.monotonic() >= self.deadline:
+                    self.reason = "deadline reached"
+                elif self.max_packages is not None and self.picked >= self.max_packages:
+                    self.reason = f"{self.max_packages} packages picked"
+
+                if self.reason is not None:
+                    _LOGGER.warning(
+                        "Budget of the run ran out (%s), packages queued are reported as pending", self.reason
+                    )
+
+            if self.reason is not None:
+                return False
+
+            self.picked += 1
+            return True
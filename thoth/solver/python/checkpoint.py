@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Checkpoints of resolution progress, so that an interrupted run can be resumed.
+
+A checkpoint is a journal of JSON lines. The first line states a fingerprint of the run inputs, the following ones
+record progress of each index: once requirements are resolved (records produced and packages queued for
+discovery) and then each time a package is discovered (its record and packages it queued). Each line is
+self-contained and appended as soon as the progress is made, so the journal is consistent whenever the run is
+killed - a partially written last line is dropped when resuming.
+"""
+
+import json
+import logging
+import os
+import threading
+
+import attr
+
+from ..exceptions import CheckpointMismatch
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, Dict, IO, List, Optional, Set, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@attr.s(slots=True)
+class IndexState:
+    """Progress of resolution on an index as recorded in a checkpoint."""
+
+    records = attr.ib(type=list)  # type: List[Tuple[str, Dict[str, Any]]]
+    seen = attr.ib(type=set)  # type: Set[Tuple[str, str]]
+    queue = attr.ib(type=list)  # type: List[Tuple[str, str]]
+    depths = attr.ib(type=dict, factory=dict)  # type: Dict[Tuple[str, str], int]
+
+
+class Checkpoint:
+    """A journal of resolution progress, safe to use from multiple threads."""
+
+    def __init__(self, path, fingerprint, resume=False):  # type: (str, str, bool) -> None
+        """Open checkpoint, resume from progress recorded if requested and the checkpoint exists."""
+        self.path = path
+        self.fingerprint = fingerprint
+        self._states = {}  # type: Dict[str, IndexState]
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            self._load()
+            self._file = open(path, "a")  # type: IO[str]
+        else:
+            if resume:
+                _LOGGER.info("No checkpoint found at %r, starting from scratch", path)
+            self._file = open(path, "w")
+            self._write({"fingerprint": fingerprint})
+
+    def _load(self):  # type: () -> None
+        """Load progress recorded, drop anything written after the last complete line."""
+        valid_size = 0
+        done = {}  # type: Dict[str, Set[Tuple[str, str]]]
+        with open(self.path, "rb") as checkpoint_file:
+            for number, line in enumerate(checkpoint_file):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("line is not complete")
+                    event = json.loads(line)
+                except ValueError as exc:
+                    _LOGGER.warning("Dropping line %d of checkpoint %r: %s", number + 1, self.path, str(exc))
+                    break
+
+                if number == 0:
+                    if event.get("fingerprint") != self.fingerprint:
+                        raise CheckpointMismatch(
+                            f"Checkpoint {self.path!r} was created by a run with different inputs, it cannot be resumed"
+                        )
+                else:
+                    self._apply(event, done)
+
+                valid_size += len(line)
+
+        if valid_size == 0:
+            raise CheckpointMismatch(f"Checkpoint {self.path!r} is empty, it cannot be resumed")
+
+        os.truncate(self.path, valid_size)
+        for index_url, state in self._states.items():
+            state.queue = [package for package in state.queue if package not in done[index_url]]
+            _LOGGER.info(
+                "Resuming resolution on %r with %d packages discovered and %d packages queued",
+                index_url,
+                len(done[index_url]),
+                len(state.queue),
+            )
+
+    def _apply(self, event, done):  # type: (Dict[str, Any], Dict[str, Set[Tuple[str, str]]]) -> None
+        """Apply the given event of the journal on the state loaded."""
+        index_url = event["index"]
+        queued = [tuple(package) for package in event["queued"]]
+        if event["event"] == "roots":
+            self._states[index_url] = IndexState(
+                records=[(section, record) for section, record in event["records"]],
+                seen=set(queued),
+                queue=queued,
+            )
+            done[index_url] = set()
+            return
+
+        state = self._states[index_url]
+        state.records.append((event["section"], event["record"]))
+        state.seen.update(queued)
+        state.queue.extend(queued)
+        # Packages queued by a discovered package are one level deeper in the dependency graph.
+        state.depths.update((package, event.get("depth", 0) + 1) for package in queued)
+        done[index_url].add(tuple(event["package"]))
+
+    def _write(self, event):  # type: (Dict[str, Any]) -> None
+        line = json.dumps(event)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def get_state(self, index_url):  # type: (str) -> Optional[IndexState]
+        """Get progress recorded for the given index, None if resolution on the index did not start yet."""
+        with self._lock:
+            return self._states.pop(index_url, None)
+
+    def record_roots(self, index_url, records, queued):
+        # type: (str, List[Tuple[str, Dict[str, Any]]], List[Tuple[str, str]]) -> None
+        """Record requirements were resolved on the given index, with records produced and packages queued."""
+        self._write({"index": index_url, "event": "roots", "records": records, "queued": queued})
+
+    def record_done(self, index_url, package, section, record, queued, depth=0):
+        # type: (str, Tuple[str, str], str, Dict[str, Any], List[Tuple[str, str]], int) -> None
+        """Record the given package found in the given depth was discovered, with its record and packages queued."""
+        self._write(
+            {
+                "index": index_url,
+                "event": "done",
+                "package": package,
+                "section": section,
+                "record": record,
+                "queued": queued,
+                "depth": depth,
+            }
+        )
+
+    def close(self):  # type: () -> None
+        """Close the checkpoint, make sure progress recorded is stored."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""A persistent cache of index pages (simple repository API project pages and Warehouse JSON API responses).
+
+Cached pages are considered fresh for the configured time to live, stale pages are revalidated using conditional
+requests (ETag and Last-Modified) so that unchanged pages are not transferred again. In offline mode, pages are
+served only from the cache.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import attr
+import requests
+
+from .sessions import get_session
+from ..exceptions import IndexCacheMiss
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, Dict, Optional
+
+_LOGGER = logging.getLogger(__name__)
+# Only responses that state a result about the project are cached, other responses are considered transient.
+_CACHED_STATUS_CODES = frozenset((200, 404))
+
+
+@attr.s(slots=True, frozen=True)
+class IndexPage:
+    """A page served by an index."""
+
+    url = attr.ib(type=str)
+    status_code = attr.ib(type=int)
+    text = attr.ib(type=str)
+    content_type = attr.ib(type=str, default="text/html")
+
+    def json(self):  # type: () -> Any
+        """Parse page content as JSON."""
+        return json.loads(self.text)
+
+
+class IndexPageCache:
+    """A cache of index pages stored in a directory, the directory can be shared by solver runs."""
+
+    def __init__(self, directory, ttl=0, offline=False):  # type: (str, int, bool) -> None
+        """Initialize cache stored in the given directory, time to live of cached pages is in seconds."""
+        self.directory = os.path.abspath(directory)
+        self.ttl = ttl
+        self.offline = offline
+
+    def _get_path(self, url):  # type: (str) -> str
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _load(self, url):  # type: (str) -> Optional[Dict[str, Any]]
+        try:
+            with open(self._get_path(url)) as entry_file:
+                entry = json.load(entry_file)  # type: Dict[str, Any]
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            _LOGGER.warning("Ignoring corrupted index cache entry for %r", url)
+            return None
+
+        return entry if entry.get("url") == url else None
+
+    def _store(self, url, entry):  # type: (str, Dict[str, Any]) -> None
+        path = self._get_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Entries are written atomically so concurrent runs never read a partially written entry.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as entry_file:
+                json.dump(entry, entry_file)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _to_page(entry):  # type: (Dict[str, Any]) -> IndexPage
+        return IndexPage(
+            url=entry["response_url"],
+            status_code=entry["status_code"],
+            text=entry["text"],
+            content_type=entry.get("content_type", "text/html"),
+        )
+
+    def get(self, url, verify_ssl=True, accept=None):  # type: (str, bool, Optional[str]) -> IndexPage
+        """Get the given page, from the cache if fresh or not modified on the index.
+
+        Pages are cached per URL, the accepted content types are expected to be the same for the given URL.
+        """
+        entry = self._load(url)
+        if entry is not None and (self.offline or time.time() - entry["fetched"] < self.ttl):
+            _LOGGER.debug("Using cached index page %r", url)
+            return self._to_page(entry)
+
+        if self.offline:
+            raise IndexCacheMiss(f"Index page {url!r} is not cached, it cannot be obtained in offline mode")
+
+        headers = {}
+        if accept:
+            headers["Accept"] = accept
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = get_session(url).get(url, headers=headers, verify=verify_ssl)
+        if response.status_code == 304 and entry is not None:
+            _LOGGER.debug("Cached index page %r was not modified", url)
+            entry["fetched"] = time.time()
+            self._store(url, entry)
+            return self._to_page(entry)
+
+        page = _to_index_page(response, url)
+        if response.status_code in _CACHED_STATUS_CODES:
+            self._store(
+                url,
+                {
+                    "url": url,
+                    "response_url": page.url,
+                    "status_code": page.status_code,
+                    "text": page.text,
+                    "content_type": page.content_type,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fetched": time.time(),
+                },
+            )
+
+        return page
+
+
+def _to_index_page(response, url):  # type: (requests.Response, str) -> IndexPage
+    content_type = response.headers.get("Content-Type") or "text/html"
+    return IndexPage(
+        url=response.url or url,
+        status_code=response.status_code,
+        text=response.text,
+        content_type=content_type.split(";", maxsplit=1)[0].strip(),
+    )
+
+
+def get_page(url, verify_ssl=True, page_cache=None, accept=None):
+    # type: (str, bool, Optional[IndexPageCache], Optional[str]) -> IndexPage
+    """Get the given index page, use the page cache if provided."""
+    if page_cache is not None:
+        return page_cache.get(url, verify_ssl=verify_ssl, accept=accept)
+
+    response = get_session(url).get(url, headers={"Accept": accept} if accept else None, verify=verify_ssl)
+    return _to_index_page(response, url)
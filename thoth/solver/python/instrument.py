@@ -22,22 +22,37 @@ These functions are used to gather characteristics about installed packages whic
 All the functions are executed in a virtualenv - they should print information to stdout, if any error occurs
 they should print error messages to stderr and call sys.exit with non-zero value. All necessary functions should
 be either from standard virtualenv packages or from standard library to remove any dependency inference.
+
+Functions can be executed either in a freshly spawned interpreter or in a persistent interpreter started once for
+the given virtual environment (see `_env_worker'). The persistent interpreter reads requests as line-delimited JSON
+on its standard input and writes one JSON response per request to its standard output, the same standard library
+only constraint applies to it.
 """
 
+import atexit
+from functools import lru_cache
 import inspect
+import json
+import os
 import sys
 import shlex
 import logging
+import subprocess
+import threading
 
 from thoth.analyzer import run_command
 
+from .profiling import span
 from .._typing import MYPY_CHECK_RUNNING
 
 if MYPY_CHECK_RUNNING:  # pragma: no cover
-    from typing import Dict, Any, Optional, Callable, Union, List
+    from typing import Dict, Any, Optional, Callable, Union, List, Tuple
 
 
 _LOGGER = logging.getLogger(__name__)
+_ENV_WORKER_TIMEOUT = int(os.getenv("THOTH_SOLVER_ENV_WORKER_TIMEOUT", 60))
+_ENV_WORKERS = {}  # type: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], _EnvWorker]
+_ENV_WORKERS_LOCK = threading.Lock()
 
 
 def _find_distribution_name(package_name):  # type: (str) -> None
@@ -60,17 +75,36 @@ def _find_distribution_name(package_name):  # type: (str) -> None
     sys.exit(1)
 
 
-def _get_importlib_metadata_metadata(package_name):  # type: (str) -> None
-    """Retrieve all the metadata for the given package."""
+def _get_importlib_metadata_distribution(package_name, search_path):  # type: (str, str) -> None
+    """Find distribution of the given package and retrieve all its metadata at once.
+
+    The distribution is looked up on the given search path (a colon separated import path of the
+    analyzed environment) and its name is reported the same way as in `_find_distribution_name'.
+    """
+    import json
+    import re
     import sys
     try:
         import importlib_metadata
     except ImportError:
         import importlib.metadata as importlib_metadata  # type: ignore
-    import json
 
-    result = dict(importlib_metadata.metadata(package_name).items())  # type: ignore
+    def canonicalize_name(name):  # type: (str) -> str
+        return re.sub(r"[-_.]+", "-", name).lower()
+
+    distribution = None
+    for candidate in importlib_metadata.distributions(path=search_path.split(":")):  # type: ignore
+        name = candidate.metadata["Name"]
+        if name and canonicalize_name(name) == canonicalize_name(package_name):
+            distribution = candidate
+            break
 
+    if distribution is None:
+        print("No matching distribution found for ", package_name, file=sys.stderr, end="")
+        sys.exit(1)
+
+    metadata = distribution.metadata
+    result = dict(metadata.items())  # type: ignore
     # As metadata are encoded as email.message, it's not possible to implicitly expose information about which keys
     # keep multiple values and which are single-value. Let's explicitly maintain a list for metadata keys that
     # are arrays:
@@ -88,123 +122,300 @@ def _get_importlib_metadata_metadata(package_name):  # type: (str) -> None
         ),
     )
     for key in keys:
-        value = importlib_metadata.metadata(package_name).get_all(key)
+        value = metadata.get_all(key)
         if value:
             # Override the previous one (single value) with array.
             result[key] = value
 
-    print(json.dumps(result))
-    sys.exit(0)
-
-
-def _get_importlib_metadata_version(package_name):  # type: (str) -> None
-    """Retrieve version based on the given package."""
-    import sys
-    try:
-        import importlib_metadata
-    except ImportError:
-        import importlib.metadata as importlib_metadata  # type: ignore
+    files = distribution.files
+    if files is not None:
+        files = [
+            {"hash": f.hash.__dict__ if f.hash else None, "size": f.size, "path": str(f)} for f in files  # type: ignore
+        ]
 
-    print(importlib_metadata.version(package_name), end="")  # type: ignore
+    print(
+        json.dumps(
+            {
+                # Distribution name as reported by setuptools' safe_name.
+                "distribution_name": re.sub(r"[^A-Za-z0-9.]+", "-", metadata["Name"]),
+                "metadata": result,
+                "requires": distribution.requires,
+                "entry_points": [
+                    {"name": ep.name, "value": ep.value, "group": ep.group} for ep in distribution.entry_points
+                ],
+                "files": files,
+                "version": distribution.version,
+            },
+        ),
+    )
     sys.exit(0)
 
 
-def _get_importlib_metadata_requires(package_name):  # type: (str) -> None
-    """Retrieve requires based on the given package."""
-    import sys
-    try:
-        import importlib_metadata
-    except ImportError:
-        import importlib.metadata as importlib_metadata  # type: ignore
+def _get_import_path():  # type: () -> None
+    """Get import path configured for the given Python interpreter."""
     import json
-
-    print(json.dumps(importlib_metadata.requires(package_name)))  # type: ignore
-    sys.exit(0)
-
-
-def _get_importlib_metadata_entry_points(package_name):  # type: (str) -> None
-    """Retrieve information about entry-points for the given package."""
     import sys
-    try:
-        import importlib_metadata
-    except ImportError:
-        import importlib.metadata as importlib_metadata  # type: ignore
-    import json
 
-    entry_points = importlib_metadata.distribution(package_name).entry_points  # type: ignore
-    print(json.dumps([{"name": ep.name, "value": ep.value, "group": ep.group} for ep in entry_points]))
+    json.dump({"path": sys.path}, sys.stdout)
     sys.exit(0)
 
 
-def _get_importlib_metadata_files(package_name):  # type: (str) -> None
-    """Retrieve information about files present for the given package."""
+def _get_interpreter_info():  # type: () -> None
+    """Get Python version and wheel tags supported by the given Python interpreter, ordered by preference."""
+    import json
+    import platform
     import sys
     try:
-        import importlib_metadata
+        # Use the very same logic pip uses when selecting artifacts for installation.
+        from pip._internal.utils.compatibility_tags import get_supported
+
+        tags = get_supported()
     except ImportError:
-        import importlib.metadata as importlib_metadata  # type: ignore
-    import json
+        from packaging.tags import sys_tags
 
-    print(
-        json.dumps(
-            [
-                {"hash": f.hash.__dict__ if f.hash else None, "size": f.size, "path": str(f)}
-                for f in importlib_metadata.files(package_name)  # type: ignore
-            ],
-        ),
-    )
+        tags = list(sys_tags())  # type: ignore
+
+    print(json.dumps({"python_version": platform.python_version(), "tags": [str(tag) for tag in tags]}))
     sys.exit(0)
 
 
-def _get_import_path():  # type: () -> None
-    """Get import path configured for the given Python interpreter."""
+def _env_worker():  # type: () -> None
+    """Serve function calls sent as line-delimited JSON requests on standard input.
+
+    Each request states source code of a function, its name and keyword arguments. The function is run with its
+    standard output and standard error captured, the response states the captured output and the exit code the
+    function would finish with if it was run in a dedicated interpreter.
+    """
+    import importlib
+    import io
     import json
+    import os
     import sys
-
-    json.dump({"path": sys.path}, sys.stdout)
-    sys.exit(0)
+    import traceback
+
+    # Keep the original standard output for responses. Anything written to file descriptor 1 directly (e.g. by a
+    # subprocess) is redirected to standard error so that it cannot corrupt the protocol.
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    namespaces = {}  # type: Dict[str, Dict[str, Any]]
+    for line in iter(sys.stdin.readline, ""):
+        request = json.loads(line)
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        original_stdout, original_stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = stdout, stderr
+        return_code = 0
+        try:
+            namespace = namespaces.get(request["source"])
+            if namespace is None:
+                namespace = {"__name__": "__thoth_solver_env_worker__"}
+                exec(request["source"], namespace)
+                namespaces[request["source"]] = namespace
+
+            # Packages get installed and removed between requests, make sure stale finder caches are not used.
+            importlib.invalidate_caches()
+            namespace[request["name"]](**request["kwargs"])
+        except SystemExit as exc:
+            if exc.code is None:
+                return_code = 0
+            elif isinstance(exc.code, int):
+                return_code = exc.code
+            else:
+                print(exc.code, file=sys.stderr)
+                return_code = 1
+        except Exception:
+            traceback.print_exc()
+            return_code = 1
+        finally:
+            sys.stdout, sys.stderr = original_stdout, original_stderr
+
+        protocol.write(
+            json.dumps({"return_code": return_code, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}) + "\n",
+        )
+        protocol.flush()
+
+
+class _EnvWorker(object):
+    """A persistent Python interpreter running `_env_worker' inside a virtual environment."""
+
+    def __init__(self, python_bin, env=None):  # type: (str, Optional[Dict[str, str]]) -> None
+        """Initialize worker, the interpreter is started lazily on the first call."""
+        self.python_bin = python_bin
+        self.env = env
+        self._process = None  # type: Optional[subprocess.Popen[str]]
+        self._lock = threading.Lock()
+
+    def _start(self):  # type: () -> subprocess.Popen[str]
+        """Start the persistent interpreter."""
+        environ = dict(os.environ)
+        environ.update(self.env or {})
+        cmd = [self.python_bin, "-c", inspect.getsource(_env_worker) + "\n\n" + _env_worker.__name__ + "()"]
+        _LOGGER.debug("Starting persistent Python interpreter %r (env: %r)", self.python_bin, self.env)
+        return subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=environ,
+            universal_newlines=True,
+        )
+
+    def call(self, function, **function_arguments):
+        # type: (Callable[..., None], Any) -> Dict[str, Any]
+        """Run the given function in the persistent interpreter, start the interpreter if needed."""
+        request = json.dumps(
+            {"name": function.__name__, "source": inspect.getsource(function), "kwargs": function_arguments},
+        )
+
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._process = self._start()
+
+            process = self._process
+            assert process.stdin is not None and process.stdout is not None
+
+            # Kill the interpreter if it does not respond in time, the caller sees it as an interpreter crash.
+            timer = threading.Timer(_ENV_WORKER_TIMEOUT, process.kill)
+            timer.start()
+            try:
+                process.stdin.write(request + "\n")
+                process.stdin.flush()
+                response = process.stdout.readline()
+            except (IOError, OSError):
+                response = ""
+            finally:
+                timer.cancel()
+
+            if not response:
+                return_code = process.wait()
+                self._process = None
+                return {
+                    "return_code": return_code or 1,
+                    "stdout": "",
+                    "stderr": "Persistent Python interpreter terminated unexpectedly with exit code {}".format(
+                        return_code,
+                    ),
+                }
+
+        result = json.loads(response)  # type: Dict[str, Any]
+        return result
+
+    def close(self):  # type: () -> None
+        """Terminate the persistent interpreter, if running."""
+        with self._lock:
+            if self._process is None:
+                return
+
+            process, self._process = self._process, None
+            if process.poll() is None:
+                assert process.stdin is not None
+                try:
+                    # The interpreter exits once its standard input is closed.
+                    process.stdin.close()
+                    process.wait(timeout=5)
+                except (IOError, OSError, subprocess.TimeoutExpired):
+                    process.kill()
+                    process.wait()
+
+            if process.stdout is not None:
+                process.stdout.close()
+
+
+def _get_env_worker(python_bin, env=None):  # type: (str, Optional[Dict[str, str]]) -> _EnvWorker
+    """Get a persistent interpreter for the given Python binary and environment variables."""
+    key = (python_bin, tuple(sorted((env or {}).items())))
+    with _ENV_WORKERS_LOCK:
+        worker = _ENV_WORKERS.get(key)
+        if worker is None:
+            worker = _EnvWorker(python_bin, env=env)
+            _ENV_WORKERS[key] = worker
+
+    return worker
+
+
+@atexit.register
+def shutdown_env_workers():  # type: () -> None
+    """Terminate all the persistent interpreters started, forget information obtained from them."""
+    with _ENV_WORKERS_LOCK:
+        workers = list(_ENV_WORKERS.values())
+        _ENV_WORKERS.clear()
+        # Virtual environments may be removed once workers are shut down, their paths can be reused later.
+        _get_env_import_path.cache_clear()
+        get_interpreter_info.cache_clear()
+
+    for worker in workers:
+        worker.close()
 
 
 def execute_env_function(
     python_bin,  # type: str
-    function,  # type: Union[Callable[[Any], None], Callable[[], None]]
+    function,  # type: Callable[..., None]
     *,
     env=None,  # type: Optional[Dict[str, str]]
     raise_on_error=True,  # type: bool
     is_json=False,  # type: bool
+    persistent=False,  # type: bool
     **function_arguments,  # type: Any
 ):  # type: (...) -> Optional[Union[str, Dict[str, Any], List[str]]]
-    """Execute the given function in Python interpreter."""
-    kwargs = ""
-    for argument, value in function_arguments.items():
-        if kwargs:
-            kwargs += ","
-
-        kwargs += argument + '="' + value + '"'
+    """Execute the given function in Python interpreter.
 
-    function_source = inspect.getsource(function)
-    cmd = python_bin + " -c " + (shlex.quote(function_source + "\n\n" + function.__name__ + "(" + kwargs + ")"))
-    _LOGGER.debug("Executing the following command in Python interpreter (env: %r): %r", env, cmd)
-    res = run_command(cmd, env=env, is_json=is_json, raise_on_error=False)
-
-    _LOGGER.debug("stderr during command execution: %s", res.stderr)
-
-    if raise_on_error and res.return_code != 0:
-        raise ValueError("Failed to successfully execute function in Python interpreter: {}".format(res.stderr))
-
-    _LOGGER.debug("stdout during command execution: %s", res.stdout)
+    If persistent is set, the function is sent to a persistent interpreter kept for the given Python binary and
+    environment variables instead of spawning a new interpreter.
+    """
+    if persistent:
+        _LOGGER.debug(
+            "Executing function %r in persistent Python interpreter %r (env: %r) with arguments %r",
+            function.__name__,
+            python_bin,
+            env,
+            function_arguments,
+        )
+        with span("env-function", function=function.__name__, persistent=True):
+            response = _get_env_worker(python_bin, env).call(function, **function_arguments)
+        return_code, stdout, stderr = response["return_code"], response["stdout"], response["stderr"]
+    else:
+        kwargs = ""
+        for argument, value in function_arguments.items():
+            if kwargs:
+                kwargs += ","
+
+            kwargs += argument + '="' + value + '"'
+
+        function_source = inspect.getsource(function)
+        cmd = python_bin + " -c " + (shlex.quote(function_source + "\n\n" + function.__name__ + "(" + kwargs + ")"))
+        _LOGGER.debug("Executing the following command in Python interpreter (env: %r): %r", env, cmd)
+        with span("env-function", function=function.__name__, persistent=False):
+            res = run_command(cmd, env=env, raise_on_error=False)
+        return_code, stdout, stderr = res.return_code, res.stdout, res.stderr
+
+    _LOGGER.debug("stderr during command execution: %s", stderr)
+
+    if raise_on_error and return_code != 0:
+        raise ValueError("Failed to successfully execute function in Python interpreter: {}".format(stderr))
+
+    _LOGGER.debug("stdout during command execution: %s", stdout)
+
+    if return_code == 0:
+        if is_json:
+            result = json.loads(stdout)  # type: Union[str, Dict[str, Any], List[str]]
+            return result
+
+        return stdout  # type: ignore
+
+    _LOGGER.error("Failed to successfully execute function in Python interpreter: %r", stderr)
+    return None
 
-    if res.return_code == 0:
-        stdout = res.stdout  # type: Union[str, Dict[str, Any]]
-        return stdout
 
-    _LOGGER.error("Failed to successfully execute function in Python interpreter: %r", res.stderr)
-    return None
+@lru_cache(maxsize=None)
+def _get_env_import_path(python_bin):  # type: (str) -> Tuple[str, ...]
+    """Get import path of the given Python interpreter, computed once per interpreter."""
+    import_path = execute_env_function(python_bin, _get_import_path, is_json=True, persistent=True)
+    return tuple(import_path["path"])  # type: ignore
 
 
-def get_package_metadata(python_bin, package_name):
-    # type: (str, str) -> Dict[str, Any]
-    """Get metadata information from the installed package."""
+def _get_env_pythonpath(python_bin):  # type: (str) -> Dict[str, str]
+    """Get environment variables to run functions which use modules available to this package in an interpreter."""
+    import_path = _get_env_import_path(python_bin)
     # A simple trick when running importlib_metadata - importlib_metadata is present as
     # a dependency of this package, but it is not installed in the created virtual environment.
     # Inject the current path to the created environment. Note however, the path configured in
@@ -213,52 +424,54 @@ def get_package_metadata(python_bin, package_name):
     # The reversed list is used to make tests happy as pytest-venv injects the current path at the
     # beginning. This *SHOULD NOT* affect how solver behaves when run as a data aggregation task in
     # the cluster.
-    venv_path = [
-        f
-        for f in reversed(execute_env_function(python_bin, _get_import_path, is_json=True)["path"])  # type: ignore
-        if f and f not in sys.path
-    ]
-
-    return {
-        "metadata": execute_env_function(
-            python_bin,
-            _get_importlib_metadata_metadata,
-            env={"PYTHONPATH": ":".join(venv_path + sys.path)},
-            is_json=True,
-            package_name=package_name,
-        ),
-        "requires": execute_env_function(
-            python_bin,
-            _get_importlib_metadata_requires,
-            env={"PYTHONPATH": ":".join(venv_path + sys.path)},
-            is_json=True,
-            package_name=package_name,
-        ),
-        "entry_points": execute_env_function(
-            python_bin,
-            _get_importlib_metadata_entry_points,
-            env={"PYTHONPATH": ":".join(venv_path + sys.path)},
-            is_json=True,
-            package_name=package_name,
-        ),
-        "files": execute_env_function(
-            python_bin,
-            _get_importlib_metadata_files,
-            env={"PYTHONPATH": ":".join(venv_path + sys.path)},
-            is_json=True,
-            package_name=package_name,
-        ),
-        "version": execute_env_function(
-            python_bin,
-            _get_importlib_metadata_version,
-            env={"PYTHONPATH": ":".join(venv_path + sys.path)},
-            is_json=False,
-            package_name=package_name,
-        ),
-    }
+    venv_path = [f for f in reversed(import_path) if f and f not in sys.path]
+    return {"PYTHONPATH": ":".join(venv_path + sys.path)}
+
+
+def get_distribution_metadata(python_bin, package_name, target=None):
+    # type: (str, str, Optional[str]) -> Tuple[str, Dict[str, Any]]
+    """Get distribution name and metadata information from the installed package, using one query.
+
+    If target is provided, the package is looked up in the given installation target directory first.
+    """
+    search_path = _get_env_import_path(python_bin)
+    if target:
+        search_path = (target,) + search_path
+
+    result = execute_env_function(  # type: ignore
+        python_bin,
+        _get_importlib_metadata_distribution,
+        env=_get_env_pythonpath(python_bin),
+        persistent=True,
+        is_json=True,
+        package_name=package_name,
+        search_path=":".join(search_path),
+    )  # type: Dict[str, Any]
+    return result.pop("distribution_name"), result
+
+
+def get_package_metadata(python_bin, package_name):
+    # type: (str, str) -> Dict[str, Any]
+    """Get metadata information from the installed package."""
+    return get_distribution_metadata(python_bin, package_name)[1]
+
+
+@lru_cache(maxsize=None)
+def get_interpreter_info(python_bin):  # type: (str) -> Dict[str, Any]
+    """Get Python version and wheel tags (ordered by preference) supported by the given interpreter."""
+    result = execute_env_function(  # type: ignore
+        python_bin,
+        _get_interpreter_info,
+        env=_get_env_pythonpath(python_bin),
+        persistent=True,
+        is_json=True,
+    )  # type: Dict[str, Any]
+    return result
 
 
 def find_distribution_name(python_bin, package_name):  # type: (str, str) -> str
     """Find distribution name based on the package name."""
-    result = str(execute_env_function(python_bin, _find_distribution_name, package_name=package_name))
+    result = str(
+        execute_env_function(python_bin, _find_distribution_name, persistent=True, package_name=package_name),
+    )
     return result
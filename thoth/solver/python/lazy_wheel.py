@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Reading remote files lazily using HTTP range requests.
+
+Wheels are zip files - their central directory is stored at the end of the file and it states where individual
+members are. Reading just the central directory and the dist-info members avoids downloading whole artifacts.
+"""
+
+import io
+import logging
+import re
+
+
+from .sessions import get_session
+from ..exceptions import RangeRequestsNotSupported
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Dict, List, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+_BLOCK_SIZE = 64 * 1024
+# The end of a wheel holds the zip central directory and, as dist-info is written last, often also dist-info.
+_TAIL_SIZE = 4 * _BLOCK_SIZE
+_CONTENT_RANGE_RE = re.compile(r"^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<length>\d+)$")
+
+
+class LazyRemoteFile(io.RawIOBase):
+    """A read-only seekable file object for a remote file fetching only parts that are read using range requests."""
+
+    def __init__(self, url, *, verify_ssl=True, block_size=_BLOCK_SIZE, tail_size=_TAIL_SIZE):
+        # type: (str, bool, int, int) -> None
+        """Initialize remote file, the tail of the file is fetched immediately."""
+        super().__init__()
+        self.url = url
+        self.verify_ssl = verify_ssl
+        self.block_size = block_size
+        self.requests_issued = 0
+        self.bytes_fetched = 0
+        self._blocks = {}  # type: Dict[int, bytes]
+        self._position = 0
+        self._length = self._fetch_tail(tail_size)
+
+    def _fetch(self, range_spec):  # type: (str) -> Tuple[int, int, bytes]
+        """Fetch the given range, return start of the range, total length of the file and data fetched."""
+        self.requests_issued += 1
+        response = get_session(self.url).get(
+            self.url,
+            headers={"Range": f"bytes={range_spec}", "Accept-Encoding": "identity"},
+            verify=self.verify_ssl,
+            stream=True,
+        )
+        with response:
+            if response.status_code == 200:
+                raise RangeRequestsNotSupported(f"Server hosting {self.url!r} does not support range requests")
+            response.raise_for_status()
+
+            match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+            if response.status_code != 206 or not match:
+                raise RangeRequestsNotSupported(
+                    f"Unexpected response when requesting range {range_spec!r} of {self.url!r}: "
+                    f"{response.status_code} (Content-Range: {response.headers.get('Content-Range')!r})",
+                )
+
+            data = response.content
+
+        self.bytes_fetched += len(data)
+        return int(match.group("start")), int(match.group("length")), data
+
+    def _store(self, start, data):  # type: (int, bytes) -> None
+        """Store fetched data as blocks, blocks that are fetched only partially are not stored."""
+        end = start + len(data)
+        block = -(-start // self.block_size)
+        while block * self.block_size < end:
+            block_start = block * self.block_size
+            block_end = min(block_start + self.block_size, self._length)
+            if block_end > end:
+                break
+
+            self._blocks[block] = data[block_start - start : block_end - start]
+            block += 1
+
+    def _fetch_tail(self, tail_size):  # type: (int) -> int
+        """Fetch the tail of the remote file, return total length of the remote file."""
+        start, self._length, data = self._fetch(f"-{tail_size}")
+        _LOGGER.debug("Remote file %r has %d bytes, fetched %d bytes of its tail", self.url, self._length, len(data))
+        self._store(start, data)
+        return self._length
+
+    def _ensure_blocks(self, first, last):  # type: (int, int) -> None
+        """Make sure the given range of blocks is available, consecutive missing blocks are fetched at once."""
+        runs = []  # type: List[List[int]]
+        for block in range(first, last + 1):
+            if block in self._blocks:
+                continue
+
+            if runs and runs[-1][1] == block - 1:
+                runs[-1][1] = block
+            else:
+                runs.append([block, block])
+
+        for run_first, run_last in runs:
+            range_start = run_first * self.block_size
+            range_end = min((run_last + 1) * self.block_size, self._length) - 1
+            start, _, data = self._fetch(f"{range_start}-{range_end}")
+            self._store(start, data)
+
+    def readable(self):  # type: () -> bool
+        """Check if the file is readable."""
+        return True
+
+    def seekable(self):  # type: () -> bool
+        """Check if the file is seekable."""
+        return True
+
+    def tell(self):  # type: () -> int
+        """Get the current position in the file."""
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):  # type: (int, int) -> int
+        """Change position in the file."""
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._length + offset
+        else:
+            raise ValueError(f"Invalid whence value: {whence}")
+
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+
+        self._position = position
+        return self._position
+
+    def readinto(self, buffer):  # type: (bytearray) -> int  # type: ignore[override]
+        """Read data to the given buffer, fetch blocks that were not read yet."""
+        size = min(len(buffer), self._length - self._position)
+        if size <= 0:
+            return 0
+
+        first = self._position // self.block_size
+        last = (self._position + size - 1) // self.block_size
+        self._ensure_blocks(first, last)
+
+        offset = self._position - first * self.block_size
+        data = b"".join(self._blocks[block] for block in range(first, last + 1))[offset : offset + size]
+        buffer[:size] = data
+        self._position += size
+        return size
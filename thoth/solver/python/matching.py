@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Matching of package releases against version specifiers.
+
+Versions of releases are parsed once and kept sorted by their public version. Specifier clauses stating a range
+are answered by bisection. Clauses whose semantics are not fully captured by the range (exclusive comparisons,
+compatible releases, exclusions, wildcards) are then checked on releases in the range only, so the result is exactly
+the same as checking each release against the specifier.
+"""
+
+from bisect import bisect_left
+from bisect import bisect_right
+
+from packaging.specifiers import Specifier
+from packaging.specifiers import SpecifierSet
+from packaging.version import InvalidVersion
+from packaging.version import Version
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, List, Optional, Tuple
+
+
+def _public(version):  # type: (Version) -> Version
+    """Get public version of the given version, local version labels are ignored by range comparisons."""
+    return Version(version.public) if version.local else version
+
+
+class ReleaseMatcher:
+    """Releases of a package prepared for matching against version specifiers."""
+
+    __slots__ = ("releases", "_keys", "_versions", "_positions", "_invalid")
+
+    def __init__(self, releases):  # type: (List[Tuple[str, str]]) -> None
+        """Parse and sort versions of the given releases (pairs of version and index URL)."""
+        self.releases = releases
+
+        parsed = []
+        self._invalid = []  # type: List[int]
+        for position, (version, _) in enumerate(releases):
+            try:
+                parsed_version = Version(version)
+            except InvalidVersion:
+                # Versions not compliant with PEP-440 cannot be ordered, they are always checked one by one.
+                self._invalid.append(position)
+                continue
+            parsed.append((_public(parsed_version), position, parsed_version))
+
+        parsed.sort(key=lambda item: item[0])
+        self._keys = [item[0] for item in parsed]  # type: List[Version]
+        self._positions = [item[1] for item in parsed]  # type: List[int]
+        self._versions = [item[2] for item in parsed]  # type: List[Version]
+
+    def _get_range(self, specifier):  # type: (SpecifierSet) -> Tuple[int, int, List[Any]]
+        """Get range of sorted versions that can satisfy the given specifier and clauses to be checked in it."""
+        low, high = 0, len(self._keys)
+        residual = []  # type: List[Any]
+        for clause in specifier:
+            if not isinstance(clause, Specifier) or clause.version.endswith(".*"):
+                residual.append(clause)
+                continue
+
+            operator = clause.operator
+            if operator not in (">=", ">", "~=", "<", "<=", "=="):
+                residual.append(clause)
+                continue
+
+            version = Version(clause.version)
+            bound = _public(version)
+            if operator in (">=", ">", "~=", "=="):
+                low = max(low, bisect_left(self._keys, bound))
+            if operator in ("<", "<=", "=="):
+                high = min(high, bisect_right(self._keys, bound))
+
+            # Inclusive comparisons are done on public versions, the range answers them exactly.
+            if operator not in (">=", "<=", "==") or version.local:
+                residual.append(clause)
+
+        return low, high, residual
+
+    def match(self, specifier):  # type: (SpecifierSet) -> List[Tuple[str, str]]
+        """Get releases matching the given specifier, releases are kept in their original order."""
+        prereleases = specifier.prereleases  # type: Optional[bool]
+        if not len(specifier) and prereleases:
+            return list(self.releases)
+
+        low, high, residual = self._get_range(specifier)
+        positions = [
+            self._positions[i]
+            for i in range(low, high)
+            if (prereleases or not self._versions[i].is_prerelease)
+            and all(clause.contains(self._versions[i], prereleases=True) for clause in residual)
+        ]
+        positions.extend(i for i in self._invalid if specifier.contains(self.releases[i][0]))
+        positions.sort()
+        return [self.releases[i] for i in positions]
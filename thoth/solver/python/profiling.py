@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Profiling of solver runs - a cProfile of the solver process and a trace of subprocesses it runs.
+
+Subprocesses (commands and functions executed in analyzed environments) are recorded as spans of a Chrome
+trace-event document, which can be opened in chrome://tracing or Perfetto. Each span states the kind of the
+subprocess and the package being analyzed in the thread that ran it, if any. Spans are recorded only while a
+profiler is running.
+"""
+
+from contextlib import contextmanager
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, Dict, Generator, List, Optional, Set
+
+_LOGGER = logging.getLogger(__name__)
+
+_LOCAL = threading.local()
+_TRACE = None  # type: Optional[_Trace]
+
+PROFILE_FILE = "profile.pstats"
+TRACE_FILE = "trace.json"
+
+
+class _Trace:
+    """Events of a Chrome trace-event document, safe to use from multiple threads."""
+
+    def __init__(self):  # type: () -> None
+        """Initialize an empty trace, timestamps are relative to its creation."""
+        self.events = []  # type: List[Dict[str, Any]]
+        self._started = time.perf_counter()
+        self._threads = set()  # type: Set[int]
+        self._lock = threading.Lock()
+
+    def _timestamp(self, now):  # type: (float) -> float
+        """Get timestamp of the given time in microseconds as used in trace events."""
+        return (now - self._started) * 1e6
+
+    def add_span(self, name, start, end, args):  # type: (str, float, float, Dict[str, Any]) -> None
+        """Add a complete event spanning the given time in the current thread."""
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": "subprocess",
+            "ph": "X",
+            "ts": self._timestamp(start),
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self._lock:
+            if thread.ident not in self._threads:
+                self._threads.add(thread.ident)  # type: ignore
+                self.events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": os.getpid(),
+                        "tid": thread.ident,
+                        "args": {"name": thread.name},
+                    }
+                )
+            self.events.append(event)
+
+
+@contextmanager
+def for_package(package_name, package_version):  # type: (str, str) -> Generator[None, None, None]
+    """State the given package is analyzed in the current thread, spans recorded meanwhile refer to it."""
+    previous = getattr(_LOCAL, "package", None)
+    _LOCAL.package = f"{package_name}=={package_version}"
+    try:
+        yield
+    finally:
+        _LOCAL.package = previous
+
+
+@contextmanager
+def span(kind, **args):  # type: (str, Any) -> Generator[None, None, None]
+    """Record a span of a subprocess of the given kind, with the given arguments, if a profiler is running."""
+    trace = _TRACE
+    if trace is None:
+        yield
+        return
+
+    package = getattr(_LOCAL, "package", None)
+    if package is not None:
+        args["package"] = package
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(kind, start, time.perf_counter(), args)
+
+
+@contextmanager
+def tracing():  # type: () -> Generator[List[Dict[str, Any]], None, None]
+    """Record spans of subprocesses run meanwhile without profiling, yield the list of trace events recorded."""
+    global _TRACE
+
+    trace = _Trace()
+    previous, _TRACE = _TRACE, trace
+    try:
+        yield trace.events
+    finally:
+        _TRACE = previous
+
+
+class Profiler:
+    """Profile the solver process and trace subprocesses it runs, results are written to the given directory.
+
+    Before Python 3.12, cProfile profiles only the thread it was enabled in - each thread started while profiling
+    gets its own profile and all of them are merged once profiling stops.
+    """
+
+    def __init__(self, directory):  # type: (str) -> None
+        """Initialize profiler writing to the given directory."""
+        self.directory = directory
+        self._profile = cProfile.Profile()
+        self._thread_profiles = []  # type: List[cProfile.Profile]
+        self._lock = threading.Lock()
+
+    def _profile_thread(self, *_):  # type: (Any) -> None
+        """Start profiling a new thread, called by the thread once started."""
+        sys.setprofile(None)
+        if isinstance(threading.current_thread(), threading.Timer):
+            # Timers guarding calls to persistent interpreters just wait.
+            return
+
+        profile = cProfile.Profile()
+        with self._lock:
+            self._thread_profiles.append(profile)
+        profile.enable()
+
+    def start(self):  # type: () -> None
+        """Start profiling and tracing subprocesses."""
+        global _TRACE
+
+        os.makedirs(self.directory, exist_ok=True)
+        _TRACE = _Trace()
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._profile_thread)
+        self._profile.enable()
+
+    def stop(self):  # type: () -> None
+        """Stop profiling, write the profile and the trace."""
+        global _TRACE
+
+        self._profile.disable()
+        threading.setprofile(None)
+        trace, _TRACE = _TRACE, None
+
+        stats = pstats.Stats(self._profile)
+        with self._lock:
+            for profile in self._thread_profiles:
+                stats.add(profile)
+        profile_path = os.path.join(self.directory, PROFILE_FILE)
+        stats.dump_stats(profile_path)
+
+        trace_path = os.path.join(self.directory, TRACE_FILE)
+        with open(trace_path, "w") as trace_file:
+            json.dump({"traceEvents": trace.events if trace is not None else [], "displayTimeUnit": "ms"}, trace_file)
+
+        _LOGGER.info("Profile written to %r, trace of subprocesses written to %r", profile_path, trace_path)
@@ -19,14 +19,18 @@
 """Dependency requirements solving for Python ecosystem."""
 
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 import logging
 import os
 from shlex import quote
+import shutil
 import sysconfig
+import tempfile
 from urllib.parse import urlparse
 
 from packaging.markers import default_environment
+from packaging.utils import canonicalize_name
 
 from thoth.analyzer import CommandError
 from thoth.analyzer import run_command
@@ -35,20 +39,53 @@ from thoth.python.exceptions import NotFoundError
 from thoth.python.exceptions import HTTPError
 from thoth.python.helpers import parse_requirement_str
 from thoth.license_solver import detect_license
+from .profiling import for_package
+from .profiling import span
 from .python_solver import PythonReleasesFetcher
+from .python_solver import ReleasesMemo
+from .wheel import get_wheel_metadata
+from .wheel import matches_python_version
+from .wheel import read_core_metadata
+from .wheel import read_remote_wheel_metadata
+from .wheel import select_wheel
 
 from .python_solver import PythonDependencyParser
 from .python_solver import PythonSolver
-from .instrument import get_package_metadata
-from .instrument import find_distribution_name
+from .instrument import get_distribution_metadata
+from .instrument import get_interpreter_info
+from .instrument import shutdown_env_workers
+from .artifact_cache import ArtifactCache
+from .artifact_cache import select_artifact
+from .budget import Budget
+from .checkpoint import Checkpoint
+from .checkpoint import IndexState
+from .index_cache import IndexPageCache
+from .result_cache import compute_fingerprint
+from .result_cache import ResultCache
+from .scheduler import SCHEDULING_POLICIES
+from .scheduler import create_scheduler
+from .sessions import configure_sessions
+from .sharding import get_seed_states
+from .sharding import get_shard
+from .timings import StageStats
+from .timings import collect
+from .timings import stage
+from .virtualenv_pool import VirtualenvPool
+from .virtualenv_pool import VirtualenvTemplate
+from ..exceptions import IndexCacheMiss
+from ..exceptions import RangeRequestsNotSupported
 
 from .._typing import MYPY_CHECK_RUNNING
 
 if MYPY_CHECK_RUNNING:  # pragma: no cover
-    from typing import List, Tuple, Dict, Generator, Optional, Any, Set, Deque
+    from concurrent.futures import Executor, Future
+    from typing import List, Tuple, Dict, Generator, Optional, Any, Set, Deque, Callable
+    from packaging.requirements import Requirement
 
 _LOGGER = logging.getLogger(__name__)
 _RAISE_ON_SYSTEM_EXIT_CODE = bool(int(os.getenv("THOTH_SOLVER_RAISE_ON_SYSTEM_EXIT_CODES", 0)))
+_DEFAULT_ARTIFACT_CACHE_SIZE = 10 * 1024 * 1024 * 1024
+_DEFAULT_INDEX_CONCURRENCY = 8
 _UNRESTRICTED_METADATA_KEYS = frozenset(
     {
         "classifier",
@@ -72,7 +109,8 @@ _UNRESTRICTED_METADATA_KEYS = frozenset(
 def get_environment_packages(python_bin):  # type: (str) -> List[Dict[str, str]]
     """Get information about packages in environment where packages get installed."""
     cmd = "{} -m pip freeze".format(python_bin)
-    output = run_command(cmd, is_json=False).stdout.splitlines()
+    with span("pip-freeze", command=cmd):
+        output = run_command(cmd, is_json=False).stdout.splitlines()
 
     result = []
     for line in output:
@@ -89,66 +127,118 @@ def get_environment_packages(python_bin):  # type: (str) -> List[Dict[str, str]]
     return result
 
 
-@contextmanager
-def _install_requirement(python_bin, package, version=None, index_url=None, clean=True):
-    # type: (str, str, Optional[str], Optional[str], bool) -> Generator[None, None, None]
-    """Install requirements specified using suggested pip binary."""
-    previous_version = _pipdeptree(python_bin, package)
+def _get_install_command(python_bin, package, version=None, index_url=None, options="", artifact_path=None):
+    # type: (str, str, Optional[str], Optional[str], str, Optional[str]) -> str
+    """Get pip command installing the given package without its dependencies.
 
-    try:
-        cmd = "{} -m pip install --force-reinstall --no-cache-dir --no-deps {}".format(python_bin, quote(package))
+    If a path to a local artifact of the package is provided, the package is installed from the given artifact.
+    """
+    if artifact_path:
+        cmd = "{} -m pip install {} --no-cache-dir --no-deps {}".format(python_bin, options, quote(artifact_path))
+    else:
+        cmd = "{} -m pip install {} --no-cache-dir --no-deps {}".format(python_bin, options, quote(package))
         if version:
             cmd += "==={}".format(quote(version))
-        if index_url:
-            cmd += ' --index-url "{}" '.format(quote(index_url))
-            # Supply trusted host by default so we do not get errors - it safe to
-            # do it here as package indexes are managed by Thoth.
-            trusted_host = urlparse(index_url).netloc
-            cmd += " --trusted-host {}".format(trusted_host)
+    if index_url:
+        cmd += ' --index-url "{}" '.format(quote(index_url))
+        # Supply trusted host by default so we do not get errors - it safe to
+        # do it here as package indexes are managed by Thoth.
+        trusted_host = urlparse(index_url).netloc
+        cmd += " --trusted-host {}".format(trusted_host)
+
+    return cmd
+
+
+@contextmanager
+def _install_requirement_target(python_bin, package, version=None, index_url=None, artifact_path=None):
+    # type: (str, str, Optional[str], Optional[str], Optional[str]) -> Generator[str, None, None]
+    """Install requirement into its own throwaway target directory, yield path to it.
+
+    The environment of the given Python interpreter is not modified so there is nothing to restore afterwards.
+    """
+    target = tempfile.mkdtemp(prefix="thoth-solver-target-")
+    try:
+        cmd = _get_install_command(
+            python_bin,
+            package,
+            version,
+            index_url,
+            options="--target " + quote(target),
+            artifact_path=artifact_path,
+        )
+        _LOGGER.debug("Installing requirement %r in version %r into %r", package, version, target)
+        with stage("install"), span("pip-install", command=cmd):
+            result = run_command(cmd)
+        _LOGGER.debug("Log during installation:\nstdout: %s\nstderr:%s", result.stdout, result.stderr)
+        yield target
+    finally:
+        with stage("restore"):
+            shutil.rmtree(target, ignore_errors=True)
+
+
+@contextmanager
+def _install_requirement(python_bin, package, version=None, index_url=None, clean=True, artifact_path=None):
+    # type: (str, str, Optional[str], Optional[str], bool, Optional[str]) -> Generator[None, None, None]
+    """Install requirements specified using suggested pip binary."""
+    with stage("restore"):
+        previous_version = _pipdeptree(python_bin, package)
 
+    try:
+        cmd = _get_install_command(
+            python_bin,
+            package,
+            version,
+            index_url,
+            options="--force-reinstall",
+            artifact_path=artifact_path,
+        )
         _LOGGER.debug("Installing requirement %r in version %r", package, version)
-        result = run_command(cmd)
+        with stage("install"), span("pip-install", command=cmd):
+            result = run_command(cmd)
         _LOGGER.debug("Log during installation:\nstdout: %s\nstderr:%s", result.stdout, result.stderr)
         yield
     finally:
         if clean:
-            _LOGGER.debug("Removing installed package %r", package)
-            cmd = "{} -m pip uninstall --yes {}".format(python_bin, quote(package))
-            result = run_command(cmd, raise_on_error=False)
-
-            if result.return_code != 0:
-                _LOGGER.warning(
-                    "Failed to restore previous environment by removing package %r (installed version %r), "
-                    "the error is not fatal but can affect future actions: %s",
-                    package,
-                    version,
-                    result.stderr,
-                )
-
-            _LOGGER.debug(
-                "Restoring previous environment setup after installation of %r (%s)",
-                package,
-                previous_version,
-            )
-            if previous_version:
-                cmd = "{} -m pip install --force-reinstall --no-cache-dir --no-deps {}=={}".format(
-                    python_bin,
-                    quote(package),
-                    quote(previous_version["package"]["installed_version"]),
-                )
-                _LOGGER.debug("Running %r", cmd)
-                result = run_command(cmd, raise_on_error=False)
+            with stage("restore"):
+                _LOGGER.debug("Removing installed package %r", package)
+                cmd = "{} -m pip uninstall --yes {}".format(python_bin, quote(package))
+                with span("pip-uninstall", command=cmd):
+                    result = run_command(cmd, raise_on_error=False)
 
                 if result.return_code != 0:
                     _LOGGER.warning(
-                        "Failed to restore previous environment for package %r (installed version %r), "
-                        ", the error is not fatal but can affect future actions (previous version: %r): %s",
+                        "Failed to restore previous environment by removing package %r (installed version %r), "
+                        "the error is not fatal but can affect future actions: %s",
                         package,
                         version,
-                        previous_version,
                         result.stderr,
                     )
 
+                _LOGGER.debug(
+                    "Restoring previous environment setup after installation of %r (%s)",
+                    package,
+                    previous_version,
+                )
+                if previous_version:
+                    cmd = "{} -m pip install --force-reinstall --no-cache-dir --no-deps {}=={}".format(
+                        python_bin,
+                        quote(package),
+                        quote(previous_version["package"]["installed_version"]),
+                    )
+                    _LOGGER.debug("Running %r", cmd)
+                    with span("pip-restore", command=cmd):
+                        result = run_command(cmd, raise_on_error=False)
+
+                    if result.return_code != 0:
+                        _LOGGER.warning(
+                            "Failed to restore previous environment for package %r (installed version %r), "
+                            ", the error is not fatal but can affect future actions (previous version: %r): %s",
+                            package,
+                            version,
+                            previous_version,
+                            result.stderr,
+                        )
+
 
 def _pipdeptree(python_bin, package_name=None, warn=False):
     # type: (str, Optional[str], bool) -> Any
@@ -156,7 +246,8 @@ def _pipdeptree(python_bin, package_name=None, warn=False):
     cmd = "{} -m pipdeptree --json".format(python_bin)
 
     _LOGGER.debug("Obtaining pip dependency tree using: %r", cmd)
-    output = run_command(cmd, is_json=True).stdout  # type: List[Dict[str, Any]]
+    with span("pipdeptree", command=cmd):
+        output = run_command(cmd, is_json=True).stdout  # type: List[Dict[str, Any]]
 
     if not package_name:
         return output
@@ -226,192 +317,748 @@ def _resolve_versions(solver, package_name, version_spec):
     return result
 
 
-def _fill_hashes(source, package_name, package_version, extracted_metadata):
-    # type: (Source, str, str, Dict[str, Any]) -> None
+def _map(lookup_executor, function, items):
+    # type: (Optional[Executor], Callable[[Any], Any], List[Any]) -> List[Any]
+    """Apply the given function on items, concurrently if an executor is provided, results keep order of items."""
+    if lookup_executor is None:
+        return [function(item) for item in items]
+
+    return list(lookup_executor.map(function, items))
+
+
+def _resolve_dependencies(all_dependency_solvers, dependencies, lookup_executor=None):
+    # type: (List[PythonSolver], List[Dict[str, Any]], Optional[Executor]) -> None
+    """Resolve versions of the given dependencies on all the dependency indexes, results are stored in order of indexes.
+
+    Versions are resolved concurrently for all the dependencies and indexes if an executor is provided.
+    """
+
+    def _lookup(item):  # type: (Tuple[Dict[str, Any], PythonSolver]) -> List[str]
+        dependency, dep_solver = item
+        _LOGGER.info(
+            "Resolving dependency versions for %r with range %r from %r",
+            dependency["normalized_package_name"],
+            dependency["specifier"],
+            dep_solver.releases_fetcher.index_url,
+        )
+        resolved_versions = _resolve_versions(
+            dep_solver,
+            dependency["normalized_package_name"],
+            dependency["specifier"] or "",
+        )
+        _LOGGER.debug(
+            "Resolved versions for package %r with range specifier %r: %s",
+            dependency["normalized_package_name"],
+            dependency["specifier"],
+            resolved_versions,
+        )
+        return resolved_versions
+
+    lookups = [(dependency, dep_solver) for dependency in dependencies for dep_solver in all_dependency_solvers]
+    for (dependency, dep_solver), resolved_versions in zip(lookups, _map(lookup_executor, _lookup, lookups)):
+        dependency["resolved_versions"].append(
+            {"versions": resolved_versions, "index": dep_solver.releases_fetcher.index_url},
+        )
+
+
+def _fill_hashes(releases_fetcher, package_name, package_version, extracted_metadata):
+    # type: (PythonReleasesFetcher, str, str, Dict[str, Any]) -> None
     extracted_metadata["sha256"] = []
     try:
-        package_hashes = source.get_package_hashes(package_name, package_version)
+        package_hashes = releases_fetcher.fetch_package_hashes(package_name, package_version)
     except NotFoundError:
         # Some older packages have different version on PyPI (considering simple API) than the ones
         # stated in metadata.
-        package_hashes = source.get_package_hashes(package_name, extracted_metadata["version"])
+        package_hashes = releases_fetcher.fetch_package_hashes(package_name, extracted_metadata["package_version"])
     for item in package_hashes:
         extracted_metadata["sha256"].append(item["sha256"])
 
     if not extracted_metadata["sha256"]:
-        raise ValueError(f"No artifact hashes were found for {package_name}=={package_version} on {source.url}")
+        raise ValueError(
+            f"No artifact hashes were found for {package_name}=={package_version} on {releases_fetcher.index_url}"
+        )
+
+
+def _get_provided(releases_fetcher, package_name, package_version=None):
+    # type: (PythonReleasesFetcher, str, Optional[str]) -> Dict[str, Optional[bool]]
+    """Check whether the index provides the given package (and version, if given), None if not known.
+
+    The project page is obtained through the index page cache, so that the check does not reach the index in
+    offline mode - whether a package not cached is provided is not known.
+    """
+    try:
+        project_index = releases_fetcher.fetch_project_index(package_name)
+    except NotFoundError:
+        return {"is_provided_package": False, "is_provided_package_version": False if package_version else None}
+    except IndexCacheMiss:
+        _LOGGER.debug("Index page of %r is not cached, cannot check whether it is provided", package_name)
+        return {"is_provided_package": None, "is_provided_package_version": None}
+
+    return {
+        "is_provided_package": True,
+        "is_provided_package_version": package_version in project_index.versions if package_version else None,
+    }
+
+
+def _get_index_metadata(python_bin, releases_fetcher, package_name, package_version, metadata_source):
+    # type: (str, PythonReleasesFetcher, str, str, str) -> Optional[Tuple[str, Dict[str, Any]]]
+    """Get distribution name and metadata without installing the package, return None if not possible."""
+    if metadata_source == "install":
+        return None
+
+    try:
+        interpreter_info = get_interpreter_info(python_bin)
+        artifact = select_wheel(
+            releases_fetcher.fetch_artifacts(package_name),
+            package_version,
+            interpreter_info["tags"],
+            interpreter_info["python_version"],
+        )
+        if artifact is None:
+            _LOGGER.debug("No compatible wheel found for %r in version %r", package_name, package_version)
+            return None
+
+        if metadata_source == "core-metadata":
+            core_metadata = releases_fetcher.fetch_core_metadata(artifact)
+            if core_metadata is not None:
+                _LOGGER.debug("Using core metadata of %r in version %r", package_name, package_version)
+                distribution_name, metadata = read_core_metadata(core_metadata)
+            else:
+                # Avoid downloading whole wheels, read just the needed parts if the server supports range requests.
+                _LOGGER.debug("No core metadata served for %r, reading remote wheel", artifact.filename)
+                try:
+                    distribution_name, metadata = read_remote_wheel_metadata(
+                        artifact,
+                        verify_ssl=releases_fetcher.source.verify_ssl,
+                    )
+                except RangeRequestsNotSupported:
+                    _LOGGER.debug("Range requests not supported for %r, falling back to installation", artifact.url)
+                    return None
+        else:
+            _LOGGER.debug("Reading metadata of %r in version %r from %r", package_name, package_version, artifact.url)
+            distribution_name, metadata = get_wheel_metadata(artifact, verify_ssl=releases_fetcher.source.verify_ssl)
+    except Exception as exc:
+        _LOGGER.warning(
+            "Failed to obtain metadata for %r in version %r from %r, falling back to installation: %s",
+            package_name,
+            package_version,
+            releases_fetcher.index_url,
+            str(exc),
+        )
+        return None
 
+    if not matches_python_version(metadata["metadata"].get("Requires-Python"), interpreter_info["python_version"]):
+        # Let the installation report the incompatibility the same way as without wheel metadata.
+        return None
 
-def _do_resolve_index(python_bin, solver, all_dependency_solvers, requirements, exclude_packages, transitive):
-    # type: (str, PythonSolver, List[PythonSolver], List[str], Optional[Set[str]], bool) -> Dict[str, Any]
-    """Perform resolution of requirements against the given solver."""
+    return distribution_name, metadata
+
+
+def _get_cached_artifact(python_bin, releases_fetcher, package_name, package_version, artifact_cache):
+    # type: (str, PythonReleasesFetcher, str, str, ArtifactCache) -> Optional[str]
+    """Get path to a cached artifact pip would install for the given package, return None if not possible."""
+    try:
+        interpreter_info = get_interpreter_info(python_bin)
+        artifact = select_artifact(
+            releases_fetcher.fetch_artifacts(package_name),
+            package_version,
+            interpreter_info["tags"],
+            interpreter_info["python_version"],
+        )
+        if artifact is None or not artifact.sha256:
+            _LOGGER.debug("No artifact with a digest found for %r in version %r", package_name, package_version)
+            return None
+
+        return artifact_cache.get(artifact, verify_ssl=releases_fetcher.source.verify_ssl)
+    except Exception as exc:
+        _LOGGER.warning(
+            "Failed to obtain cached artifact for %r in version %r from %r, installing from the index: %s",
+            package_name,
+            package_version,
+            releases_fetcher.index_url,
+            str(exc),
+        )
+        return None
+
+
+def _extract_package_metadata(
+    python_bin,
+    solver,
+    package_name,
+    package_version,
+    metadata_source="install",
+    install_strategy="environment",
+    artifact_cache=None,
+):
+    # type: (str, PythonSolver, str, str, str, str, Optional[ArtifactCache]) -> Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+    """Extract metadata of the given package in the given environment.
+
+    Return the distribution name with extracted metadata or an error report.
+    """
     index_url = solver.releases_fetcher.index_url
-    source = solver.releases_fetcher.source
 
-    packages_seen = set()
-    packages = []
-    errors = []
-    unresolved = []
-    unparsed = []
+    _LOGGER.info("Using index %r to discover package %r in version %r", index_url, package_name, package_version)
+    try:
+        with stage("metadata"):
+            index_metadata = _get_index_metadata(
+                python_bin,
+                solver.releases_fetcher,
+                package_name,
+                package_version,
+                metadata_source,
+            )
+        if index_metadata is not None:
+            package_name, package_metadata = index_metadata
+            with stage("metadata"):
+                extracted_metadata = extract_metadata(package_metadata, index_url)
+        else:
+            artifact_path = None
+            if artifact_cache is not None:
+                with stage("install"):
+                    artifact_path = _get_cached_artifact(
+                        python_bin,
+                        solver.releases_fetcher,
+                        package_name,
+                        package_version,
+                        artifact_cache,
+                    )
+
+            if install_strategy == "target":
+                with _install_requirement_target(
+                    python_bin,
+                    package_name,
+                    package_version,
+                    index_url,
+                    artifact_path=artifact_path,
+                ) as target, stage("metadata"):
+                    package_name, package_metadata = get_distribution_metadata(python_bin, package_name, target)
+                    extracted_metadata = extract_metadata(package_metadata, index_url)
+            else:
+                with _install_requirement(
+                    python_bin,
+                    package_name,
+                    package_version,
+                    index_url,
+                    artifact_path=artifact_path,
+                ), stage("metadata"):
+                    # Translate to distribution name - e.g. thoth-solver is actually distribution thoth.solver.
+                    package_name, package_metadata = get_distribution_metadata(python_bin, package_name)
+                    extracted_metadata = extract_metadata(package_metadata, index_url)
+    except (CommandError, Exception) as exc:
+        _LOGGER.debug(
+            "There was an error during package %r in version %r discovery from %r: %s",
+            package_name,
+            package_version,
+            index_url,
+            exc,
+        )
+        if not isinstance(exc, CommandError):
+            # Report any error happening during metadata aggregation so we know if there is a programming error.
+            # An example reported message:
+            #  https://github.com/thoth-station/solver/issues/342
+            _LOGGER.exception("An exception occurred during package metadata gathering")
+            details = {"message": str(exc)}
+        else:
+            if _RAISE_ON_SYSTEM_EXIT_CODE and exc.return_code == -9:
+                # Raise if the given exit code was a signal sent by the operating system.
+                raise
+            details = exc.to_dict()
+
+        error = {
+            "package_name": package_name,
+            "index_url": index_url,
+            "package_version": package_version,
+            "type": "command_error",
+            "details": details,
+            **_get_provided(solver.releases_fetcher, package_name, package_version),
+        }
+        return package_name, None, error
+
+    return package_name, extracted_metadata, None
+
+
+def _analyze_package(
+    virtualenv_pool,
+    solver,
+    package_name,
+    package_version,
+    metadata_source="install",
+    install_strategy="environment",
+    artifact_cache=None,
+):
+    # type: (VirtualenvPool, PythonSolver, str, str, str, str, Optional[ArtifactCache]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+    """Analyze the given package, return its extracted metadata or an error report.
+
+    A virtual environment from the pool is held only while metadata are extracted, license detection and obtaining
+    artifact hashes are done after it is returned to the pool so that other packages can be installed meanwhile.
+    """
+    with virtualenv_pool.acquire() as python_bin:
+        package_name, extracted_metadata, error = _extract_package_metadata(
+            python_bin,
+            solver,
+            package_name,
+            package_version,
+            metadata_source,
+            install_strategy,
+            artifact_cache,
+        )
+
+    if extracted_metadata is None:
+        return None, error
+
+    # license solver
+    with stage("license"):
+        extracted_metadata["package_license"] = detect_license(
+            extracted_metadata["importlib_metadata"]["metadata"],
+            package_name=package_name,
+            package_version=package_version,
+            raise_on_error=False,
+        )
+
+    _LOGGER.debug(
+        "Resolved license for package %r in version %r is %r",
+        package_name,
+        package_version,
+        extracted_metadata["package_license"],
+    )
+
+    if package_version != extracted_metadata["package_version"]:
+        _LOGGER.warning(
+            "Requested to install package %r in version %r but installed version is %r",
+            package_name,
+            package_version,
+            extracted_metadata["package_version"],
+        )
+
+    extracted_metadata["package_version_requested"] = package_version
+    with stage("hashes"):
+        _fill_hashes(solver.releases_fetcher, package_name, package_version, extracted_metadata)
+    return extracted_metadata, None
+
+
+def _get_cached_result(result_cache, releases_fetcher, index_url, package_name, package_version):
+    # type: (ResultCache, PythonReleasesFetcher, str, str, str) -> Optional[Dict[str, Any]]
+    """Get cached result of the given package analysis, revalidated against artifact hashes currently on the index."""
+    extracted_metadata = result_cache.get(index_url, package_name, package_version)
+    if extracted_metadata is None:
+        return None
+
+    try:
+        package_hashes = {
+            item["sha256"] for item in releases_fetcher.fetch_package_hashes(package_name, package_version)
+        }
+    except Exception as exc:
+        _LOGGER.warning(
+            "Failed to revalidate cached result of %r in version %r from %r: %s",
+            package_name,
+            package_version,
+            index_url,
+            str(exc),
+        )
+        return None
+
+    if package_hashes != set(extracted_metadata["sha256"]):
+        _LOGGER.info(
+            "Artifacts of %r in version %r on %r changed, invalidating cached result",
+            package_name,
+            package_version,
+            index_url,
+        )
+        result_cache.invalidate(index_url, package_name, package_version)
+        return None
+
+    _LOGGER.info("Using cached result of %r in version %r from %r", package_name, package_version, index_url)
+    return extracted_metadata
+
+
+def _get_environment_fingerprint(python_bin, result, metadata_source, install_strategy):
+    # type: (str, Dict[str, Any], str, str) -> str
+    """Get fingerprint of the solver environment, results of analyses are reused only in the same environment."""
+    from .. import __version__ as solver_version
+
+    return compute_fingerprint(
+        solver_version=solver_version,
+        environment=result["environment"],
+        platform=result["platform"],
+        environment_packages=result["environment_packages"],
+        interpreter=get_interpreter_info(python_bin),
+        metadata_source=metadata_source,
+        install_strategy=install_strategy,
+    )
+
+
+def _get_run_fingerprint(
+    requirements,
+    index_urls,
+    dependency_index_urls,
+    python_version,
+    exclude_packages,
+    transitive,
+    metadata_source,
+    shard=None,
+    seeds=None,
+):
+    # type: (List[str], List[str], Optional[List[str]], int, Optional[Set[str]], bool, str, Optional[Tuple[int, int]], Optional[Dict[str, IndexState]]) -> str
+    """Get fingerprint of inputs of the run, a checkpoint can be resumed only by a run with the same inputs."""
+    from .. import __version__ as solver_version
+
+    return compute_fingerprint(
+        solver_version=solver_version,
+        requirements=list(requirements),
+        index_urls=list(index_urls),
+        dependency_index_urls=list(dependency_index_urls or index_urls),
+        python_version=python_version,
+        exclude_packages=sorted(exclude_packages or ()),
+        transitive=transitive,
+        metadata_source=metadata_source,
+        shard=shard,
+        seed={index_url: sorted(state.queue) for index_url, state in seeds.items()} if seeds is not None else None,
+    )
+
+
+def _get_seed(seeds, solver):  # type: (Optional[Dict[str, IndexState]], PythonSolver) -> Optional[IndexState]
+    """Get seed of the resolution on index of the given solver, nothing is queued for indexes not in the seeds."""
+    if seeds is None:
+        return None
+
+    return seeds.get(solver.releases_fetcher.index_url) or IndexState(records=[], seen=set(), queue=[])
+
+
+def _discover_package(
+    virtualenv_pool,
+    solver,
+    all_dependency_solvers,
+    package_name,
+    package_version,
+    metadata_source="install",
+    install_strategy="environment",
+    artifact_cache=None,
+    result_cache=None,
+    lookup_executor=None,
+):
+    # type: (VirtualenvPool, PythonSolver, List[PythonSolver], str, str, str, str, Optional[ArtifactCache], Optional[ResultCache], Optional[Executor]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+    """Discover the given package using virtual environments of the pool, return its metadata or an error report.
+
+    Results of package analyses are taken from the result cache, if provided - no virtual environment is used then.
+    Versions of dependencies are always resolved as they depend on the current state of indexes, concurrently using the
+    lookup executor if provided. Errors are not cached as they can be transient.
+
+    Time spent in each stage of the discovery is stated in timings of the metadata or the error report.
+    """
+    index_url = solver.releases_fetcher.index_url
+
+    with collect() as timings, for_package(package_name, package_version):
+        extracted_metadata = None
+        if result_cache is not None:
+            with stage("cache"):
+                extracted_metadata = _get_cached_result(
+                    result_cache,
+                    solver.releases_fetcher,
+                    index_url,
+                    package_name,
+                    package_version,
+                )
+
+        error = None
+        if extracted_metadata is None:
+            extracted_metadata, error = _analyze_package(
+                virtualenv_pool,
+                solver,
+                package_name,
+                package_version,
+                metadata_source,
+                install_strategy,
+                artifact_cache,
+            )
+            if error is None and result_cache is not None:
+                result_cache.put(index_url, package_name, package_version, extracted_metadata)  # type: ignore
+
+        if error is None:
+            with stage("dependencies"):
+                _resolve_dependencies(
+                    all_dependency_solvers, extracted_metadata["dependencies"], lookup_executor  # type: ignore
+                )
+
+    if error is not None:
+        error["timings"] = timings
+        return None, error
+
+    extracted_metadata["timings"] = timings  # type: ignore
+    return extracted_metadata, None
+
+
+def _get_artifact_size(solver, package_name, package_version):  # type: (PythonSolver, str, str) -> Optional[int]
+    """Get size of the smallest artifact of the given package version as stated on the index, None if not known.
+
+    Called when packages are queued, only the project index fetched when resolving versions is used, the index is
+    not queried.
+    """
+    project_index = solver.releases_fetcher.get_fetched_project_index(package_name)
+    if project_index is None:
+        _LOGGER.debug("Size of artifacts of %r in version %r is not known", package_name, package_version)
+        return None
+
+    sizes = [artifact.size for artifact in project_index.get_artifacts(package_version) if artifact.size is not None]
+    return min(sizes) if sizes else None
+
+
+def _resolve_requirements(solver, requirements, exclude_packages, lookup_executor=None):
+    # type: (PythonSolver, List[str], Optional[Set[str]], Optional[Executor]) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[Tuple[str, str]]]
+    """Resolve versions of requirements against the given solver, return records produced and packages to discover."""
+    index_url = solver.releases_fetcher.index_url
+    source = solver.releases_fetcher.source
     exclude_packages = exclude_packages or set()
-    queue = deque()  # type: Deque[Tuple[str, str]]
+    records = []  # type: List[Tuple[str, Dict[str, Any]]]
+    queued = []  # type: List[Tuple[str, str]]
 
+    dependencies = []
     for requirement in requirements:
         _LOGGER.debug("Parsing requirement %r", requirement)
         try:
             dependency = PythonDependencyParser.parse_python(requirement)
         except Exception as exc:
             _LOGGER.warning("Failed to parse requirement %r: %s", requirement, str(exc))
-            unparsed.append({"requirement": requirement, "details": str(exc)})
+            records.append(("unparsed", {"requirement": requirement, "details": str(exc)}))
             continue
 
         if dependency.name in exclude_packages:
             continue
 
-        version_spec = str(dependency.specifier)
+        dependencies.append(dependency)
+
+    def _lookup(dependency):  # type: (Requirement) -> List[str]
         _LOGGER.info(
             "Resolving package %r with version specifier %r from %r",
             dependency.name,
-            version_spec,
+            str(dependency.specifier),
             source.url,
         )
-        resolved_versions = _resolve_versions(solver, dependency.name, version_spec)
+        return _resolve_versions(solver, dependency.name, str(dependency.specifier))
+
+    for dependency, resolved_versions in zip(dependencies, _map(lookup_executor, _lookup, dependencies)):
+        version_spec = str(dependency.specifier)
         if not resolved_versions:
             _LOGGER.warning("No versions were resolved for dependency %r in version %r", dependency.name, version_spec)
             error_report = {
                 "package_name": dependency.name,
                 "version_spec": version_spec,
                 "index_url": index_url,
-                "is_provided_package": source.provides_package(dependency.name),
-                "is_provided_package_version": None,
-            }
-            if version_spec.startswith("=="):
-                error_report["is_provided_package_version"] = source.provides_package_version(
+                **_get_provided(
+                    solver.releases_fetcher,
                     dependency.name,
-                    version_spec[len("==") :],
-                )
+                    version_spec[len("==") :] if version_spec.startswith("==") else None,
+                ),
+            }
 
-            unresolved.append(error_report)
+            records.append(("unresolved", error_report))
         else:
             for version in resolved_versions:
                 _LOGGER.info("Adding package %r in version %r for solving", dependency.name, version)
-                entry = (dependency.name, version)
-                packages_seen.add(entry)
-                queue.append(entry)
+                queued.append((dependency.name, version))
 
-    while queue:
-        package_name, package_version = queue.pop()
-        _LOGGER.info("Using index %r to discover package %r in version %r", index_url, package_name, package_version)
-        try:
-            with _install_requirement(python_bin, package_name, package_version, index_url):
-                # Translate to distribution name - e.g. thoth-solver is actually distribution thoth.solver.
-                package_name = find_distribution_name(python_bin, package_name)
-                package_metadata = get_package_metadata(python_bin, package_name)
-                extracted_metadata = extract_metadata(package_metadata, index_url)
-        except (CommandError, Exception) as exc:
-            _LOGGER.debug(
-                "There was an error during package %r in version %r discovery from %r: %s",
-                package_name,
-                package_version,
-                index_url,
-                exc,
-            )
-            if not isinstance(exc, CommandError):
-                # Report any error happening during metadata aggregation so we know if there is a programming error.
-                # An example reported message:
-                #  https://github.com/thoth-station/solver/issues/342
-                _LOGGER.exception("An exception occurred during package metadata gathering")
-                details = {"message": str(exc)}
-            else:
-                if _RAISE_ON_SYSTEM_EXIT_CODE and exc.return_code == -9:
-                    # Raise if the given exit code was a signal sent by the operating system.
-                    raise
-                details = exc.to_dict()
-
-            errors.append(
-                {
-                    "package_name": package_name,
-                    "index_url": index_url,
-                    "package_version": package_version,
-                    "type": "command_error",
-                    "details": details,
-                    "is_provided_package": source.provides_package(package_name),
-                    "is_provided_package_version": source.provides_package_version(package_name, package_version),
-                },
-            )
-            continue
+    return records, queued
 
-        # license solver
-        extracted_metadata["package_license"] = detect_license(
-            extracted_metadata["importlib_metadata"]["metadata"],
-            package_name=package_name,
-            package_version=package_version,
-            raise_on_error=False,
+
+def _do_resolve_index(
+    virtualenv_pool,
+    executor,
+    solver,
+    all_dependency_solvers,
+    requirements,
+    exclude_packages,
+    transitive,
+    metadata_source="install",
+    install_strategy="environment",
+    artifact_cache=None,
+    result_cache=None,
+    lookup_executor=None,
+    pipeline_depth=0,
+    sink=None,
+    checkpoint=None,
+    shard=None,
+    seed=None,
+    scheduling_policy="depth-first",
+    max_depth=None,
+    budget=None,
+):
+    # type: (VirtualenvPool, Executor, PythonSolver, List[PythonSolver], List[str], Optional[Set[str]], bool, str, str, Optional[ArtifactCache], Optional[ResultCache], Optional[Executor], int, Optional[Callable[[str, Dict[str, Any]], None]], Optional[Checkpoint], Optional[Tuple[int, int]], Optional[IndexState], str, Optional[int], Optional[Budget]) -> Dict[str, Any]
+    """Perform resolution of requirements against the given solver.
+
+    Packages are discovered concurrently in virtual environments of the given pool. At most as many packages as
+    the pool capacity allows are in flight and their results are processed in the order packages were
+    submitted - the next packages to discover are picked only when the oldest one finishes. The output thus does
+    not depend on timing and a pool of size one discovers packages in the same order as a serial run.
+
+    A virtual environment is held only while a package is installed and its metadata are extracted. If the pipeline
+    depth is set, up to that many additional packages are in flight - they are installed while packages submitted
+    earlier finish license detection, obtaining hashes and resolving versions of dependencies. The executor has to
+    provide enough threads for all packages in flight. Results are still processed in the order of submission so
+    the output remains deterministic, but packages are picked before all the packages submitted earlier finish,
+    so the order of discovery differs from a serial run.
+
+    Versions of requirements and dependencies are looked up on indexes concurrently using the lookup executor, if
+    provided. The executor must not be the one used to discover packages.
+
+    If a sink is provided, records are passed to it as soon as they are produced (with the name of the result
+    section they belong to) instead of being kept in the result returned.
+
+    If a checkpoint is provided, progress is recorded in it as packages are discovered. If the checkpoint holds
+    progress of a previous run on the index, records produced are emitted again and the resolution continues with
+    packages not discovered yet.
+
+    If a shard (its index and number of shards) is provided, only packages of the shard are discovered, other
+    packages found are reported as deferred. If a seed is provided, requirements are not resolved - the resolution
+    starts with packages queued in the seed instead, packages seen in the seed are not discovered again.
+
+    Packages queued are picked for discovery in the order given by the scheduling policy (depth-first by default),
+    the maximum depth is used by the depth-limited policy. The rate of discovery is reported periodically.
+
+    If a budget is provided, each package picked for discovery takes from it. Once the budget runs out, no more
+    packages are picked - packages in flight are finished and packages still queued are reported as pending.
+    """
+    index_url = solver.releases_fetcher.index_url
+
+    result = {
+        "tree": [],
+        "errors": [],
+        "unparsed": [],
+        "unresolved": [],
+        "deferred": [],
+        "pending": [],
+    }  # type: Dict[str, List[Dict[str, Any]]]
+
+    def _emit(section, record):  # type: (str, Dict[str, Any]) -> None
+        if sink is None:
+            result[section].append(record)
+        else:
+            sink(section, record)
+
+    def _emit_queued(entry):  # type: (Tuple[str, str]) -> None
+        # Packages of other shards are deferred, packages of this shard not picked within the budget are pending.
+        deferred = shard is not None and get_shard(entry[0], entry[1], shard[1]) != shard[0]
+        _emit(
+            "deferred" if deferred else "pending",
+            {"package_name": canonicalize_name(entry[0]), "package_version": entry[1], "index_url": index_url},
         )
 
-        _LOGGER.debug(
-            "Resolved license for package %r in version %r is %r",
+    state = checkpoint.get_state(index_url) if checkpoint is not None else None
+    if state is None:
+        if seed is not None:
+            records, queued = [], list(seed.queue)  # type: List[Tuple[str, Dict[str, Any]]], List[Tuple[str, str]]
+        else:
+            records, queued = _resolve_requirements(solver, requirements, exclude_packages, lookup_executor)
+        if checkpoint is not None:
+            checkpoint.record_roots(index_url, records, queued)
+        state = IndexState(records=records, seen=set(queued), queue=queued)
+
+    if seed is not None:
+        state.seen.update(seed.seen)
+
+    for section, record in state.records:
+        _emit(section, record)
+
+    scheduler = create_scheduler(
+        scheduling_policy,
+        max_depth=max_depth,
+        artifact_size=lambda package_name, package_version: _get_artifact_size(solver, package_name, package_version),
+    )
+    for entry in state.queue:
+        scheduler.push(entry, state.depths.get(entry, 0))
+
+    packages_seen = state.seen
+    del state
+
+    def _discover(package_name, package_version):
+        # type: (str, str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+        return _discover_package(
+            virtualenv_pool,
+            solver,
+            all_dependency_solvers,
             package_name,
             package_version,
-            extracted_metadata["package_license"],
+            metadata_source,
+            install_strategy,
+            artifact_cache,
+            result_cache,
+            lookup_executor,
         )
 
-        packages.append(extracted_metadata)
-        if package_version != extracted_metadata["package_version"]:
-            _LOGGER.warning(
-                "Requested to install package %r in version %r but installed version is %r",
-                package_name,
-                package_version,
-                extracted_metadata["package_version"],
-            )
+    in_flight = deque()  # type: Deque[Tuple[Tuple[str, str], int, Future[Any]]]
+    try:
+        while (scheduler and not (budget is not None and budget.exhausted)) or in_flight:
+            while scheduler and len(in_flight) < virtualenv_pool.capacity + pipeline_depth:
+                entry, depth = scheduler.pop()
+                if shard is not None and get_shard(entry[0], entry[1], shard[1]) != shard[0]:
+                    _emit_queued(entry)
+                    continue
 
-        extracted_metadata["package_version_requested"] = package_version
-        _fill_hashes(source, package_name, package_version, extracted_metadata)
+                if budget is not None and not budget.take():
+                    _emit_queued(entry)
+                    break
+
+                in_flight.append((entry, depth, executor.submit(_discover, *entry)))
+
+            scheduler.report(index_url)
+            if not in_flight:
+                # All the packages queued belong to other shards or the budget ran out.
+                continue
+
+            entry, depth, future = in_flight.popleft()
+            extracted_metadata, error = future.result()
+            queued = []
+            if error is None and transitive:
+                for dependency in extracted_metadata["dependencies"]:
+                    for resolved_versions in dependency["resolved_versions"]:
+                        for version in resolved_versions["versions"]:
+                            # Did we check this package already - do not check indexes, we manually insert them.
+                            seen_entry = (dependency["normalized_package_name"], version)
+                            if seen_entry not in packages_seen:
+                                _LOGGER.debug(
+                                    "Adding package %r in version %r for next resolution round",
+                                    seen_entry[0],
+                                    version,
+                                )
+                                packages_seen.add(seen_entry)
+                                scheduler.push(seen_entry, depth + 1)
+                                queued.append(seen_entry)
+
+            section, record = ("errors", error) if error is not None else ("tree", extracted_metadata)
+            if checkpoint is not None:
+                checkpoint.record_done(index_url, entry, section, record, queued, depth)
+            _emit(section, record)
+    finally:
+        for _, _, future in in_flight:
+            future.cancel()
 
-        for dependency in extracted_metadata["dependencies"]:
-            dependency_name, dependency_specifier = (
-                dependency["normalized_package_name"],  # type: ignore
-                dependency["specifier"],  # type: ignore
-            )
+    while scheduler:
+        entry, _ = scheduler.pop()
+        _emit_queued(entry)
 
-            for dep_solver in all_dependency_solvers:
-                _LOGGER.info(
-                    "Resolving dependency versions for %r with range %r from %r",
-                    dependency_name,
-                    dependency_specifier,
-                    dep_solver.releases_fetcher.index_url,
-                )
-                resolved_versions = _resolve_versions(
-                    dep_solver,
-                    dependency_name,
-                    dependency_specifier or "",
-                )
-                _LOGGER.debug(
-                    "Resolved versions for package %r with range specifier %r: %s",
-                    dependency_name,
-                    dependency_specifier,
-                    resolved_versions,
-                )
-                dependency["resolved_versions"].append(  # type: ignore
-                    {"versions": resolved_versions, "index": dep_solver.releases_fetcher.index_url},
-                )
+    scheduler.report(index_url, force=True)
+    return result
 
-                if not transitive:
-                    continue
 
-                for version in resolved_versions:
-                    # Did we check this package already - do not check indexes, we manually insert them.
-                    seen_entry = (dependency_name, version)
-                    if seen_entry not in packages_seen:
-                        _LOGGER.debug(
-                            "Adding package %r in version %r for next resolution round",
-                            dependency_name,
-                            version,
-                        )
-                        packages_seen.add(seen_entry)
-                        queue.append((dependency_name, version))
+def _finalize_entry(entry, limited_output):  # type: (Dict[str, Any], bool) -> None
+    """Finalize the given tree entry for the output, list Python packages it provides and drop restricted data."""
+    packages = []
+    for file_info in entry.get("importlib_metadata", {}).get("files") or []:
+        path = file_info["path"]
+        parts = path.split(os.path.sep)
+        if parts[-1] == "__init__.py":
+            packages.append(".".join(parts[:-1]))
+
+    packages.sort(key=lambda p: (p.count("."), p))
+    entry["packages"] = packages
+
+    if limited_output:
+        importlib_metadata = entry["importlib_metadata"]
+        importlib_metadata.pop("files", None)
 
-    return {"tree": packages, "errors": errors, "unparsed": unparsed, "unresolved": unresolved}
+        # Drop any metadata such as author, home page, contact e-mail that can be sensitive.
+        for key in list(importlib_metadata["metadata"].keys()):
+            if key.lower() not in _UNRESTRICTED_METADATA_KEYS:
+                _LOGGER.debug("Removing %r from output based on limited output option", key)
+                importlib_metadata["metadata"].pop(key)
 
 
 def resolve(
@@ -424,20 +1071,136 @@ def resolve(
     transitive,
     virtualenv,
     limited_output=True,
+    metadata_source="install",
+    workers=1,
+    virtualenv_pool=None,
+    install_strategy="environment",
+    artifact_cache=None,
+    artifact_cache_size=_DEFAULT_ARTIFACT_CACHE_SIZE,
+    result_cache=None,
+    index_cache=None,
+    index_cache_ttl=0,
+    offline=False,
+    index_concurrency=_DEFAULT_INDEX_CONCURRENCY,
+    pipeline_depth=0,
+    http_pool_size=None,
+    sink=None,
+    checkpoint=None,
+    resume=False,
+    shard=None,
+    shard_seed=None,
+    scheduling_policy="depth-first",
+    max_depth=None,
+    deadline=None,
+    max_packages=None,
 ):
-    # type: (List[str], List[str], Optional[List[str]], int, Optional[Set[str]], bool, Optional[str], bool) -> Dict[str, Any]
-    """Resolve given requirements for the given Python version."""
+    # type: (List[str], List[str], Optional[List[str]], int, Optional[Set[str]], bool, Optional[str], bool, str, int, Optional[str], str, Optional[str], int, Optional[str], Optional[str], int, bool, int, int, Optional[int], Optional[Callable[[str, Dict[str, Any]], None]], Optional[str], bool, Optional[Tuple[int, int]], Optional[Dict[str, Any]], str, Optional[int], Optional[float], Optional[int]) -> Dict[str, Any]
+    """Resolve given requirements for the given Python version.
+
+    Metadata of analyzed packages are obtained by installing them by default ("install" metadata source), if set to
+    "wheel", metadata are read from a compatible wheel published on the index instead (if any). If set to
+    "core-metadata", only core metadata of a compatible wheel as served by the index (PEP-658) are used.
+
+    If workers is greater than one, packages are discovered concurrently in a pool of the given number of virtual
+    environments and indexes are resolved concurrently.
+
+    If no virtual environment is provided, virtual environments are cloned from a template kept in the virtualenv
+    pool directory, if provided, instead of creating a new virtual environment.
+
+    Packages are installed into the virtual environment and removed afterwards by default ("environment" install
+    strategy). If set to "target", each package is installed into its own throwaway directory layered over the
+    virtual environment which is never modified - parallel workers then share the same virtual environment.
+
+    If an artifact cache directory is provided, artifacts installed are kept there (up to the given size in bytes)
+    and subsequent installations of the same artifacts are served from the cache.
+
+    If a result cache database is provided, results of package analyses obtained in the same solver environment are
+    reused across runs as long as artifacts of the package on the index do not change.
+
+    If an index cache directory is provided, index pages listing releases and artifacts are kept there and reused
+    across runs - pages older than the given time to live (in seconds) are revalidated with conditional requests.
+    In offline mode, index pages are served only from the index cache.
+
+    Versions of requirements and dependencies are looked up on all the indexes concurrently, at most the given
+    number of lookups are in flight at once.
+
+    If pipeline depth is set, up to that many packages beyond the number of workers are discovered at once - they
+    are installed while other packages finish work done over network (obtaining hashes, resolving dependencies).
+
+    Requests to indexes are issued using HTTP sessions shared per host, at most the given number of connections
+    are kept alive to each host - by default enough for all the concurrent lookups and discoveries.
+
+    If a sink is provided, records of the tree, errors, unparsed and unresolved sections are passed to it as soon as
+    they are produced, together with the name of the section, and these sections are left empty in the result
+    returned. The sink is called from multiple threads if indexes are resolved concurrently.
+
+    If a checkpoint file is provided, progress of the resolution is recorded there as packages are discovered. If
+    resume is set and the checkpoint exists, the resolution continues from the progress recorded by a previous run
+    with the same inputs - packages already discovered are not analyzed again.
+
+    If a shard (its index and number of shards) is provided, only packages belonging to the shard are discovered and
+    packages of other shards found are listed as deferred in the result. Documents of all the shards are merged
+    afterwards. If a shard seed (a merged document) is provided, the resolution continues with packages deferred in
+    the seed instead of resolving requirements.
+
+    Packages queued for discovery are picked in the order given by the scheduling policy - "depth-first" (default),
+    "breadth-first", "depth-limited" (depth-first down to the maximum depth, deeper packages are postponed),
+    "newest-version-first" or "smallest-artifact-first". The order affects which packages are discovered first, not
+    the packages discovered.
+
+    If a deadline (in seconds since the start) or a maximum number of packages is set, no more packages are picked
+    for discovery once either of them is reached. Packages being discovered at that point are finished and packages
+    still queued are listed as pending in the result, which is otherwise complete. If a checkpoint is used, a resumed
+    run continues with the pending packages.
+
+    Each tree entry and error states time spent in stages of its discovery, aggregates of stage timings over the run
+    (count, sum, median, 95th percentile and maximum) are stated in the result.
+    """
     assert python_version in (2, 3), "Unknown Python version"
+    assert workers >= 1, "Number of workers has to be a positive number"
+    assert index_concurrency >= 1, "Number of concurrent index lookups has to be a positive number"
+    assert pipeline_depth >= 0, "Pipeline depth has to be a non-negative number"
+    assert metadata_source in ("install", "wheel", "core-metadata"), "Unknown metadata source"
+    assert install_strategy in ("environment", "target"), "Unknown install strategy"
+    assert index_cache_ttl >= 0, "Index cache time to live has to be a non-negative number"
+    assert not offline or index_cache, "Offline mode requires an index cache"
+    assert http_pool_size is None or http_pool_size >= 1, "HTTP connection pool size has to be a positive number"
+    assert checkpoint or not resume, "Resuming requires a checkpoint"
+    assert shard is None or 0 <= shard[0] < shard[1], "Invalid shard"
+    assert shard is not None or shard_seed is None, "Shard seed can be used only in sharded runs"
+    assert scheduling_policy in SCHEDULING_POLICIES, "Unknown scheduling policy"
+    assert deadline is None or deadline > 0, "Deadline has to be a positive number"
+    assert max_packages is None or max_packages >= 1, "Maximum number of packages has to be a positive number"
+
+    budget = Budget(deadline, max_packages) if deadline is not None or max_packages is not None else None
+    assert scheduling_policy != "depth-limited" or max_depth is not None, "Depth-limited scheduling requires max depth"
 
     python_bin = "python3" if python_version == 3 else "python2"
-    if not virtualenv:
-        run_command("virtualenv -p " + python_bin + " venv")
-        python_bin = os.path.join("venv", "bin", python_bin)
-        run_command("{} -m pip install pipdeptree".format(python_bin))
-    else:
+    # Installing into targets does not modify virtual environments, workers can share one.
+    pool_size = 1 if install_strategy == "target" else workers
+    pool = None
+    if virtualenv:
         python_bin = os.path.join(virtualenv, "bin", python_bin)
+    elif virtualenv_pool:
+        pool = VirtualenvPool.from_template(VirtualenvTemplate(virtualenv_pool, python_bin), pool_size)
+        python_bin = pool.python_bins[0]
+    else:
+        with span("virtualenv"):
+            run_command("virtualenv -p " + python_bin + " venv")
+        python_bin = os.path.join("venv", "bin", python_bin)
+        with span("pip-install", command="pipdeptree"):
+            run_command("{} -m pip install pipdeptree".format(python_bin))
 
-    environment_packages = get_environment_packages(python_bin)
+    try:
+        environment_packages = get_environment_packages(python_bin)
+        if pool is None:
+            pool = VirtualenvPool.create(python_bin, pool_size)
+        if install_strategy == "target":
+            pool.share(workers)
+    except Exception:
+        if pool is not None:
+            pool.close()
+        raise
 
     result = {
         "tree": [],
@@ -448,13 +1211,30 @@ def resolve(
         "environment_packages": environment_packages,
         "platform": sysconfig.get_platform(),
     }  # type: Dict[str, Any]
-
+    if shard is not None:
+        result["deferred"] = []
+    if budget is not None:
+        result["pending"] = []
+    seeds = get_seed_states(shard_seed) if shard_seed is not None else None
+
+    # Packages in the pipeline beyond the number of workers need their own threads.
+    discovery_workers = workers + pipeline_depth
+    configure_sessions(http_pool_size or index_concurrency + discovery_workers)
+    page_cache = IndexPageCache(index_cache, ttl=index_cache_ttl, offline=offline) if index_cache else None
+    # Releases of each package are fetched once per index in a run, version specifiers are applied on them locally.
+    releases_memo = ReleasesMemo()
+    # The same index can be used to resolve requirements and dependencies, one source is created per index.
+    sources = {}  # type: Dict[str, Source]
     all_solvers = []
     for index_url in index_urls:
         all_solvers.append(
             PythonSolver(
                 dependency_parser=PythonDependencyParser(),
-                releases_fetcher=PythonReleasesFetcher(source=Source(index_url)),
+                releases_fetcher=PythonReleasesFetcher(
+                    source=sources.setdefault(index_url, Source(index_url)),
+                    page_cache=page_cache,
+                    releases_memo=releases_memo,
+                ),
             ),
         )
 
@@ -464,47 +1244,111 @@ def resolve(
             all_dependency_solvers.append(
                 PythonSolver(
                     dependency_parser=PythonDependencyParser(),
-                    releases_fetcher=PythonReleasesFetcher(source=Source(index_url)),
+                    releases_fetcher=PythonReleasesFetcher(
+                        source=sources.setdefault(index_url, Source(index_url)),
+                        page_cache=page_cache,
+                        releases_memo=releases_memo,
+                    ),
                 ),
             )
     else:
         all_dependency_solvers = all_solvers
 
-    for solver in all_solvers:
-        solver_result = _do_resolve_index(
-            python_bin=python_bin,
-            solver=solver,
-            all_dependency_solvers=all_dependency_solvers,
-            requirements=requirements,
-            exclude_packages=exclude_packages,
-            transitive=transitive,
-        )
-
-        result["tree"].extend(solver_result["tree"])
-        result["errors"].extend(solver_result["errors"])
-        result["unparsed"].extend(solver_result["unparsed"])
-        result["unresolved"].extend(solver_result["unresolved"])
+    stage_stats = StageStats()
+    index_sink = None  # type: Optional[Callable[[str, Dict[str, Any]], None]]
+    if sink is not None:
+
+        def index_sink(section, record):  # type: (str, Dict[str, Any]) -> None
+            if section in ("tree", "errors"):
+                stage_stats.add(record.get("timings"))
+            if section == "tree":
+                _finalize_entry(record, limited_output)
+            sink(section, record)
+
+    cache = ArtifactCache(artifact_cache, artifact_cache_size) if artifact_cache else None
+    results = None
+    progress = None
+    # Indexes are resolved concurrently if run in parallel, results are merged in the order of indexes.
+    index_workers = max(len(all_solvers), 1) if workers > 1 else 1
+    try:
+        if result_cache:
+            results = ResultCache(
+                result_cache,
+                _get_environment_fingerprint(pool.python_bins[0], result, metadata_source, install_strategy),
+            )
 
-    for item in result["tree"]:
-        packages = []
-        for file_info in item.get("importlib_metadata", {}).get("files") or []:
-            path = file_info["path"]
-            parts = path.split(os.path.sep)
-            if parts[-1] == "__init__.py":
-                packages.append(".".join(parts[:-1]))
+        if checkpoint:
+            progress = Checkpoint(
+                checkpoint,
+                _get_run_fingerprint(
+                    requirements,
+                    index_urls,
+                    dependency_index_urls,
+                    python_version,
+                    exclude_packages,
+                    transitive,
+                    metadata_source,
+                    shard,
+                    seeds,
+                ),
+                resume=resume,
+            )
 
-        packages.sort(key=lambda p: (p.count("."), p))
-        item["packages"] = packages
+        # Lookups are run in their own executor as they are issued from tasks run in the other ones, it is shut down
+        # last so that tasks still running can finish their lookups.
+        with ThreadPoolExecutor(index_concurrency) as lookup_executor:
+            with ThreadPoolExecutor(discovery_workers) as executor, ThreadPoolExecutor(index_workers) as index_executor:
+                solver_results = [
+                    index_executor.submit(
+                        _do_resolve_index,
+                        virtualenv_pool=pool,
+                        executor=executor,
+                        solver=solver,
+                        all_dependency_solvers=all_dependency_solvers,
+                        requirements=requirements,
+                        exclude_packages=exclude_packages,
+                        transitive=transitive,
+                        metadata_source=metadata_source,
+                        install_strategy=install_strategy,
+                        artifact_cache=cache,
+                        result_cache=results,
+                        lookup_executor=lookup_executor,
+                        pipeline_depth=pipeline_depth,
+                        sink=index_sink,
+                        checkpoint=progress,
+                        shard=shard,
+                        seed=_get_seed(seeds, solver),
+                        scheduling_policy=scheduling_policy,
+                        max_depth=max_depth,
+                        budget=budget,
+                    )
+                    for solver in all_solvers
+                ]
+
+                for solver_result_future in solver_results:
+                    solver_result = solver_result_future.result()
+                    result["tree"].extend(solver_result["tree"])
+                    result["errors"].extend(solver_result["errors"])
+                    result["unparsed"].extend(solver_result["unparsed"])
+                    result["unresolved"].extend(solver_result["unresolved"])
+                    if shard is not None:
+                        result["deferred"].extend(solver_result["deferred"])
+                    if budget is not None:
+                        result["pending"].extend(solver_result["pending"])
+    finally:
+        # Persistent interpreters are bound to the virtual environments used in this run.
+        shutdown_env_workers()
+        pool.close()
+        if results is not None:
+            results.close()
+        if progress is not None:
+            progress.close()
 
-    if limited_output:
-        for entry in result["tree"]:
-            importlib_metadata = entry["importlib_metadata"]
-            importlib_metadata.pop("files", None)
+    for entry in result["tree"]:
+        _finalize_entry(entry, limited_output)
 
-            # Drop any metadata such as author, home page, contact e-mail that can be sensitive.
-            for key in list(importlib_metadata["metadata"].keys()):
-                if key.lower() not in _UNRESTRICTED_METADATA_KEYS:
-                    _LOGGER.debug("Removing %r from output based on limited output option", key)
-                    importlib_metadata["metadata"].pop(key)
+    for entry in result["tree"] + result["errors"]:
+        stage_stats.add(entry.get("timings"))
 
+    result["timings"] = stage_stats.summary()
     return result
@@ -18,23 +18,86 @@
 
 """Classes for resolving dependencies as specified in each ecosystem."""
 
+from concurrent.futures import Future
+from functools import lru_cache
 import logging
+import threading
 
 import attr
 from thoth.python import Source
+from thoth.python.exceptions import HTTPError
+from thoth.python.exceptions import NotFoundError
 from packaging.requirements import Requirement
 
+from .artifacts import ArtifactLink
+from .artifacts import fetch_core_metadata
+from .artifacts import fetch_project_index
+from .artifacts import ProjectIndex
 from .base import DependencyParser
 from .base import ReleasesFetcher
 from .base import Solver
+from .index_cache import IndexPageCache
 
 from .._typing import MYPY_CHECK_RUNNING
 
 if MYPY_CHECK_RUNNING:  # pragma: no cover
-    from typing import List, Tuple
+    from typing import Callable, Dict, List, Optional, Tuple
 
 
 _LOGGER = logging.getLogger(__name__)
+# Size of the cache of parsed requirements, the same requirements are stated by many packages.
+_REQUIREMENT_CACHE_SIZE = 4096
+# Errors stating a package is not available on an index are remembered, other errors can be transient.
+_MEMOIZED_ERRORS = (NotFoundError, HTTPError)
+
+
+class ReleasesMemo:
+    """Releases and artifacts of packages fetched in one solver run, keyed by index URL and normalized package name.
+
+    Project index of each package is fetched once per index, concurrent requests for the same package wait for
+    the one fetching it.
+    """
+
+    def __init__(self):  # type: () -> None
+        """Initialize an empty memo."""
+        self._lock = threading.Lock()
+        self._entries = {}  # type: Dict[Tuple[str, str], Future[ProjectIndex]]
+
+    def get(self, index_url, package_name, fetch):
+        # type: (str, str, Callable[[], ProjectIndex]) -> ProjectIndex
+        """Get project index of the given package, call fetch to obtain it if not fetched yet."""
+        key = (index_url, package_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = Future()
+
+        if not owner:
+            _LOGGER.debug("Using project index of %r from %r fetched previously", package_name, index_url)
+            return entry.result()  # type: ignore
+
+        try:
+            result = fetch()
+        except BaseException as exc:
+            if not isinstance(exc, _MEMOIZED_ERRORS):
+                with self._lock:
+                    del self._entries[key]
+            entry.set_exception(exc)  # type: ignore
+            raise
+
+        entry.set_result(result)  # type: ignore
+        return result
+
+    def get_fetched(self, index_url, package_name):  # type: (str, str) -> Optional[ProjectIndex]
+        """Get project index of the given package if it was already fetched successfully, never fetch it."""
+        with self._lock:
+            entry = self._entries.get((index_url, package_name))
+
+        if entry is None or not entry.done() or entry.exception() is not None:
+            return None
+
+        return entry.result()
 
 
 @attr.s(slots=True)
@@ -42,13 +105,58 @@ class PythonReleasesFetcher(ReleasesFetcher):
     """A releases fetcher based on PEP compatible simple API (also supporting Warehouse API)."""
 
     source = attr.ib(type=Source, kw_only=True)
+    page_cache = attr.ib(default=None, kw_only=True)  # type: Optional[IndexPageCache]
+    releases_memo = attr.ib(default=None, kw_only=True)  # type: Optional[ReleasesMemo]
+
+    def fetch_project_index(self, package_name):  # type: (str) -> ProjectIndex
+        """Fetch artifacts and versions of the given package, once per run if the releases memo is used."""
+        package_name = self.source.normalize_package_name(package_name)
+        if self.releases_memo is not None:
+            return self.releases_memo.get(
+                self.index_url,
+                package_name,
+                lambda: fetch_project_index(self.source, package_name, page_cache=self.page_cache),
+            )
+
+        return fetch_project_index(self.source, package_name, page_cache=self.page_cache)
+
+    def get_fetched_project_index(self, package_name):  # type: (str) -> Optional[ProjectIndex]
+        """Get project index of the given package fetched previously in this run, None if not fetched yet."""
+        if self.releases_memo is None:
+            return None
+
+        return self.releases_memo.get_fetched(self.index_url, self.source.normalize_package_name(package_name))
 
     def fetch_releases(self, package_name):  # type: (str) -> Tuple[str, List[Tuple[str, str]]]
         """Fetch package and index_url for a package_name."""
-        package_name = self.source.normalize_package_name(package_name)  # XXX
-        releases = self.source.get_package_versions(package_name)
-        releases_with_index_url = [(release, self.index_url) for release in releases]
-        return package_name, releases_with_index_url
+        project_index = self.fetch_project_index(package_name)
+        return project_index.package_name, project_index.releases
+
+    def fetch_artifacts(self, package_name):  # type: (str) -> List[ArtifactLink]
+        """Fetch artifacts available for the given package as listed on the simple repository API."""
+        return self.fetch_project_index(package_name).artifacts
+
+    def fetch_package_hashes(self, package_name, package_version):  # type: (str, str) -> List[Dict[str, str]]
+        """Fetch names and sha256 digests of artifacts of the given package version."""
+        artifacts = self.fetch_project_index(package_name).get_artifacts(package_version)
+        if not artifacts:
+            raise NotFoundError(
+                f"Package {package_name} in version {package_version} is not present on index {self.source.url}"
+            )
+
+        if not all(artifact.sha256 for artifact in artifacts):
+            # The index does not state digests, they are computed out of downloaded artifacts.
+            package_hashes = self.source.get_package_hashes(package_name, package_version)  # type: List[Dict[str, str]]
+            return package_hashes
+
+        return [{"name": artifact.filename, "sha256": artifact.sha256} for artifact in artifacts]  # type: ignore
+
+    def fetch_core_metadata(self, artifact):  # type: (ArtifactLink) -> Optional[str]
+        """Fetch core metadata of the given artifact if served by the index (PEP-658), return None otherwise."""
+        if not artifact.core_metadata:
+            return None
+
+        return fetch_core_metadata(self.source, artifact)
 
     @property
     def index_url(self):  # type: () -> str
@@ -57,6 +165,14 @@ class PythonReleasesFetcher(ReleasesFetcher):
         return url
 
 
+@lru_cache(maxsize=_REQUIREMENT_CACHE_SIZE)
+def _parse_requirement(spec):  # type: (str) -> Requirement
+    req = Requirement(spec)
+    # We explictly allow pre-releases here as we want to handle them in resolver's pipeline units.
+    req.specifier.prereleases = True
+    return req
+
+
 @attr.s(slots=True)
 class PythonDependencyParser(DependencyParser):
     """Python Dependency parsing."""
@@ -65,13 +181,12 @@ class PythonDependencyParser(DependencyParser):
     def parse_python(spec):  # type: (str) -> Requirement
         """Parse PyPI specification of a single dependency.
 
+        Parsed requirements are cached and shared, they must not be modified.
+
         :param spec: str, for example "Django>=1.5,<1.8"
         :return: requirement for the Python package
         """
-        req = Requirement(spec)
-        # We explictly allow pre-releases here as we want to handle them in resolver's pipeline units.
-        req.specifier.prereleases = True
-        return req
+        return _parse_requirement(spec)
 
     def parse(self, specs):  # type: (List[str]) -> List[Requirement]
         """Parse specs."""
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""A persistent cache of results of package analyses shared across solver runs.
+
+Results are keyed by package name, version, index and a fingerprint of the solver environment - results obtained
+in a different environment (different interpreter, platform, environment packages or solver version) are not
+reused.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from packaging.utils import canonicalize_name
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, Dict, Optional
+
+_LOGGER = logging.getLogger(__name__)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    fingerprint TEXT NOT NULL,
+    index_url TEXT NOT NULL,
+    package_name TEXT NOT NULL,
+    package_version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (fingerprint, index_url, package_name, package_version)
+)
+"""
+
+
+def compute_fingerprint(**environment):  # type: (Any) -> str
+    """Compute fingerprint of the solver environment described by the given JSON serializable values."""
+    return hashlib.sha256(json.dumps(environment, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """A cache of package analysis results stored in an SQLite database, safe to use from multiple threads."""
+
+    def __init__(self, path, fingerprint):  # type: (str, str) -> None
+        """Open (or create) the cache database, only results with the given environment fingerprint are used."""
+        self.path = path
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        # Concurrent solver runs can share the database, wait for locks held by others.
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def _key(self, index_url, package_name, package_version):  # type: (str, str, str) -> Dict[str, str]
+        return {
+            "fingerprint": self.fingerprint,
+            "index_url": index_url,
+            "package_name": canonicalize_name(package_name),
+            "package_version": package_version,
+        }
+
+    def get(self, index_url, package_name, package_version):  # type: (str, str, str) -> Optional[Dict[str, Any]]
+        """Get cached result of the given package analysis, return None if not cached."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT result FROM results WHERE fingerprint = :fingerprint AND index_url = :index_url "
+                "AND package_name = :package_name AND package_version = :package_version",
+                self._key(index_url, package_name, package_version),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        result = json.loads(row[0])  # type: Dict[str, Any]
+        return result
+
+    def put(self, index_url, package_name, package_version, result):
+        # type: (str, str, str, Dict[str, Any]) -> None
+        """Store result of the given package analysis."""
+        values = self._key(index_url, package_name, package_version)
+        values["result"] = json.dumps(result)
+        values["created"] = time.time()  # type: ignore
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES "
+                "(:fingerprint, :index_url, :package_name, :package_version, :result, :created)",
+                values,
+            )
+
+    def invalidate(self, index_url, package_name, package_version):  # type: (str, str, str) -> None
+        """Remove cached result of the given package analysis."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM results WHERE fingerprint = :fingerprint AND index_url = :index_url "
+                "AND package_name = :package_name AND package_version = :package_version",
+                self._key(index_url, package_name, package_version),
+            )
+
+    def close(self):  # type: () -> None
+        """Close the cache database."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Scheduling policies deciding the order packages queued for discovery are picked in.
+
+Each package queued carries its depth in the dependency graph - requirements have depth zero, dependencies of a
+package are one level deeper than the package. Schedulers keep track of the number of packages picked so that the
+rate of discovery can be reported.
+"""
+
+from bisect import insort
+from collections import deque
+import heapq
+import logging
+import time
+
+from packaging.version import InvalidVersion
+from packaging.version import Version
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+_REPORT_INTERVAL = 60
+
+
+def _get_version_key(version):  # type: (str) -> Tuple[bool, Any]
+    """Get key ordering the given versions from the oldest, versions not compliant with PEP-440 are the oldest."""
+    try:
+        return True, Version(version)
+    except InvalidVersion:
+        return False, version
+
+
+class Scheduler:
+    """Depth-first scheduling, the most recently queued package is picked first."""
+
+    policy = "depth-first"
+
+    def __init__(self):  # type: () -> None
+        """Initialize an empty scheduler."""
+        self.picked = 0
+        self._started = None  # type: Optional[float]
+        self._reported = 0.0
+        self._items = deque()  # type: Deque[Tuple[Tuple[str, str], int]]
+
+    def __len__(self):  # type: () -> int
+        """Get number of packages queued."""
+        return len(self._items)
+
+    def _push(self, entry, depth):  # type: (Tuple[str, str], int) -> None
+        self._items.append((entry, depth))
+
+    def push(self, entry, depth):  # type: (Tuple[str, str], int) -> None
+        """Queue the given package (name and version) found in the given depth."""
+        if self._started is None:
+            self._started = self._reported = time.monotonic()
+        self._push(entry, depth)
+
+    def _pop(self):  # type: () -> Tuple[Tuple[str, str], int]
+        return self._items.pop()
+
+    def pop(self):  # type: () -> Tuple[Tuple[str, str], int]
+        """Pick the next package to discover, return it with its depth."""
+        item = self._pop()
+        self.picked += 1
+        return item
+
+    def stats(self):  # type: () -> Dict[str, Any]
+        """Get statistics of the scheduling - packages picked and queued, time elapsed and rate of picking."""
+        elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+        return {
+            "policy": self.policy,
+            "picked": self.picked,
+            "queued": len(self),
+            "elapsed": elapsed,
+            "rate": self.picked / elapsed if elapsed else 0.0,
+        }
+
+    def report(self, name, force=False):  # type: (str, bool) -> None
+        """Log statistics of the scheduling for the given name, at most once per reporting interval unless forced."""
+        now = time.monotonic()
+        if not force and (self._started is None or now - self._reported < _REPORT_INTERVAL):
+            return
+
+        self._reported = now
+        stats = self.stats()
+        _LOGGER.info(
+            "Picked %d packages for discovery from %r in %.1fs using %s scheduling (%.3f packages/s), %d queued",
+            stats["picked"],
+            name,
+            stats["elapsed"],
+            stats["policy"],
+            stats["rate"],
+            stats["queued"],
+        )
+
+
+class BreadthFirstScheduler(Scheduler):
+    """Breadth-first scheduling, packages are picked in the order they were queued."""
+
+    policy = "breadth-first"
+
+    def _pop(self):  # type: () -> Tuple[Tuple[str, str], int]
+        return self._items.popleft()
+
+
+class DepthLimitedScheduler(Scheduler):
+    """Depth-first scheduling down to the given depth, deeper packages are postponed until no other are queued."""
+
+    policy = "depth-limited"
+
+    def __init__(self, max_depth):  # type: (int) -> None
+        """Initialize an empty scheduler postponing packages deeper than the given depth."""
+        super().__init__()
+        self.max_depth = max_depth
+        self._postponed = deque()  # type: Deque[Tuple[Tuple[str, str], int]]
+
+    def __len__(self):  # type: () -> int
+        """Get number of packages queued."""
+        return len(self._items) + len(self._postponed)
+
+    def _push(self, entry, depth):  # type: (Tuple[str, str], int) -> None
+        if depth > self.max_depth:
+            self._postponed.append((entry, depth))
+        else:
+            self._items.append((entry, depth))
+
+    def _pop(self):  # type: () -> Tuple[Tuple[str, str], int]
+        if self._items:
+            return self._items.pop()
+
+        # Postponed packages are picked in the order they were postponed.
+        return self._postponed.popleft()
+
+
+class NewestVersionFirstScheduler(Scheduler):
+    """Newest versions first, newest versions of all the packages queued are picked before older ones."""
+
+    policy = "newest-version-first"
+
+    def __init__(self):  # type: () -> None
+        """Initialize an empty scheduler."""
+        super().__init__()
+        self._sequence = 0
+        # Versions queued per package name sorted from the oldest, the newest is picked first.
+        self._versions = {}  # type: Dict[str, List[Tuple[Any, int, Tuple[str, str], int]]]
+        self._picked_versions = {}  # type: Dict[str, int]
+        # Packages ordered by number of their versions picked so far, each package is listed at most once.
+        self._packages = []  # type: List[Tuple[int, int, str]]
+        self._length = 0
+
+    def __len__(self):  # type: () -> int
+        """Get number of packages queued."""
+        return self._length
+
+    def _push(self, entry, depth):  # type: (Tuple[str, str], int) -> None
+        self._sequence += 1
+        self._length += 1
+
+        versions = self._versions.setdefault(entry[0], [])
+        if not versions:
+            heapq.heappush(self._packages, (self._picked_versions.get(entry[0], 0), self._sequence, entry[0]))
+        # Ties are broken in favour of the package version queued first.
+        insort(versions, (_get_version_key(entry[1]), -self._sequence, entry, depth))
+
+    def _pop(self):  # type: () -> Tuple[Tuple[str, str], int]
+        _, sequence, package_name = heapq.heappop(self._packages)
+        versions = self._versions[package_name]
+        _, _, entry, depth = versions.pop()
+        self._length -= 1
+
+        picked = self._picked_versions.get(package_name, 0) + 1
+        self._picked_versions[package_name] = picked
+        if versions:
+            heapq.heappush(self._packages, (picked, sequence, package_name))
+
+        return entry, depth
+
+
+class SmallestArtifactFirstScheduler(Scheduler):
+    """Packages with the smallest artifacts first, packages with unknown sizes are picked last."""
+
+    policy = "smallest-artifact-first"
+
+    def __init__(self, artifact_size):  # type: (Callable[[str, str], Optional[int]]) -> None
+        """Initialize an empty scheduler obtaining size of artifacts of a package version using the given callable."""
+        super().__init__()
+        self.artifact_size = artifact_size
+        self._sequence = 0
+        self._heap = []  # type: List[Tuple[bool, int, int, Tuple[str, str], int]]
+
+    def __len__(self):  # type: () -> int
+        """Get number of packages queued."""
+        return len(self._heap)
+
+    def _push(self, entry, depth):  # type: (Tuple[str, str], int) -> None
+        self._sequence += 1
+        size = self.artifact_size(*entry)
+        heapq.heappush(self._heap, (size is None, size or 0, self._sequence, entry, depth))
+
+    def _pop(self):  # type: () -> Tuple[Tuple[str, str], int]
+        return heapq.heappop(self._heap)[3:]
+
+
+SCHEDULING_POLICIES = (
+    Scheduler.policy,
+    BreadthFirstScheduler.policy,
+    DepthLimitedScheduler.policy,
+    NewestVersionFirstScheduler.policy,
+    SmallestArtifactFirstScheduler.policy,
+)
+
+
+def create_scheduler(policy, max_depth=None, artifact_size=None):
+    # type: (str, Optional[int], Optional[Callable[[str, str], Optional[int]]]) -> Scheduler
+    """Create scheduler for the given policy.
+
+    Depth limit and artifact size lookup are required by the respective policies.
+    """
+    if policy == Scheduler.policy:
+        return Scheduler()
+    if policy == BreadthFirstScheduler.policy:
+        return BreadthFirstScheduler()
+    if policy == DepthLimitedScheduler.policy:
+        if max_depth is None:
+            raise ValueError("Depth-limited scheduling requires maximum depth")
+        return DepthLimitedScheduler(max_depth)
+    if policy == NewestVersionFirstScheduler.policy:
+        return NewestVersionFirstScheduler()
+    if policy == SmallestArtifactFirstScheduler.policy:
+        if artifact_size is None:
+            raise ValueError("Smallest-artifact-first scheduling requires artifact size lookup")
+        return SmallestArtifactFirstScheduler(artifact_size)
+
+    raise ValueError(f"Unknown scheduling policy {policy!r}")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""HTTP sessions shared by all requests issued to package indexes in the process.
+
+Sessions are kept per host so that connections (and TLS sessions) to the few index hosts used in a run are kept
+alive and reused by all fetchers, hash lookups, metadata and artifact downloads, regardless of how many sources
+are configured for the same index.
+"""
+
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Dict, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+_DEFAULT_POOL_SIZE = 16
+
+
+class SessionRegistry:
+    """A registry of HTTP sessions with pooled keep-alive connections, one session per host."""
+
+    def __init__(self, pool_size=_DEFAULT_POOL_SIZE):  # type: (int) -> None
+        """Initialize registry, the pool size states the number of connections kept alive per host."""
+        if pool_size < 1:
+            raise ValueError(f"Pool size has to be a positive number, got {pool_size}")
+
+        self.pool_size = pool_size
+        self._sessions = {}  # type: Dict[Tuple[str, str], requests.Session]
+        self._lock = threading.Lock()
+
+    def _create_session(self):  # type: () -> requests.Session
+        session = requests.Session()
+        # One connection pool per session suffices, sessions are not shared across hosts.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get(self, url):  # type: (str) -> requests.Session
+        """Get session used for requests to the host of the given URL."""
+        parts = urlsplit(url)
+        key = (parts.scheme.lower(), parts.netloc.lower())
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                _LOGGER.debug("Creating HTTP session for %s://%s with pool size %d", key[0], key[1], self.pool_size)
+                session = self._create_session()
+                self._sessions[key] = session
+
+        return session
+
+    def close(self):  # type: () -> None
+        """Close all sessions and their connections, sessions are created again on next use."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+
+        for session in sessions:
+            session.close()
+
+
+_REGISTRY = SessionRegistry()
+
+
+def get_session(url):  # type: (str) -> requests.Session
+    """Get session shared in the process for requests to the host of the given URL."""
+    return _REGISTRY.get(url)
+
+
+def configure_sessions(pool_size):  # type: (int) -> None
+    """Configure number of connections kept alive per host, sessions already created are closed."""
+    global _REGISTRY
+    previous = _REGISTRY
+    _REGISTRY = SessionRegistry(pool_size)
+    previous.close()
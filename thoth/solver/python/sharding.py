@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Splitting a resolution across multiple solver runs and merging their results.
+
+Each package version belongs to exactly one shard based on a hash of its normalized name and version. A sharded run
+discovers only packages of its shard, packages of other shards it finds are reported as deferred. Documents of all
+the shards are merged into one, deferred packages not discovered by any shard are kept in the merged document - they
+seed the next round of sharded runs. Once no packages are deferred, the merged document covers the same packages as
+a run that is not sharded.
+"""
+
+import hashlib
+import json
+
+from packaging.utils import canonicalize_name
+
+from .checkpoint import IndexState
+from ..exceptions import MergeError
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, Dict, List, Tuple
+
+_ENVIRONMENT_KEYS = ("environment", "environment_packages", "platform")
+
+
+def parse_shard(value):  # type: (str) -> Tuple[int, int]
+    """Parse shard specification in the form of "i/N", shards are numbered from zero."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {value!r}, expected index and number of shards in the form of 'i/N'")
+
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {value!r}, shard index has to be in range from 0 to {count - 1}")
+
+    return index, count
+
+
+def get_shard(package_name, package_version, count):  # type: (str, str, int) -> int
+    """Get shard the given package version belongs to, the same in all the runs regardless of hash seeds."""
+    key = f"{canonicalize_name(package_name)}=={package_version}".encode()
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], "big") % count
+
+
+def _get_package_key(record):  # type: (Dict[str, Any]) -> Tuple[str, str, str]
+    """Get index URL, normalized name and requested version of the package the given record was produced for."""
+    version = record.get("package_version_requested") or record["package_version"]
+    return record["index_url"], canonicalize_name(record["package_name"]), version
+
+
+def get_seed_states(document):  # type: (Dict[str, Any]) -> Dict[str, IndexState]
+    """Get state of each index to continue with packages deferred in the given (merged) document."""
+    result = document["result"]
+    states = {}  # type: Dict[str, IndexState]
+    for record in result.get("tree", []) + result.get("errors", []) + result.get("deferred", []):
+        index_url, package_name, package_version = _get_package_key(record)
+        states.setdefault(index_url, IndexState(records=[], seen=set(), queue=[])).seen.add(
+            (package_name, package_version)
+        )
+
+    for record in result.get("deferred", []):
+        index_url, package_name, package_version = _get_package_key(record)
+        states[index_url].queue.append((package_name, package_version))
+
+    return states
+
+
+def _unique(records):  # type: (List[Dict[str, Any]]) -> List[Dict[str, Any]]
+    """Drop duplicate records, keep the order of the first occurrence."""
+    seen = set()
+    result = []
+    for record in records:
+        key = json.dumps(record, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            result.append(record)
+
+    return result
+
+
+def merge_documents(documents):  # type: (List[Dict[str, Any]]) -> Dict[str, Any]
+    """Merge results of the given documents produced by sharded runs (or earlier merges), in the order given."""
+    if not documents:
+        raise MergeError("No documents to merge")
+
+    first = documents[0]["result"]
+    for document in documents[1:]:
+        for key in _ENVIRONMENT_KEYS:
+            if document["result"].get(key) != first.get(key):
+                raise MergeError(f"Documents were produced in different solver environments, {key!r} differs")
+
+    merged = {key: first.get(key) for key in _ENVIRONMENT_KEYS}  # type: Dict[str, Any]
+    analyzed = set()
+    for section in ("tree", "errors"):
+        merged[section] = []
+        for document in documents:
+            for record in document["result"].get(section, []):
+                package_key = _get_package_key(record)
+                if package_key not in analyzed:
+                    analyzed.add(package_key)
+                    merged[section].append(record)
+
+    for section in ("unparsed", "unresolved"):
+        merged[section] = _unique([record for document in documents for record in document["result"].get(section, [])])
+
+    merged["deferred"] = []
+    for document in documents:
+        # Packages left pending by a shard that ran out of its budget are continued in the next round.
+        for record in document["result"].get("deferred", []) + document["result"].get("pending", []):
+            package_key = _get_package_key(record)
+            if package_key not in analyzed:
+                # Packages deferred by more shards are kept once.
+                analyzed.add(package_key)
+                merged["deferred"].append(record)
+
+    return merged
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Timings of stages of package discovery and their aggregates over a run.
+
+Timings are collected per thread - a package is discovered in one thread and stages entered while its timings are
+collected add the time spent in them to the package timings. Stages entered when no timings are collected (e.g. in
+tests calling functions directly) are not measured.
+"""
+
+from contextlib import contextmanager
+import math
+import os
+import tempfile
+import threading
+import time
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Dict, Generator, List, Optional
+
+# Stages of package discovery in the order they are run, name lookup and metadata extraction are one query.
+STAGES = ("cache", "install", "metadata", "restore", "license", "hashes", "dependencies")
+_QUANTILES = (("p50", 0.5), ("p95", 0.95))
+_METRIC_NAME = "thoth_solver_stage_duration_seconds"
+
+_LOCAL = threading.local()
+
+
+@contextmanager
+def collect():  # type: () -> Generator[Dict[str, float], None, None]
+    """Collect timings of stages entered in the current thread, yield stage names mapped to seconds spent."""
+    previous = getattr(_LOCAL, "timings", None)
+    timings = {}  # type: Dict[str, float]
+    _LOCAL.timings = timings
+    try:
+        yield timings
+    finally:
+        _LOCAL.timings = previous
+
+
+@contextmanager
+def stage(name):  # type: (str) -> Generator[None, None, None]
+    """Measure time spent in the given stage, time spent in a stage entered repeatedly is summed."""
+    timings = getattr(_LOCAL, "timings", None)  # type: Optional[Dict[str, float]]
+    if timings is None:
+        yield
+        return
+
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.monotonic() - start
+
+
+def _quantile(values, quantile):  # type: (List[float], float) -> float
+    """Get the given quantile of sorted values using the nearest rank method."""
+    return values[max(math.ceil(quantile * len(values)) - 1, 0)]
+
+
+class StageStats:
+    """Aggregates of stage timings of packages discovered in a run, safe to use from multiple threads."""
+
+    def __init__(self):  # type: () -> None
+        """Initialize empty aggregates."""
+        self._values = {}  # type: Dict[str, List[float]]
+        self._lock = threading.Lock()
+
+    def add(self, timings):  # type: (Optional[Dict[str, float]]) -> None
+        """Add timings of a package discovered, if any."""
+        if not timings:
+            return
+
+        with self._lock:
+            for name, seconds in timings.items():
+                self._values.setdefault(name, []).append(seconds)
+
+    def summary(self):  # type: () -> Dict[str, Dict[str, float]]
+        """Get count, sum, median, 95th percentile and maximum of time spent in each stage."""
+        with self._lock:
+            values = {name: sorted(stage_values) for name, stage_values in self._values.items()}
+
+        result = {}
+        for name in sorted(values, key=lambda item: (STAGES.index(item) if item in STAGES else len(STAGES), item)):
+            stage_values = values[name]
+            result[name] = {"count": len(stage_values), "sum": sum(stage_values), "max": stage_values[-1]}
+            for key, quantile in _QUANTILES:
+                result[name][key] = _quantile(stage_values, quantile)
+
+        return result
+
+
+def write_textfile(path, summary):  # type: (str, Dict[str, Dict[str, float]]) -> None
+    """Write the given stage timings summary in Prometheus text format, atomically for the textfile collector."""
+    lines = [
+        f"# HELP {_METRIC_NAME} Time spent in stages of package discovery.",
+        f"# TYPE {_METRIC_NAME} summary",
+    ]
+    for name, stats in summary.items():
+        for key, quantile in _QUANTILES:
+            lines.append(f'{_METRIC_NAME}{{stage="{name}",quantile="{quantile}"}} {stats[key]}')
+        lines.append(f'{_METRIC_NAME}_sum{{stage="{name}"}} {stats["sum"]}')
+        lines.append(f'{_METRIC_NAME}_count{{stage="{name}"}} {stats["count"]}')
+
+    lines.append(f"# HELP {_METRIC_NAME}_max Maximum time spent in a stage of package discovery.")
+    lines.append(f"# TYPE {_METRIC_NAME}_max gauge")
+    for name, stats in summary.items():
+        lines.append(f'{_METRIC_NAME}_max{{stage="{name}"}} {stats["max"]}')
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".metrics-")
+    try:
+        with os.fdopen(fd, "w") as metrics_file:
+            metrics_file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
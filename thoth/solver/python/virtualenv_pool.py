@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""A pool of independent virtual environments used to analyze packages concurrently.
+
+Virtual environments can be cloned from a template environment that is built once and kept on disk, clones are
+created using reflinks, hardlinks or plain copies (whatever the filesystem supports) ahead of time so that
+subsequent runs do not need to create virtual environments and install packages into them.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import logging
+import os
+import queue
+from shlex import quote
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+
+from thoth.analyzer import run_command
+from .profiling import span
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Generator, List, Optional, Sequence
+
+_LOGGER = logging.getLogger(__name__)
+
+CLONE_METHODS = ("reflink", "hardlink", "copy")
+
+
+def clone_directory(source, destination, methods=CLONE_METHODS):
+    # type: (str, str, Sequence[str]) -> str
+    """Clone the given directory to the given destination using the cheapest of the methods supported, return it."""
+    for method in methods:
+        try:
+            if method == "reflink":
+                subprocess.run(
+                    ["cp", "-a", "--reflink=always", source, destination],
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            elif method == "hardlink":
+                shutil.copytree(source, destination, symlinks=True, copy_function=os.link)
+            else:
+                shutil.copytree(source, destination, symlinks=True)
+        except (OSError, subprocess.CalledProcessError) as exc:
+            _LOGGER.debug("Failed to clone %r using %s: %s", source, method, str(exc))
+            shutil.rmtree(destination, ignore_errors=True)
+            continue
+
+        return method
+
+    raise OSError("Failed to clone {!r}".format(source))
+
+
+class VirtualenvPool:
+    """A pool of virtual environments, each virtual environment is used by at most one analysis at a time."""
+
+    def __init__(self, python_bins, directory=None, template=None):
+        # type: (List[str], Optional[str], Optional[VirtualenvTemplate]) -> None
+        """Initialize pool with Python interpreters of the given virtual environments.
+
+        The directory, if provided, holds virtual environments created by the pool and it is removed on close. If
+        a template is provided, virtual environments are clones of the template released back on close.
+        """
+        self.python_bins = list(python_bins)
+        self._directory = directory
+        self._template = template
+        self._capacity = len(self.python_bins)
+        self._queue = queue.Queue()  # type: queue.Queue[str]
+        for python_bin in self.python_bins:
+            self._queue.put(python_bin)
+
+    @classmethod
+    def create(cls, python_bin, size):  # type: (str, int) -> VirtualenvPool
+        """Create a pool of the given size, the given Python interpreter is used as the first one in the pool.
+
+        Additional virtual environments are clones of the virtual environment of the given Python interpreter created
+        next to each other in a temporary directory, no packages are installed into them.
+        """
+        if size <= 1:
+            return cls([python_bin])
+
+        virtualenv = os.path.dirname(os.path.dirname(os.path.abspath(python_bin)))
+        if not os.path.isfile(os.path.join(virtualenv, "pyvenv.cfg")):
+            raise ValueError(
+                "Python interpreter {!r} is not in a virtual environment, it cannot be cloned".format(python_bin)
+            )
+
+        directory = tempfile.mkdtemp(prefix="thoth-solver-venvs-")
+
+        def _create(index):  # type: (int) -> str
+            path = os.path.join(directory, "venv-{}".format(index))
+            _LOGGER.debug("Cloning virtual environment %r to %r for the virtual environment pool", virtualenv, path)
+            clone_directory(virtualenv, path)
+            return os.path.join(path, "bin", os.path.basename(python_bin))
+
+        try:
+            with ThreadPoolExecutor(max_workers=size - 1) as executor:
+                python_bins = list(executor.map(_create, range(1, size)))
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+
+        return cls([python_bin] + python_bins, directory=directory)
+
+    @classmethod
+    def from_template(cls, template, size):  # type: (VirtualenvTemplate, int) -> VirtualenvPool
+        """Create a pool of the given size out of clones of the given template."""
+        python_bins = []  # type: List[str]
+        try:
+            for _ in range(size):
+                python_bins.append(template.acquire())
+        except Exception:
+            for python_bin in python_bins:
+                template.release(python_bin)
+            raise
+
+        # Prepare clones for the next run while this one is running.
+        template.replenish(size, background=True)
+        return cls(python_bins, template=template)
+
+    @property
+    def size(self):  # type: () -> int
+        """Get number of virtual environments in the pool."""
+        return len(self.python_bins)
+
+    @property
+    def capacity(self):  # type: () -> int
+        """Get number of analyses that can use virtual environments of the pool at a time."""
+        return self._capacity
+
+    def share(self, count):  # type: (int) -> None
+        """Let each virtual environment be used by the given number of analyses at a time.
+
+        Sharing is safe only if analyses do not modify virtual environments.
+        """
+        for _ in range(count - 1):
+            for python_bin in self.python_bins:
+                self._queue.put(python_bin)
+
+        self._capacity = len(self.python_bins) * count
+
+    @contextmanager
+    def acquire(self):  # type: () -> Generator[str, None, None]
+        """Acquire a virtual environment from the pool, wait until one is available."""
+        python_bin = self._queue.get()
+        try:
+            yield python_bin
+        finally:
+            self._queue.put(python_bin)
+
+    def close(self):  # type: () -> None
+        """Remove virtual environments created by the pool."""
+        if self._directory:
+            _LOGGER.debug("Removing virtual environment pool in %r", self._directory)
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+        if self._template:
+            for python_bin in self.python_bins:
+                self._template.release(python_bin)
+            self._template.wait()
+            self._template = None
+
+
+class VirtualenvTemplate:
+    """A pristine virtual environment kept on disk together with a pool of its ready-to-use clones.
+
+    The directory can be shared by multiple solver runs (also concurrent ones), a clone is handed out to exactly one
+    run and it is removed once the run finishes. The directory layout is:
+
+      template-<fingerprint>/          - the template virtual environment
+      clones-<fingerprint>/ready/<id>  - clones ready to be handed out
+      clones-<fingerprint>/used/<id>   - clones handed out to runs
+    """
+
+    def __init__(self, directory, python_bin="python3"):  # type: (str, str) -> None
+        """Initialize template for the given Python interpreter stored in the given directory."""
+        self.directory = os.path.abspath(directory)
+        self.python_bin = python_bin
+        self._fingerprint = None  # type: Optional[str]
+        self._clone_method = None  # type: Optional[str]
+        self._replenish_thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def fingerprint(self):  # type: () -> str
+        """Get fingerprint of the Python interpreter used, a new template is built if the interpreter changes."""
+        if self._fingerprint is None:
+            version = subprocess.check_output(
+                [self.python_bin, "-c", "import sys; print(sys.executable, sys.version)"],
+                universal_newlines=True,
+            )
+            self._fingerprint = hashlib.sha256(version.encode()).hexdigest()[:16]
+
+        return self._fingerprint
+
+    @property
+    def template_path(self):  # type: () -> str
+        """Get path to the template virtual environment."""
+        return os.path.join(self.directory, "template-{}".format(self.fingerprint))
+
+    @property
+    def _clones_path(self):  # type: () -> str
+        return os.path.join(self.directory, "clones-{}".format(self.fingerprint))
+
+    def _get_python_bin(self, path):  # type: (str) -> str
+        return os.path.join(path, "bin", os.path.basename(self.python_bin))
+
+    @contextmanager
+    def _lock(self):  # type: () -> Generator[None, None, None]
+        """Lock the template directory across processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def prepare(self):  # type: () -> None
+        """Build the template virtual environment if not built yet."""
+        if os.path.isdir(self.template_path):
+            return
+
+        with self._lock():
+            if os.path.isdir(self.template_path):
+                return
+
+            path = self.template_path + ".tmp"
+            shutil.rmtree(path, ignore_errors=True)
+            _LOGGER.info("Building template virtual environment in %r", self.template_path)
+            with span("virtualenv"):
+                run_command("virtualenv -p {} {}".format(quote(self.python_bin), quote(path)))
+            with span("pip-install", command="pipdeptree"):
+                run_command("{} -m pip install pipdeptree".format(self._get_python_bin(path)))
+            os.rename(path, self.template_path)
+
+    def _clone(self, destination):  # type: (str) -> None
+        """Clone the template to the given destination, use the cheapest clone method supported."""
+        methods = (self._clone_method,) if self._clone_method else CLONE_METHODS
+        method = clone_directory(self.template_path, destination, methods)
+        if self._clone_method is None:
+            _LOGGER.debug("Cloning template virtual environments using %s", method)
+            self._clone_method = method
+
+    def _make_clone(self):  # type: () -> str
+        """Create a new clone ready to be handed out, return its path."""
+        ready_path = os.path.join(self._clones_path, "ready")
+        os.makedirs(ready_path, exist_ok=True)
+        clone_id = uuid.uuid4().hex
+        # Clones are published atomically, so other runs never see a partially created clone.
+        path = os.path.join(self._clones_path, ".tmp-{}".format(clone_id))
+        self._clone(path)
+        os.rename(path, os.path.join(ready_path, clone_id))
+        return clone_id
+
+    def acquire(self):  # type: () -> str
+        """Get a clone of the template for exclusive use, return path to its Python interpreter."""
+        self.prepare()
+
+        ready_path = os.path.join(self._clones_path, "ready")
+        used_path = os.path.join(self._clones_path, "used")
+        os.makedirs(used_path, exist_ok=True)
+
+        while True:
+            try:
+                candidates = sorted(os.listdir(ready_path))
+            except FileNotFoundError:
+                candidates = []
+
+            if not candidates:
+                candidates = [self._make_clone()]
+
+            for clone_id in candidates:
+                path = os.path.join(used_path, clone_id)
+                try:
+                    # Renaming is atomic, a clone is claimed by exactly one run.
+                    os.rename(os.path.join(ready_path, clone_id), path)
+                except FileNotFoundError:
+                    continue
+
+                _LOGGER.debug("Using virtual environment %r cloned from template %r", path, self.template_path)
+                return self._get_python_bin(path)
+
+    def release(self, python_bin):  # type: (str) -> None
+        """Remove the given clone once it is not needed anymore."""
+        path = os.path.dirname(os.path.dirname(python_bin))
+        _LOGGER.debug("Removing virtual environment clone %r", path)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def replenish(self, count, background=False):  # type: (int, bool) -> None
+        """Make sure there are at least the given number of clones ready to be handed out."""
+        if background:
+            self._replenish_thread = threading.Thread(target=self.replenish, args=(count,), daemon=True)
+            self._replenish_thread.start()
+            return
+
+        try:
+            ready = len(os.listdir(os.path.join(self._clones_path, "ready")))
+        except FileNotFoundError:
+            ready = 0
+
+        for _ in range(count - ready):
+            try:
+                self._make_clone()
+            except Exception as exc:
+                _LOGGER.warning("Failed to prepare a virtual environment clone: %s", str(exc))
+                return
+
+    def wait(self):  # type: () -> None
+        """Wait for clones being prepared in background."""
+        if self._replenish_thread is not None:
+            self._replenish_thread.join()
+            self._replenish_thread = None
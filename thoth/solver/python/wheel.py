@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# thoth-solver
+# Copyright(C) 2023 Fridolin Pokorny
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Gathering package metadata from wheel artifacts without installing them.
+
+The produced metadata follow the structure produced by `get_distribution_metadata' (as obtained using
+importlib-metadata on an installed distribution) so that they can be used interchangeably.
+"""
+
+import csv
+import email
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import textwrap
+import zipfile
+
+from packaging.specifiers import InvalidSpecifier
+from packaging.specifiers import SpecifierSet
+
+from .artifacts import ArtifactLink
+from .lazy_wheel import LazyRemoteFile
+from .sessions import get_session
+from ..exceptions import RangeRequestsNotSupported
+
+from .._typing import MYPY_CHECK_RUNNING
+
+if MYPY_CHECK_RUNNING:  # pragma: no cover
+    from typing import Any, Dict, IO, List, Optional, Sequence, Tuple, Union
+
+_LOGGER = logging.getLogger(__name__)
+# Keys that may be stated multiple times in core metadata, reported as arrays:
+#    https://packaging.python.org/specifications/core-metadata
+_MULTIPLE_USE_KEYS = frozenset(
+    (
+        "Platform",
+        "Supported-Platform",
+        "Classifier",
+        "Provides-Dist",
+        "Requires-Dist",
+        "Requires-External",
+        "Project-URL",
+        "Provides-Extra",
+    ),
+)
+_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def parse_metadata(content):  # type: (str) -> Tuple[str, Dict[str, Any], Optional[List[str]]]
+    """Parse core metadata, return distribution name, metadata and requirements as importlib-metadata does."""
+    message = email.message_from_string(content)
+
+    headers = []  # type: List[Tuple[str, Any]]
+    for key, value in message.items():
+        # Correct for RFC822 indentation the same way importlib-metadata does.
+        if value and "\n" in value:
+            value = textwrap.dedent(" " * 8 + value)
+        headers.append((key, value))
+
+    payload = message.get_payload()
+    if payload:
+        headers.append(("Description", payload))
+
+    result = dict(headers)  # type: Dict[str, Any]
+    for key in _MULTIPLE_USE_KEYS:
+        values = [value for header, value in headers if header.lower() == key.lower()]
+        if values:
+            result[key] = values
+
+    requires = message.get_all("Requires-Dist")
+    # Distribution name as reported by setuptools' safe_name.
+    distribution_name = re.sub(r"[^A-Za-z0-9.]+", "-", message["Name"] or "")
+    return distribution_name, result, list(requires) if requires else None
+
+
+def parse_entry_points(content):  # type: (str) -> List[Dict[str, str]]
+    """Parse entry_points.txt file as present in dist-info directory."""
+    result = []
+    group = None
+    for line in map(str.strip, content.splitlines()):
+        if not line or line.startswith("#"):
+            continue
+
+        if line.startswith("[") and line.endswith("]"):
+            group = line.strip("[]")
+            continue
+
+        if group is None:
+            continue
+
+        name, _, value = line.partition("=")
+        result.append({"name": name.strip(), "value": value.strip(), "group": group})
+
+    return result
+
+
+def parse_record(content):  # type: (str) -> List[Dict[str, Any]]
+    """Parse RECORD file as present in dist-info directory."""
+    result = []
+    for row in csv.reader(content.splitlines()):
+        if not row:
+            continue
+
+        path, hash_, size = (list(row) + ["", ""])[:3]
+        file_hash = None
+        if hash_:
+            mode, _, value = hash_.partition("=")
+            file_hash = {"mode": mode, "value": value}
+
+        result.append({"hash": file_hash, "size": int(size) if size else None, "path": path})
+
+    return result
+
+
+def _find_dist_info(names):  # type: (Sequence[str]) -> str
+    """Find dist-info directory in a wheel given the list of members."""
+    candidates = sorted(
+        {name.split("/", maxsplit=1)[0] for name in names if name.count("/") == 1 and name.endswith("/METADATA")},
+    )
+    candidates = [candidate for candidate in candidates if candidate.endswith(".dist-info")]
+    if len(candidates) != 1:
+        raise ValueError(f"Expected exactly one dist-info directory in wheel, found: {candidates}")
+
+    return candidates[0]
+
+
+def read_wheel_metadata(wheel):  # type: (Union[str, IO[bytes]]) -> Tuple[str, Dict[str, Any]]
+    """Read distribution name and metadata from the given wheel file."""
+    with zipfile.ZipFile(wheel) as archive:
+        dist_info = _find_dist_info(archive.namelist())
+        metadata_content = archive.read(dist_info + "/METADATA").decode("utf-8")
+        record_content = archive.read(dist_info + "/RECORD").decode("utf-8")
+        try:
+            entry_points_content = archive.read(dist_info + "/entry_points.txt").decode("utf-8")
+        except KeyError:
+            entry_points_content = ""
+
+    distribution_name, metadata, requires = parse_metadata(metadata_content)
+    return (
+        distribution_name,
+        {
+            "metadata": metadata,
+            "requires": requires,
+            "entry_points": parse_entry_points(entry_points_content),
+            "files": parse_record(record_content),
+            "version": metadata.get("Version"),
+        },
+    )
+
+
+def read_core_metadata(content):  # type: (str) -> Tuple[str, Dict[str, Any]]
+    """Read distribution name and metadata from a core metadata file as served by the index (PEP-658).
+
+    Entry points and files are not part of core metadata, they are reported as empty and the metadata are marked
+    with their source so that consumers can tell them apart from packages without any entry points or files.
+    """
+    distribution_name, metadata, requires = parse_metadata(content)
+    return (
+        distribution_name,
+        {
+            "metadata": metadata,
+            "requires": requires,
+            "entry_points": [],
+            "files": [],
+            "version": metadata.get("Version"),
+            "metadata_source": "core-metadata",
+        },
+    )
+
+
+def matches_python_version(requires_python, python_version):  # type: (Optional[str], str) -> bool
+    """Check if the given Requires-Python specification accepts the given interpreter version, the same way pip does."""
+    if not requires_python:
+        return True
+
+    try:
+        return bool(SpecifierSet(requires_python).contains(python_version, prereleases=True))
+    except InvalidSpecifier:
+        # pip ignores invalid Requires-Python specifications.
+        _LOGGER.debug("Ignoring invalid Requires-Python specification %r", requires_python)
+        return True
+
+
+def select_wheel(artifacts, package_version, supported_tags, python_version):
+    # type: (List[ArtifactLink], str, List[str], str) -> Optional[ArtifactLink]
+    """Select the wheel pip would install for the given package version, return None if there is no suitable one."""
+    tag_priorities = {tag: priority for priority, tag in enumerate(supported_tags)}
+
+    best = None  # type: Optional[Tuple[Tuple[int, Tuple[Any, ...]], ArtifactLink]]
+    for artifact in artifacts:
+        wheel_info = artifact.get_wheel_info()
+        if wheel_info is None or not artifact.is_version(package_version):
+            continue
+
+        if not matches_python_version(artifact.requires_python, python_version):
+            _LOGGER.debug("Skipping wheel %r as it requires Python %r", artifact.filename, artifact.requires_python)
+            continue
+
+        priorities = [tag_priorities[tag] for tag in wheel_info[3] if tag in tag_priorities]
+        if not priorities:
+            continue
+
+        # Prefer the most specific tag, on ties a higher build number as pip does.
+        build = wheel_info[2]
+        key = (min(priorities), (-build[0], build[1]) if build else (0, ""))
+        if best is None or key < best[0]:
+            best = (key, artifact)
+
+    return best[1] if best else None
+
+
+def download_artifact(artifact, directory, verify_ssl=True):  # type: (ArtifactLink, str, bool) -> str
+    """Download the given artifact to the given directory, verify its digest if stated on the index."""
+    path = os.path.join(directory, os.path.basename(artifact.filename))
+    digest = hashlib.sha256()
+
+    _LOGGER.debug("Downloading artifact %r from %r", artifact.filename, artifact.url)
+    with get_session(artifact.url).get(artifact.url, verify=verify_ssl, stream=True) as response:
+        response.raise_for_status()
+        with open(path, "wb") as artifact_file:
+            for chunk in response.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                artifact_file.write(chunk)
+
+    if artifact.sha256 and digest.hexdigest() != artifact.sha256:
+        raise ValueError(
+            f"Digest mismatch for artifact {artifact.filename!r} downloaded from {artifact.url!r}: "
+            f"expected {artifact.sha256}, got {digest.hexdigest()}",
+        )
+
+    return path
+
+
+def read_remote_wheel_metadata(artifact, verify_ssl=True):  # type: (ArtifactLink, bool) -> Tuple[str, Dict[str, Any]]
+    """Read distribution name and metadata of a remote wheel fetching only the needed parts using range requests.
+
+    Raises RangeRequestsNotSupported if the server hosting the wheel does not support range requests. As only parts
+    of the wheel are fetched, the digest of the artifact is not verified.
+    """
+    with LazyRemoteFile(artifact.url, verify_ssl=verify_ssl) as remote_file:
+        result = read_wheel_metadata(remote_file)  # type: ignore[arg-type]
+        _LOGGER.debug(
+            "Read metadata of %r using %d range requests (%d bytes)",
+            artifact.filename,
+            remote_file.requests_issued,
+            remote_file.bytes_fetched,
+        )
+        return result
+
+
+def get_wheel_metadata(artifact, verify_ssl=True):  # type: (ArtifactLink, bool) -> Tuple[str, Dict[str, Any]]
+    """Read distribution name and metadata of the given wheel, download it if range requests are not supported."""
+    try:
+        return read_remote_wheel_metadata(artifact, verify_ssl=verify_ssl)
+    except RangeRequestsNotSupported as exc:
+        _LOGGER.debug("Downloading whole wheel %r: %s", artifact.filename, str(exc))
+
+    with tempfile.TemporaryDirectory() as directory:
+        return read_wheel_metadata(download_artifact(artifact, directory, verify_ssl=verify_ssl))